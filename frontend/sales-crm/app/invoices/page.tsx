@@ -3,6 +3,7 @@
 import { useEffect, useState } from "react"
 import Layout from "../components/layout"
 import { useAuth } from "@/hooks/useAuth"
+import { allResults, MAX_PAGE_SIZE } from "@/lib/pagination"
 import { Button } from "@/components/ui/button"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
 import {
@@ -26,7 +27,8 @@ interface Customer {
 interface Invoice {
   id: number
   invoice_number: string
-  customer_details: {
+  customer_name?: string  // list rows
+  customer_details?: {  // created invoices
     company_name: string
   }
   total_amount: number
@@ -68,8 +70,8 @@ export default function Invoices() {
         try {
           const headers = getAuthHeaders()
           const [invRes, custRes] = await Promise.all([
-            fetch('http://localhost:8000/api/invoices/', { headers }),
-            fetch('http://localhost:8000/api/customers/', { headers })
+            fetch(`http://localhost:8000/api/invoices/?page_size=${MAX_PAGE_SIZE}`, { headers }),
+            fetch(`http://localhost:8000/api/customers/?page_size=${MAX_PAGE_SIZE}`, { headers })
           ])
 
           if (!invRes.ok || !custRes.ok) {
@@ -77,8 +79,8 @@ export default function Invoices() {
           }
 
           const [invoicesData, customersData] = await Promise.all([
-            invRes.json(),
-            custRes.json()
+            allResults<Invoice>(invRes, { headers }),
+            allResults<Customer>(custRes, { headers })
           ])
 
           // Debug: log invoices data to verify structure
@@ -270,7 +272,7 @@ export default function Invoices() {
               {invoices.map((invoice) => (
                 <TableRow key={invoice.id}>
                   <TableCell>{invoice.invoice_number || "N/A"}</TableCell>
-                  <TableCell>{invoice.customer_details?.company_name || "N/A"}</TableCell>
+                  <TableCell>{invoice.customer_name || invoice.customer_details?.company_name || "N/A"}</TableCell>
                   <TableCell>
                     ${invoice.total_amount ? Number(invoice.total_amount).toFixed(2) : "0.00"}
                   </TableCell>
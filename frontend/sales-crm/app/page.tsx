@@ -4,6 +4,7 @@ import { useEffect, useState } from "react"
 import Layout from "./components/layout"
 import dynamic from "next/dynamic"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
+import { allResults, countResults, MAX_PAGE_SIZE } from "@/lib/pagination"
 
 // Dynamically import the Graph component (instead of BarChart)
 const GraphComponent = dynamic(() => import("./components/Graph"), { ssr: false })
@@ -42,10 +43,10 @@ export default function Dashboard() {
     const fetchMetrics = async () => {
       try {
         const headers = getAuthHeaders()
-        // Fetch paid invoices
-        const invRes = await fetch("http://localhost:8000/api/invoices/?status=PAID", { headers })
+        // Fetch paid invoices, every page of them
+        const invRes = await fetch(`http://localhost:8000/api/invoices/?status=PAID&page_size=${MAX_PAGE_SIZE}`, { headers })
         if (!invRes.ok) throw new Error("Failed to fetch paid invoices")
-        const invoices = await invRes.json()
+        const invoices = await allResults<{ total_amount: number | string }>(invRes, { headers })
         const revenue = invoices.reduce(
           (acc: number, item: { total_amount: number | string }) =>
             acc + Number(item.total_amount || 0),
@@ -53,27 +54,19 @@ export default function Dashboard() {
         )
         setPaidRevenue(revenue)
 
-        // Fetch active leads
-        const leadsRes = await fetch("http://localhost:8000/api/leads/?status=New", { headers })
-        if (!leadsRes.ok) throw new Error("Failed to fetch leads")
-        const leads = await leadsRes.json()
-        setActiveLeads(Array.isArray(leads) ? leads.length : 0)
-
-        // Fetch employees count
-        const empRes = await fetch("http://localhost:8000/api/employee/employees/", { headers })
-        if (!empRes.ok) throw new Error("Failed to fetch employees")
-        const employees = await empRes.json()
-        setEmployeesCount(Array.isArray(employees) ? employees.length : 0)
-
-        // Fetch clients count (using customers endpoint)
-        const clientsRes = await fetch("http://localhost:8000/api/customers/", { headers })
-        if (!clientsRes.ok) throw new Error("Failed to fetch clients")
-        const clients = await clientsRes.json()
-        setClientsCount(Array.isArray(clients) ? clients.length : 0)
+        // Count active leads, employees and clients (the lists are paginated)
+        const [leads, employees, clients] = await Promise.all([
+          countResults("http://localhost:8000/api/leads/?status=New", { headers }),
+          countResults("http://localhost:8000/api/employee/employees/", { headers }),
+          countResults("http://localhost:8000/api/customers/", { headers }),
+        ])
+        setActiveLeads(leads)
+        setEmployeesCount(employees)
+        setClientsCount(clients)
 
         setConversionData([
-          { name: "Leads", value: Array.isArray(leads) ? leads.length : 0 },
-          { name: "Clients", value: Array.isArray(clients) ? clients.length : 0 }
+          { name: "Leads", value: leads },
+          { name: "Clients", value: clients }
         ])
       } catch (err) {
         setError(err instanceof Error ? err.message : "Error fetching metrics")
@@ -1,3 +1,5 @@
+import { allResults, MAX_PAGE_SIZE, withParams } from '@/lib/pagination'
+
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api'
 
 export interface Client {
@@ -21,17 +23,15 @@ const getAuthHeaders = () => {
 };
 
 export const getClients = async (): Promise<Client[]> => {
-    const response = await fetch(`${API_URL}/customers/`, {
-        headers: getAuthHeaders(),
-        credentials: 'include',
-    });
+    const init: RequestInit = { headers: getAuthHeaders(), credentials: 'include' };
+    const response = await fetch(withParams(`${API_URL}/customers/`, { page_size: MAX_PAGE_SIZE }), init);
     if (!response.ok) {
         if (response.status === 401) {
             throw new Error('Authentication required');
         }
         throw new Error('Failed to fetch clients');
     }
-    return response.json();
+    return allResults<Client>(response, init);
 };
 
 export const createClient = async (client: Omit<Client, 'id'>): Promise<Client> => {
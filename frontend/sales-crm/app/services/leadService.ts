@@ -1,3 +1,5 @@
+import { allResults, MAX_PAGE_SIZE, withParams } from '@/lib/pagination';
+
 const API_BASE_URL = 'http://localhost:8000/api';
 
 export interface Employee {
@@ -34,17 +36,15 @@ const getAuthHeaders = () => {
 };
 
 export const getLeads = async (): Promise<Lead[]> => {
-    const response = await fetch(`${API_BASE_URL}/leads/`, {
-        headers: getAuthHeaders(),
-        credentials: 'include',
-    });
+    const init: RequestInit = { headers: getAuthHeaders(), credentials: 'include' };
+    const response = await fetch(withParams(`${API_BASE_URL}/leads/`, { page_size: MAX_PAGE_SIZE }), init);
     if (!response.ok) {
         if (response.status === 401) {
             throw new Error('Authentication required');
         }
         throw new Error('Failed to fetch leads');
     }
-    return response.json();
+    return allResults<Lead>(response, init);
 };
 
 export const createLead = async (lead: Omit<Lead, 'id' | 'score' | 'created_at'>): Promise<Lead> => {
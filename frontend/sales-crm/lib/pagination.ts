@@ -0,0 +1,56 @@
+// List endpoints answer with keyset pages: { next, results, count? }.
+// `next` is the absolute URL of the following page, or null on the last one.
+export interface Page<T> {
+  next: string | null
+  count?: number
+  count_is_approximate?: boolean
+  results: T[]
+}
+
+// Largest page the API serves (API_MAX_PAGE_SIZE), to keep round trips down
+// when a caller needs every row.
+export const MAX_PAGE_SIZE = 500
+
+export function withParams(url: string, params: Record<string, string | number>): string {
+  const parsed = new URL(url)
+  for (const [key, value] of Object.entries(params)) {
+    parsed.searchParams.set(key, String(value))
+  }
+  return parsed.toString()
+}
+
+async function fetchPage<T>(url: string, init?: RequestInit): Promise<Page<T> | T[]> {
+  const response = await fetch(url, init)
+  if (!response.ok) {
+    throw new Error(`Failed to fetch ${url} (HTTP ${response.status})`)
+  }
+  return response.json()
+}
+
+// Every row of a list, starting from a first response the caller has already
+// checked. Endpoints that are not paginated return a plain array.
+export async function allResults<T>(response: Response, init?: RequestInit): Promise<T[]> {
+  let data: Page<T> | T[] = await response.json()
+  const rows: T[] = []
+  while (!Array.isArray(data)) {
+    rows.push(...data.results)
+    if (!data.next) return rows
+    data = await fetchPage<T>(data.next, init)
+  }
+  return rows.concat(data)
+}
+
+// Number of rows in a list. Uses the exact count the API sends for filtered
+// lists; unfiltered counts are estimates, so those are counted page by page.
+export async function countResults(url: string, init?: RequestInit): Promise<number> {
+  let data = await fetchPage<unknown>(withParams(url, { include_count: 1, page_size: MAX_PAGE_SIZE }), init)
+  if (Array.isArray(data)) return data.length
+  if (data.count !== undefined && !data.count_is_approximate) return data.count
+  let count = 0
+  while (!Array.isArray(data)) {
+    count += data.results.length
+    if (!data.next) return count
+    data = await fetchPage<unknown>(data.next, init)
+  }
+  return count + data.length
+}
@@ -1,3 +1,5 @@
+import { allResults, MAX_PAGE_SIZE, withParams } from "@/lib/pagination";
+
 const BASE_URL = process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:8000";
 const API_URL = process.env.NEXT_PUBLIC_API_URL || `${BASE_URL}/api`;
 
@@ -150,20 +152,20 @@ export const API = {
     const token = localStorage.getItem('token');
     if (!token) throw new Error('No authentication token');
 
-    const response = await fetch(`${BASE_URL}/api/leads/`, {
+    const init: RequestInit = {
       headers: {
         'Authorization': `Token ${token}`,
         'Content-Type': 'application/json',
       },
       credentials: 'include',
-    });
+    };
+    const response = await fetch(withParams(`${BASE_URL}/api/leads/`, { page_size: MAX_PAGE_SIZE }), init);
 
     if (!response.ok) {
       throw new Error('Failed to fetch leads');
     }
 
-    const data = await response.json();
-    return Array.isArray(data) ? data : [];
+    return allResults<Lead>(response, init);
   },
 
   createLead: async (leadData: Lead) => {
@@ -0,0 +1,84 @@
+"""
+Helpers for the async views. DRF's APIView only runs synchronously:
+``AsyncAPIView`` runs its checks on a thread and awaits the handler, and the
+plain Django views in employee/views.py use the functions below for request
+parsing, authentication and JSON error responses.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines.
+
+    Authentication, permissions, throttling and content negotiation run
+    through ``APIView.initial`` on the ORM thread and errors go through the
+    configured exception handler, so responses match the synchronous views.
+    Only the handler runs on the event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def request_data(request):
+    """The JSON or form body of ``request`` as a mapping, or None if it is not valid JSON."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+async def authenticated_user(request):
+    """Run the configured DRF authentication classes for a plain Django view."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = await sync_to_async(lambda: drf_request.user)()
+    except exceptions.APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+def not_authenticated():
+    return JsonResponse({"detail": "Authentication credentials were not provided."},
+                        status=status.HTTP_401_UNAUTHORIZED)
+
+
+def api_error(exc):
+    """JSON response for a DRF ``APIException``, as DRF's exception handler would send it."""
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return JsonResponse(detail, status=exc.status_code, safe=False)
+
+
+def invalid_body():
+    return JsonResponse({"error": "Invalid request body."}, status=status.HTTP_400_BAD_REQUEST)
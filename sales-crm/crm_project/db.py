@@ -0,0 +1,43 @@
+"""
+Retrying write transactions that lose the race for SQLite's write lock.
+
+With the production profile in settings.py a writer already waits up to
+``busy_timeout`` for the lock, so this only matters under sustained
+contention. ``retry_on_lock`` reruns the whole transaction, so decorate
+the function that owns the outermost ``atomic()`` and has no side effects
+outside the database. Inside a caller's transaction the error is
+re-raised: only the outermost block can be retried.
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+_BACKOFF = 0.05  # seconds before the first retry; doubles per attempt
+
+
+def is_lock_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_lock(func=None, *, using='default'):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            connection = connections[using]
+            attempt = 0
+            while True:
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    attempt += 1
+                    if (attempt > settings.SQLITE_LOCK_RETRIES or connection.in_atomic_block
+                            or not is_lock_error(e)):
+                        raise
+                # Full jitter, so writers that collided do not collide again.
+                time.sleep(random.uniform(0, _BACKOFF * 2 ** (attempt - 1)))
+        return wrapper
+    return decorator if func is None else decorator(func)
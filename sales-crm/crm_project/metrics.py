@@ -0,0 +1,307 @@
+"""
+Per-request performance metrics.
+
+``RequestMetricsMiddleware`` times every request into per-route latency
+histograms. A sample of requests (``METRICS_SAMPLE_RATE``) is also broken
+down into query count, SQL time, serializer time, rendering time, LLM time
+and response size. Sampled requests send the breakdown back in a
+``Server-Timing`` header, so it shows up in the browser's network panel.
+
+Components report their time through ``timed(kind)``:
+
+* SQL: an execute wrapper installed on every database connection.
+* serialize: ``TimedSerializerMixin`` on the response serializers. This
+  includes any queries a serializer triggers itself, so N+1 patterns show
+  up as both serialize and db time.
+* render: ``TimedJSONRenderer``.
+* llm: the BAML calls in leads/scoring.py.
+
+``metrics_view`` (``/api/_metrics``) exposes the aggregates in Prometheus
+text format to scrapers that send ``Authorization: Bearer <METRICS_TOKEN>``
+and to staff users. It does not trust the client address: behind a reverse
+proxy every request comes from the proxy's. The aggregates are kept per
+process: every worker reports its own series, so scrape each worker, or
+accept that one scrape shows one worker.
+
+Other modules count events with ``registry.counter(name, help)``, exported
+as ``crm_<name>_total``; incrementing one is a dict update under the lock.
+"""
+import hmac
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+COMPONENTS = ('db', 'serialize', 'render', 'llm')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = dict.fromkeys(COMPONENTS, 0.0)
+        self.active = set()  # kinds being timed, so nested timers do not count twice
+
+
+@contextmanager
+def timed(kind):
+    """Add the time spent in the block to ``kind`` for the current sampled request."""
+    metrics = _current.get()
+    if metrics is None or kind in metrics.active:
+        yield
+        return
+    metrics.active.add(kind)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.seconds[kind] += time.perf_counter() - started
+        metrics.active.discard(kind)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    metrics.queries += 1
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def _instrument(connection):
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    _instrument(connection)
+
+
+connection_created.connect(_instrument_connection)
+
+
+class TimedSerializerMixin:
+    """Counts ``to_representation`` towards the request's serialize time."""
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Counter:
+    """A process-wide event count, registered with ``MetricsRegistry.counter``."""
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def add(self, amount=1):
+        """Add ``amount`` and return the new value."""
+        with self.registry.lock:
+            self.registry.counts[self.name] += amount
+            return self.registry.counts[self.name]
+
+    @property
+    def value(self):
+        with self.registry.lock:
+            return self.registry.counts[self.name]
+
+
+class MetricsRegistry:
+    """Process-wide aggregates, updated under a lock once per request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # name -> help text
+        self.reset()
+
+    def counter(self, name, help):
+        self.counters[name] = help
+        return Counter(self, name)
+
+    def reset(self):
+        with self.lock:
+            self.buckets = tuple(settings.METRICS_BUCKETS)
+            self.durations = {}  # (method, route) -> Histogram
+            self.responses = defaultdict(int)  # (method, route, status) -> count
+            self.sampled = defaultdict(int)  # (method, route) -> count
+            self.totals = defaultdict(float)  # (name, method, route) -> sum
+            self.counts = defaultdict(int)  # counter name -> value
+
+    def record(self, method, route, status, duration, metrics=None, size=None):
+        key = (method, route)
+        with self.lock:
+            histogram = self.durations.get(key)
+            if histogram is None:
+                histogram = self.durations[key] = Histogram(self.buckets)
+            for n, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram.counts[n] += 1
+                    break
+            histogram.sum += duration
+            histogram.count += 1
+            self.responses[(method, route, status)] += 1
+            if metrics is not None:
+                self.sampled[key] += 1
+                self.totals[('db_queries', method, route)] += metrics.queries
+                for kind, seconds in metrics.seconds.items():
+                    self.totals[(f'{kind}_seconds', method, route)] += seconds
+                if size is not None:
+                    self.totals[('response_bytes', method, route)] += size
+
+    def exposition(self):
+        """The aggregates in Prometheus text format."""
+        with self.lock:
+            lines = [
+                '# HELP crm_http_request_duration_seconds Request latency by route.',
+                '# TYPE crm_http_request_duration_seconds histogram',
+            ]
+            for (method, route), histogram in sorted(self.durations.items()):
+                labels = _labels(method=method, route=route)
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'crm_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'crm_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'crm_http_request_duration_seconds_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'crm_http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+
+            lines += ['# HELP crm_http_responses_total Responses by route and status code.',
+                      '# TYPE crm_http_responses_total counter']
+            for (method, route, status), count in sorted(self.responses.items()):
+                lines.append(f'crm_http_responses_total{{{_labels(method=method, route=route, status=status)}}} {count}')
+
+            lines += ['# HELP crm_http_sampled_requests_total Requests broken down into the totals below.',
+                      '# TYPE crm_http_sampled_requests_total counter']
+            for (method, route), count in sorted(self.sampled.items()):
+                lines.append(f'crm_http_sampled_requests_total{{{_labels(method=method, route=route)}}} {count}')
+
+            for name in ('db_queries', *(f'{kind}_seconds' for kind in COMPONENTS), 'response_bytes'):
+                series = sorted((key[1:], value) for key, value in self.totals.items() if key[0] == name)
+                if not series:
+                    continue
+                lines += [f'# HELP crm_http_{name}_total Sum over sampled requests.',
+                          f'# TYPE crm_http_{name}_total counter']
+                for (method, route), value in series:
+                    lines.append(f'crm_http_{name}_total{{{_labels(method=method, route=route)}}} {value}')
+
+            for name, help in sorted(self.counters.items()):
+                lines += [f'# HELP crm_{name}_total {help}',
+                          f'# TYPE crm_{name}_total counter',
+                          f'crm_{name}_total {self.counts[name]}']
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+registry = MetricsRegistry()
+
+
+_ANCHORS = re.compile(r'(^|/)\^|\$$')
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    # Label by URL pattern, not path: one series per endpoint, not per object.
+    # Router patterns are regexes; drop their anchors, not the ^ of [^/.].
+    return _ANCHORS.sub(r'\1', match.route)
+
+
+def _begin():
+    metrics = RequestMetrics() if random.random() < settings.METRICS_SAMPLE_RATE else None
+    return metrics, _current.set(metrics), time.perf_counter()
+
+
+def _finish(request, response, metrics, token, started):
+    duration = time.perf_counter() - started
+    _current.reset(token)
+    size = None if response.streaming else len(response.content)
+    registry.record(request.method, _route(request), response.status_code, duration, metrics, size)
+    if metrics is not None:
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.seconds["db"] * 1000:.1f};desc="{metrics.queries} queries"',
+            *(f'{kind};dur={metrics.seconds[kind] * 1000:.1f}' for kind in COMPONENTS[1:] if metrics.seconds[kind]),
+            *([f'response;desc="{size} bytes"'] if size is not None else []),
+            f'total;dur={duration * 1000:.1f}',
+        ])
+    return response
+
+
+@sync_and_async_middleware
+def RequestMetricsMiddleware(get_response):
+    # Connections opened from here on are instrumented by connection_created.
+    for connection in connections.all(initialized_only=True):
+        _instrument(connection)
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics, token, started = _begin()
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            return _finish(request, response, metrics, token, started)
+    else:
+        def middleware(request):
+            metrics, token, started = _begin()
+            try:
+                response = get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            return _finish(request, response, metrics, token, started)
+    return middleware
+
+
+def _may_scrape(request):
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return True
+    # Staff can look with their usual API credentials.
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return False
+    return user.is_authenticated and user.is_staff
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for ``METRICS_TOKEN`` holders and staff."""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,112 @@
+"""
+Read replica routing.
+
+``ReplicaRoutingMiddleware`` decides per request where reads go: safe
+(GET/HEAD/OPTIONS) requests read from one of ``DATABASE_REPLICAS``,
+everything else from the primary. ``PrimaryReplicaRouter`` applies that
+decision to every ORM query of the request. Writes always go to the
+primary, and once a request writes, its remaining reads do too.
+
+Replicas lag, so a client that just wrote would not see its own write on
+its next GET. A request that writes sets a cookie that sends that client's
+reads to the primary for ``DATABASE_REPLICA_STICKY_SECONDS``.
+
+Reads that decide who a request is authenticated as (``PRIMARY_MODELS``)
+always go to the primary: a lagging replica would still accept a token or
+session deleted at logout.
+
+Code outside a request (management commands, the scoring worker, shell)
+always uses the primary.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+
+STICKY_COOKIE = 'crm_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PRIMARY_MODELS = {'authtoken.Token', 'sessions.Session', 'employee.RevokedToken'}
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class _RequestRouting:
+    def __init__(self, replica):
+        self.replica = replica  # None: read from the primary
+        self.wrote = False
+
+
+def read_alias():
+    """The database reads in the current context go to."""
+    routing = _routing.get()
+    return routing.replica if routing is not None and routing.replica else DEFAULT_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.concrete_model._meta.label in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            # Read our own writes for the rest of the request.
+            routing.replica = None
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+def _sticky(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _begin(request):
+    replica = None
+    if settings.DATABASE_REPLICAS and request.method in SAFE_METHODS and not _sticky(request):
+        replica = random.choice(settings.DATABASE_REPLICAS)
+    routing = _RequestRouting(replica)
+    return routing, _routing.set(routing)
+
+
+def _finish(routing, token, response):
+    _routing.reset(token)
+    if routing.wrote and settings.DATABASE_REPLICAS:
+        seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+        response.set_cookie(STICKY_COOKIE, f"{time.time() + seconds:.3f}", max_age=seconds, httponly=True)
+    return response
+
+
+@sync_and_async_middleware
+def ReplicaRoutingMiddleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            routing, token = _begin(request)
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _routing.reset(token)
+                raise
+            return _finish(routing, token, response)
+    else:
+        def middleware(request):
+            routing, token = _begin(request)
+            try:
+                response = get_response(request)
+            except BaseException:
+                _routing.reset(token)
+                raise
+            return _finish(routing, token, response)
+    return middleware
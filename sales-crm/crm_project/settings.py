@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 from corsheaders.defaults import default_headers
@@ -42,16 +43,20 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt',
     'corsheaders',
     'employee',
     'leads',
     'invoices',
     'settings', 
+    'search',
 ]
 
 MIDDLEWARE = [
+    'crm_project.metrics.RequestMetricsMiddleware',  # outermost, so it times the whole stack
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'crm_project.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,6 +93,60 @@ DATABASES = {
     }
 }
 
+# SQLite connection profile:
+#   'production' - WAL journal, writers queue on the lock instead of failing,
+#                  persistent connections (see crm_project/db.py for write retries)
+#   'basic'      - SQLite and Django defaults
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'production')
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers and the writer no longer block each other
+    'synchronous': 'NORMAL',  # fsync at checkpoints, not every commit; safe with WAL
+    'busy_timeout': int(float(os.getenv('SQLITE_BUSY_TIMEOUT', '5')) * 1000),  # ms to wait for the write lock
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),  # bytes
+    'cache_size': -int(os.getenv('SQLITE_CACHE_KB', str(64 * 1024))),  # negative = KiB, per connection
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRODUCTION = {
+    'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),  # seconds to keep a connection open
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # Take the write lock at BEGIN: a deferred transaction that reads
+        # and then writes cannot wait for the lock and fails at once.
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        'init_command': ';'.join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+    },
+}
+if SQLITE_PROFILE == 'production':
+    DATABASES['default'].update(SQLITE_PRODUCTION)
+# Attempts for write transactions that still find the database locked (see crm_project/db.py)
+SQLITE_LOCK_RETRIES = int(os.getenv('SQLITE_LOCK_RETRIES', '5'))
+
+# Read replicas (see crm_project/replicas.py): comma-separated SQLite paths kept
+# in sync with the primary by file-level replication (LiteFS, Litestream, ...).
+# They are added as replica1, replica2, ... and opened read-only.
+DATABASE_REPLICAS = []  # aliases safe requests read from
+for _n, _path in enumerate(filter(None, os.getenv('DATABASE_REPLICA_PATHS', '').split(',')), start=1):
+    _options = dict(DATABASES['default'].get('OPTIONS', {}))
+    _options.pop('transaction_mode', None)  # BEGIN IMMEDIATE takes a write lock
+    _options['init_command'] = ';'.join(filter(None, [_options.get('init_command'), 'PRAGMA query_only=1']))
+    DATABASES[f'replica{_n}'] = {**DATABASES['default'], 'NAME': _path.strip(), 'OPTIONS': _options}
+    DATABASE_REPLICAS.append(f'replica{_n}')
+DATABASE_ROUTERS = ['crm_project.replicas.PrimaryReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '10'))  # reads stay on the primary after a write
+
+# Cache shared by all worker processes (version stamps, throttle counters and
+# other cross-worker state). Point it at Redis/Memcached in production if available.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', str(BASE_DIR / '.django_cache')),
+    }
+}
+
+# `manage.py test` swaps in a local-memory cache and adds a stand-in replica (see crm_project/testing.py)
+TEST_RUNNER = 'crm_project.testing.TestRunner'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -119,15 +178,112 @@ STATIC_URL = 'static/'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Rest Framework settings
-REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [
+# API authentication mode:
+#   'token' - DRF token keys, looked up in the database on every request
+#   'jwt'   - stateless JWTs verified from their signature (see employee/authentication.py)
+#   'both'  - accept either, for migrating clients; login issues JWTs
+API_AUTH_MODE = os.getenv('API_AUTH_MODE', 'token')
+_AUTHENTICATION_CLASSES = {
+    'token': ['rest_framework.authentication.TokenAuthentication'],
+    'jwt': ['employee.authentication.StatelessJWTAuthentication'],
+    'both': [
+        'employee.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
+}
+
+# Rest Framework settings
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': _AUTHENTICATION_CLASSES[API_AUTH_MODE],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'crm_project.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For. Throttles
+    # (and employee/throttling.py) key on that entry; 0 trusts only REMOTE_ADDR.
+    'NUM_PROXIES': int(os.getenv('API_NUM_PROXIES', '0')),
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', '15'))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.getenv('JWT_REFRESH_DAYS', '7'))),
+    'ROTATE_REFRESH_TOKENS': True,
+    'UPDATE_LAST_LOGIN': False,  # would add a write to every login and refresh
+    # The frontend sends "Token <value>"; accept it for JWTs too.
+    'AUTH_HEADER_TYPES': ('Bearer', 'Token'),
+    'TOKEN_OBTAIN_SERIALIZER': 'employee.tokens.EmployeeTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'employee.tokens.RotatingTokenRefreshSerializer',
 }
+JWT_REVOCATION_SYNC_INTERVAL = float(os.getenv('JWT_REVOCATION_SYNC_INTERVAL', '30'))  # seconds between revocation list syncs
+
+# Password hashing for login/register/password change (see employee/hashing.py)
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', str(os.cpu_count() or 2)))  # hashes in parallel
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv('PASSWORD_HASHING_MAX_PENDING', '256'))  # queued hashes before answering 503
+# Attempts allowed per window, checked before any hashing (see employee/throttling.py)
+LOGIN_THROTTLE_WINDOW = int(os.getenv('LOGIN_THROTTLE_WINDOW', '60'))  # seconds
+LOGIN_THROTTLE_PER_USERNAME = int(os.getenv('LOGIN_THROTTLE_PER_USERNAME', '10'))
+LOGIN_THROTTLE_PER_IP = int(os.getenv('LOGIN_THROTTLE_PER_IP', '300'))
+
+# Keyset pagination for list endpoints (see leads/pagination.py)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '500'))
+
+# Rows fetched per database round trip by the streaming CSV/NDJSON exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Bulk lead import
+LEAD_IMPORT_CHUNK_SIZE = int(os.getenv('LEAD_IMPORT_CHUNK_SIZE', '2000'))  # rows validated/committed together
+LEAD_IMPORT_BATCH_SIZE = int(os.getenv('LEAD_IMPORT_BATCH_SIZE', '500'))  # rows per INSERT statement
+LEAD_IMPORT_MAX_REPORTED_ERRORS = int(os.getenv('LEAD_IMPORT_MAX_REPORTED_ERRORS', '1000'))
+
+# Lead scoring
+LEAD_SCORING_CONCURRENCY = int(os.getenv('LEAD_SCORING_CONCURRENCY', '16'))  # LLM calls in flight per batch
+# OpenAI-compatible endpoint to score with instead of the client in baml_src (e.g. a local stub)
+LEAD_SCORING_LLM_BASE_URL = os.getenv('LEAD_SCORING_LLM_BASE_URL', '')
+LEAD_SCORING_LLM_MODEL = os.getenv('LEAD_SCORING_LLM_MODEL', 'deepseek-ai/DeepSeek-V3')
+LEAD_BATCH_MAX_SIZE = int(os.getenv('LEAD_BATCH_MAX_SIZE', '10000'))  # leads per bulk request
+LEAD_SCORE_CACHE_TTL = int(os.getenv('LEAD_SCORE_CACHE_TTL', str(30 * 24 * 3600)))  # seconds
+LEAD_SCORE_CACHE_MAX_ENTRIES = int(os.getenv('LEAD_SCORE_CACHE_MAX_ENTRIES', '100000'))
+LEAD_SCORE_CACHE_PRUNE_EVERY = int(os.getenv('LEAD_SCORE_CACHE_PRUNE_EVERY', '500'))  # stored entries between prunes; the bound can be overshot by this many
+LEAD_EXAMPLES_PER_TIER = int(os.getenv('LEAD_EXAMPLES_PER_TIER', '1'))  # nearest reference leads per tier in the prompt
+LEAD_EXAMPLES_SYNC_INTERVAL = float(os.getenv('LEAD_EXAMPLES_SYNC_INTERVAL', '1'))  # seconds between cross-process version checks
+SCORING_JOB_MAX_ATTEMPTS = int(os.getenv('SCORING_JOB_MAX_ATTEMPTS', '3'))
+SCORING_JOB_TIMEOUT = int(os.getenv('SCORING_JOB_TIMEOUT', '300'))  # seconds before a running job is presumed dead
+
+# Bulk invoice creation
+INVOICE_BULK_MAX_SIZE = int(os.getenv('INVOICE_BULK_MAX_SIZE', '10000'))  # invoices per bulk request
+INVOICE_BULK_BATCH_SIZE = int(os.getenv('INVOICE_BULK_BATCH_SIZE', '500'))  # rows per INSERT statement
+
+# Server-assigned invoice numbers (see invoices/numbering.py)
+INVOICE_NUMBER_PREFIX = os.getenv('INVOICE_NUMBER_PREFIX', 'INV-')
+INVOICE_NUMBER_FORMAT = os.getenv('INVOICE_NUMBER_FORMAT', '{prefix}{number:06d}')
+INVOICE_NUMBER_START = int(os.getenv('INVOICE_NUMBER_START', '1'))  # lowest first value when the counter row is created
+INVOICE_NUMBER_BLOCK_SIZE = int(os.getenv('INVOICE_NUMBER_BLOCK_SIZE', '100'))  # values reserved per round trip
+
+# Invoice PDFs (see invoices/pdf.py)
+INVOICE_PDF_CACHE_DIR = os.getenv('INVOICE_PDF_CACHE_DIR', str(BASE_DIR / '.invoice_pdfs'))
+INVOICE_PDF_WORKERS = int(os.getenv('INVOICE_PDF_WORKERS', str(os.cpu_count() or 2)))  # rendering processes
+INVOICE_PDF_LOGO_TIMEOUT = float(os.getenv('INVOICE_PDF_LOGO_TIMEOUT', '5'))  # seconds to fetch the logo URL
+
+# Full-text search backend (dotted path); empty picks FTS5 on SQLite and LIKE elsewhere
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', '')
+# /api/search/: a term matching more rows than this is too common to rank by (see SQLiteFTSBackend.search)
+SEARCH_RANK_CANDIDATES = int(os.getenv('SEARCH_RANK_CANDIDATES', '2000'))
+SEARCH_MAX_OFFSET = int(os.getenv('SEARCH_MAX_OFFSET', '1000'))  # deepest result reachable by paging
+
+# Request metrics: Server-Timing headers and /api/_metrics (see crm_project/metrics.py)
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '1' if DEBUG else '0.1'))  # share of requests broken down by component
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # latency histogram bounds, seconds
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # scrapers send it as a bearer token; empty: staff users only
+
+# Site settings are cached per process; seconds between checks of the shared version stamp
+SITE_SETTINGS_CHECK_INTERVAL = float(os.getenv('SITE_SETTINGS_CHECK_INTERVAL', '1'))
+# The server fetches the site logo for invoice PDFs (see settings/logo.py); empty allows any public host
+SITE_LOGO_ALLOWED_HOSTS = [host for host in os.getenv('SITE_LOGO_ALLOWED_HOSTS', '').split(',') if host]  # '.example.com' includes subdomains
+SITE_LOGO_MAX_BYTES = int(os.getenv('SITE_LOGO_MAX_BYTES', str(2 * 1024 * 1024)))
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
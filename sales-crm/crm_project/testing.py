@@ -0,0 +1,139 @@
+"""
+Shared test harnesses: query-plan and query-budget test cases for the
+apps' tests.py modules, and the runner ``manage.py test`` uses (TEST_RUNNER).
+"""
+import re
+from collections import Counter
+from unittest import skipUnless
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from employee.models import Employee
+
+# Tests must not write the file cache into the source tree or share it with a
+# running server.
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Stand-in read replica with its own empty test database. Nothing routes to it
+# unless a test turns routing on with override_settings(DATABASE_REPLICAS=[TEST_REPLICA]).
+TEST_REPLICA = 'replica'
+
+
+class TestRunner(DiscoverRunner):
+    def setup_databases(self, **kwargs):
+        if TEST_REPLICA not in connections.settings:
+            primary = connections.settings[DEFAULT_DB_ALIAS]
+            # No test NAME: SQLite gives the alias its own in-memory database.
+            connections.settings[TEST_REPLICA] = {**primary, 'TEST': {**primary['TEST'], 'NAME': None}}
+        return super().setup_databases(**kwargs)
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(CACHES=TEST_CACHES)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+def query_plan(queryset):
+    """Detail lines of SQLite's EXPLAIN QUERY PLAN for ``queryset``."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return sql, [row[-1] for row in cursor.fetchall()]
+
+
+@skipUnless(connection.vendor == 'sqlite', "Query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTestCase(TestCase):
+    """Fails when a hot query falls back to a full table scan or an in-memory sort."""
+
+    def assertIndexed(self, queryset):
+        sql, plan = query_plan(queryset)
+        table = queryset.model._meta.db_table
+        regressions = [
+            line for line in plan
+            if (line.startswith(f'SCAN {table}') and 'INDEX' not in line) or 'TEMP B-TREE' in line
+        ]
+        if regressions:
+            self.fail(
+                f"Query is no longer served by an index:\n{sql}\n\nPlan:\n" + "\n".join(plan)
+            )
+
+
+_SAVEPOINT = re.compile(r'(RELEASE |ROLLBACK TO )?SAVEPOINT ')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _statement(sql):
+    """``sql`` with its literal values replaced, so repeats of one query compare equal."""
+    return _LITERALS.sub('?', sql)
+
+
+# The per-process copies of the site settings, reference leads and JWT
+# revocations re-check the database once per interval. Any first load lands in
+# the smaller run; long intervals keep a re-check out of the larger one.
+@override_settings(SITE_SETTINGS_CHECK_INTERVAL=3600, LEAD_EXAMPLES_SYNC_INTERVAL=3600,
+                   JWT_REVOCATION_SYNC_INTERVAL=3600)
+class QueryBudgetTestCase(TestCase):
+    """
+    Calls an endpoint once with ``rows`` rows seeded and again with ten
+    times as many, and fails when its query count grows with the data or
+    goes over the budget the test declares. The failure lists the
+    statements that repeat more often at the larger size, which is where
+    an N+1 shows up.
+    """
+    rows = 5
+
+    def setUp(self):
+        self.user = Employee.objects.create_user(username='budget', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.seeded = 0
+
+    def seed(self, count):
+        """Add ``count`` more rows of whatever the endpoints under test read."""
+        raise NotImplementedError
+
+    def assertQueryBudget(self, budget, method, path, data=None, format='json'):
+        """
+        Request ``path`` after seeding ``rows`` and again after ``10 * rows``.
+        ``path`` and ``data`` may be callables, evaluated after each seeding
+        and outside the counted queries.
+        """
+        runs = []
+        for total in (self.rows, self.rows * 10):
+            self.seed(total - self.seeded)
+            self.seeded = total
+            url = path() if callable(path) else path
+            body = data() if callable(data) else data
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, body, format=format)
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+            if response.status_code >= 400:
+                self.fail(f"{method.upper()} {url} answered {response.status_code}: {content[:500]!r}")
+            # Savepoints come from the test's own transaction, not the endpoint.
+            runs.append([query['sql'] for query in queries.captured_queries
+                         if not _SAVEPOINT.match(query['sql'])])
+
+        small, large = runs
+        problems = []
+        if len(large) > len(small):
+            problems.append(f"{len(small)} queries with {self.rows} rows but {len(large)} with {self.rows * 10}")
+        if len(large) > budget:
+            problems.append(f"{len(large)} queries, over the budget of {budget}")
+        if problems:
+            before = Counter(map(_statement, small))
+            grown = [
+                f"  {count}x (was {before[sql]}x): {sql}"
+                for sql, count in Counter(map(_statement, large)).items() if count > before[sql]
+            ]
+            self.fail(
+                "; ".join(problems)
+                + ("\n\nStatements that repeat more with more rows:\n" + "\n".join(grown) if grown else "")
+                + "\n\nQueries with more rows:\n" + "\n".join(f"  {n}. {sql}" for n, sql in enumerate(large, 1))
+            )
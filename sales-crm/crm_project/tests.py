@@ -0,0 +1,254 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.throttling import UserRateThrottle
+from rest_framework.views import APIView
+
+from employee.models import Employee, RevokedToken
+from employee.revocation import RevocationList
+from leads.models import Lead
+from . import replicas
+from .async_api import AsyncAPIView
+from .metrics import RequestMetrics, registry
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.user = Employee.objects.create_user(username='observer', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scrape(self):
+        staff = Employee.objects.create_user(username='scraper', password=None, is_staff=True)
+        response = APIClient().get('/api/_metrics', HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=staff).key}')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+
+class ServerTimingTests(MetricsTestCase):
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_sampled_requests_send_the_breakdown(self):
+        Lead.objects.create(company_name='Timed Co', email='t@x.com')
+        response = self.client.get('/api/leads/')
+        self.assertEqual(response.status_code, 200)
+        parts = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertEqual(parts[0], 'db')
+        self.assertEqual(parts[-2:], ['response', 'total'])
+        self.assertRegex(response['Server-Timing'], r'^db;dur=\d+\.\d;desc="[1-9]\d* queries"')
+        self.assertIn(f'response;desc="{len(response.content)} bytes"', response['Server-Timing'])
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_only_timed(self):
+        response = self.client.get('/api/leads/')
+        self.assertNotIn('Server-Timing', response)
+        metrics = self.scrape()
+        self.assertIn('crm_http_request_duration_seconds_count{method="GET",route="api/leads/"} 1', metrics)
+        self.assertNotIn('crm_http_sampled_requests_total{method="GET",route="api/leads/"}', metrics)
+
+
+@override_settings(METRICS_BUCKETS=(0.1, 1))
+class ExpositionTests(SimpleTestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_histogram_format(self):
+        registry.record('GET', 'api/leads/', 200, 0.05)
+        registry.record('GET', 'api/leads/', 200, 0.5)
+        registry.record('GET', 'api/leads/', 500, 3)
+        lines = registry.exposition().splitlines()
+        labels = 'method="GET",route="api/leads/"'
+        self.assertEqual(lines[:7], [
+            '# HELP crm_http_request_duration_seconds Request latency by route.',
+            '# TYPE crm_http_request_duration_seconds histogram',
+            f'crm_http_request_duration_seconds_bucket{{{labels},le="0.1"}} 1',
+            f'crm_http_request_duration_seconds_bucket{{{labels},le="1"}} 2',
+            f'crm_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3',
+            f'crm_http_request_duration_seconds_sum{{{labels}}} 3.55',
+            f'crm_http_request_duration_seconds_count{{{labels}}} 3',
+        ])
+        self.assertIn(f'crm_http_responses_total{{{labels},status="200"}} 2', lines)
+        self.assertIn(f'crm_http_responses_total{{{labels},status="500"}} 1', lines)
+        # Nothing was sampled, so no per-component totals.
+        self.assertFalse([line for line in lines if line.startswith('crm_http_db_queries_total')])
+
+    def test_sampled_totals(self):
+        metrics = RequestMetrics()
+        metrics.queries = 3
+        metrics.seconds['db'] = 0.25
+        registry.record('POST', 'api/leads/', 201, 0.3, metrics, size=120)
+        lines = registry.exposition().splitlines()
+        labels = 'method="POST",route="api/leads/"'
+        self.assertIn(f'crm_http_sampled_requests_total{{{labels}}} 1', lines)
+        self.assertIn(f'crm_http_db_queries_total{{{labels}}} 3.0', lines)
+        self.assertIn(f'crm_http_db_seconds_total{{{labels}}} 0.25', lines)
+        self.assertIn(f'crm_http_response_bytes_total{{{labels}}} 120.0', lines)
+        self.assertIn('# TYPE crm_http_db_queries_total counter', lines)
+
+    def test_label_escaping(self):
+        registry.record('GET', 'odd"route\\\n', 200, 0.01)
+        self.assertIn('route="odd\\"route\\\\\\n"', registry.exposition())
+
+
+class RouteLabelTests(MetricsTestCase):
+    def test_routes_are_labelled_by_pattern(self):
+        lead = Lead.objects.create(company_name='Routed Co', email='r@x.com')
+        self.client.get(f'/api/leads/{lead.pk}/')
+        self.client.get('/api/invoices/12345/')
+        self.client.get('/api/no-such-endpoint/')
+        metrics = self.scrape()
+        self.assertIn('route="api/leads/<int:pk>/"', metrics)
+        # Router patterns lose their regex anchors.
+        self.assertIn('route="api/invoices/(?P<pk>[^/.]+)/"', metrics)
+        self.assertIn('crm_http_responses_total{method="GET",route="unmatched",status="404"} 1', metrics)
+        self.assertNotIn(str(lead.pk) + '/"', metrics)
+        self.assertNotIn('12345', metrics)
+
+
+class MetricsAccessTests(MetricsTestCase):
+    def test_anonymous_and_non_staff_are_refused(self):
+        self.assertEqual(APIClient().get('/api/_metrics').status_code, 403)
+        token = Token.objects.create(user=self.user).key
+        self.assertEqual(APIClient().get('/api/_metrics', HTTP_AUTHORIZATION=f'Token {token}').status_code, 403)
+        # A loopback address is no credential: it is what a local reverse proxy sends.
+        self.assertEqual(APIClient().get('/api/_metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    def test_staff_may_scrape(self):
+        self.assertIn('# TYPE crm_http_request_duration_seconds histogram', self.scrape())
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_bearer_token(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_matches_nothing(self):
+        self.assertEqual(APIClient().get('/api/_metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class _StaffOnly:
+    permission_classes = [IsAdminUser]
+
+
+class _SyncView(_StaffOnly, APIView):
+    def get(self, request):
+        return Response({'ok': True})
+
+
+class _AsyncView(_StaffOnly, AsyncAPIView):
+    async def get(self, request):
+        return Response({'ok': True})
+
+
+class _Throttle(UserRateThrottle):
+    rate = '1/min'
+
+
+class AsyncAPIViewTests(TestCase):
+    """AsyncAPIView answers exactly as the equivalent synchronous APIView."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def call(self, view_class, user=None, **initkwargs):
+        request = self.factory.get('/shape/')
+        if user is not None:
+            force_authenticate(request, user)
+        view = view_class.as_view(**initkwargs)
+        response = async_to_sync(view)(request) if view_class.view_is_async else view(request)
+        response.render()
+        return response
+
+    def assertSameResponse(self, user=None, **initkwargs):
+        sync = self.call(_SyncView, user, **initkwargs)
+        async_ = self.call(_AsyncView, user, **initkwargs)
+        self.assertEqual((async_.status_code, async_.content), (sync.status_code, sync.content))
+        self.assertEqual(async_.get('WWW-Authenticate'), sync.get('WWW-Authenticate'))
+        return async_
+
+    def test_not_authenticated(self):
+        self.assertEqual(self.assertSameResponse().status_code, 401)
+
+    def test_permission_denied(self):
+        user = Employee.objects.create_user(username='clerk', password=None)
+        self.assertEqual(self.assertSameResponse(user).status_code, 403)
+
+    def test_handler_runs_for_permitted_users(self):
+        staff = Employee.objects.create_user(username='boss', password=None, is_staff=True)
+        self.assertEqual(self.assertSameResponse(staff).data, {'ok': True})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_throttled(self):
+        staff = Employee.objects.create_user(username='busy', password=None, is_staff=True)
+        for view_class in (_SyncView, _AsyncView):
+            cache.clear()
+            self.assertEqual(self.call(view_class, staff, throttle_classes=[_Throttle]).status_code, 200)
+            response = self.call(view_class, staff, throttle_classes=[_Throttle])
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '60')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The ``replica`` alias gets its own SQLite test database. Nothing copies
+    rows between the two, so which rows come back shows which database a
+    request read from.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Employee.objects.create_user(username='router', password='x'))
+        Lead.objects.using('default').create(email='primary@example.com')
+        Lead.objects.using('replica').create(email='replica@example.com')
+
+    def list_emails(self):
+        response = self.client.get('/api/leads/')
+        self.assertEqual(response.status_code, 200)
+        return {lead['email'] for lead in response.json()['results']}
+
+    def test_list_reads_from_replica(self):
+        self.assertEqual(self.list_emails(), {'replica@example.com'})
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        response = self.client.post('/api/leads/', {'email': 'new@example.com'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Lead.objects.using('default').filter(email='new@example.com').exists())
+        self.assertFalse(Lead.objects.using('replica').filter(email='new@example.com').exists())
+        self.assertEqual(self.list_emails(), {'primary@example.com', 'new@example.com'})
+
+    def test_primary_again_once_the_window_passes(self):
+        self.client.post('/api/leads/', {'email': 'new@example.com'}, format='json')
+        with override_settings(DATABASE_REPLICA_STICKY_SECONDS=0):
+            self.client.cookies.clear()
+            self.client.post('/api/leads/', {'email': 'other@example.com'}, format='json')
+        self.assertEqual(self.list_emails(), {'replica@example.com'})
+
+    def test_code_outside_requests_uses_primary(self):
+        self.assertEqual(set(Lead.objects.values_list('email', flat=True)), {'primary@example.com'})
+
+    def test_token_deleted_on_primary_is_rejected(self):
+        # A replica that has not caught up with a logout still has the token.
+        user = Employee.objects.db_manager('replica').create_user(username='lagging', password='x')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.using('replica').create(user=user).key}")
+        self.assertEqual(client.get('/api/leads/').status_code, 401)
+
+    def test_revocations_sync_from_primary(self):
+        RevokedToken.objects.using('default').create(jti='revoked', expires_at=timezone.now() + timedelta(hours=1))
+        token = replicas._routing.set(replicas._RequestRouting('replica'))
+        try:
+            self.assertTrue(RevocationList().is_revoked('revoked'))
+        finally:
+            replicas._routing.reset(token)
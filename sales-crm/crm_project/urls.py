@@ -1,10 +1,14 @@
 ﻿from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/_metrics', metrics_view, name='metrics'),
     path('api/', include('leads.urls')),
     path('api/employee/', include('employee.urls')),
     path('api/', include('invoices.urls')),
     path('api/settings/', include('settings.urls')),  # Added settings API endpoint
+    path('api/search/', include('search.urls')),
 ]
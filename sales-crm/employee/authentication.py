@@ -0,0 +1,28 @@
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import revocations
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates from the JWT alone: the signature and expiry are checked
+    and ``request.user`` is a ``TokenUser`` built from the token's claims,
+    so no query is made per request. Revoked tokens are rejected from the
+    in-memory list in employee/revocation.py.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        # Not a JWT (e.g. a DRF token key while both modes are enabled):
+        # leave it to the next authentication class.
+        if raw_token is None or raw_token.count(b'.') != 2:
+            return None
+        token = self.get_validated_token(raw_token)
+        if revocations.is_revoked(token[api_settings.JTI_CLAIM]):
+            raise InvalidToken({'detail': 'Token has been revoked', 'code': 'token_revoked'})
+        return self.get_user(token), token
@@ -0,0 +1,57 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 takes hundreds of milliseconds per call. The async auth views run it
+on a bounded thread pool (hashlib releases the GIL while hashing, so the
+pool uses every core) and await the result, leaving the event loop free to
+serve other requests. When more than ``PASSWORD_HASHING_MAX_PENDING``
+hashes are queued, new ones are refused with ``HashingOverloaded`` instead
+of growing the queue without limit.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING_WORKERS, thread_name_prefix='password-hashing')
+_pending = threading.BoundedSemaphore(settings.PASSWORD_HASHING_MAX_PENDING)
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+async def _run(fn, *args):
+    if not _pending.acquire(blocking=False):
+        raise HashingOverloaded()
+    try:
+        return await asyncio.wrap_future(_executor.submit(fn, *args))
+    finally:
+        _pending.release()
+
+
+def _verify(password, encoded):
+    valid = check_password(password, encoded)
+    # Re-hash when the stored hash uses outdated parameters, as
+    # AbstractBaseUser.check_password would.
+    if valid and identify_hasher(encoded).must_update(encoded):
+        return True, make_password(password)
+    return valid, None
+
+
+async def hash_password(password):
+    return await _run(make_password, password)
+
+
+async def verify_password(password, encoded):
+    """
+    Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash
+    should be replaced. A missing ``encoded`` still costs one hash so
+    unknown usernames cannot be told apart by timing.
+    """
+    if not encoded:
+        await _run(make_password, password)
+        return False, None
+    return await _run(_verify, password, encoded)
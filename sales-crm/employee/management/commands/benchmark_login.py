@@ -0,0 +1,96 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from employee.models import Employee
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent logins at the async login view through the ASGI handler and "
+        "report throughput, latency and how responsive other requests stay meanwhile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help="Concurrent clients.")
+        parser.add_argument('--logins', type=int, default=1, help="Logins per client.")
+        parser.add_argument('--probe-interval', type=float, default=0.05,
+                            help="Seconds between probe requests to /api/settings/ during the storm.")
+
+    def handle(self, *args, **options):
+        clients, logins = options['clients'], options['logins']
+        prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+        # One hash shared by every benchmark user keeps the setup fast.
+        password = 'benchmark-password'
+        encoded = make_password(password)
+        Employee.objects.bulk_create(
+            [Employee(username=f"{prefix}{n}", password=encoded) for n in range(clients)]
+        )
+        try:
+            # The in-process ASGI client always sends Host: testserver.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = asyncio.run(self.storm(prefix, password, clients, logins, options['probe_interval']))
+        finally:
+            Employee.objects.filter(username__startswith=prefix).delete()
+        self.report(clients, logins, *results)
+
+    async def storm(self, prefix, password, clients, logins, probe_interval):
+        latencies, statuses = [], {}
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def client(n):
+            # A distinct address per client so the per-IP throttle does not kick in.
+            http = AsyncClient(client=[f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}", 0])
+            for _ in range(logins):
+                started = time.perf_counter()
+                response = await http.post('/api/employee/login/',
+                                           {'username': f"{prefix}{n}", 'password': password},
+                                           content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            http = AsyncClient()
+            while not done.is_set():
+                started = time.perf_counter()
+                await http.get('/api/settings/')
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(probe_interval)
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(client(n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+        return elapsed, latencies, statuses, probe_latencies
+
+    def report(self, clients, logins, elapsed, latencies, statuses, probe_latencies):
+        total = clients * logins
+        self.stdout.write(f"{total} logins from {clients} concurrent clients in {elapsed:.2f}s "
+                          f"({total / elapsed:.1f} logins/s)")
+        self.stdout.write("Status codes: " + ", ".join(f"{code}={count}" for code, count in sorted(statuses.items())))
+        self.stdout.write(
+            f"Login latency: p50={statistics.median(latencies) * 1000:.0f}ms "
+            f"p95={_percentile(latencies, 0.95) * 1000:.0f}ms max={max(latencies) * 1000:.0f}ms"
+        )
+        if probe_latencies:
+            self.stdout.write(
+                f"/api/settings/ during the storm ({len(probe_latencies)} probes): "
+                f"p50={statistics.median(probe_latencies) * 1000:.1f}ms "
+                f"p95={_percentile(probe_latencies, 0.95) * 1000:.1f}ms"
+            )
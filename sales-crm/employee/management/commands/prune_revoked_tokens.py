@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from employee.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete revocation entries for JWTs that have expired anyway."
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired revocation entr{'y' if deleted == 1 else 'ies'}."))
@@ -12,4 +12,13 @@ class Employee(AbstractUser):
 
     class Meta:
         verbose_name = 'Employee'
-        verbose_name_plural = 'Employees'
\ No newline at end of file
+        verbose_name_plural = 'Employees'
+
+class RevokedToken(models.Model):
+    """A JWT (by ``jti``) that must no longer be accepted: logged out or already rotated."""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)  # safe to forget after this
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,81 @@
+"""
+In-memory JWT revocation list.
+
+Access tokens are verified without touching the database, so logging out
+records the token's ``jti`` in ``RevokedToken`` and every process keeps a
+copy of the unexpired entries in memory. The copy is refreshed from the
+database at most once per ``JWT_REVOCATION_SYNC_INTERVAL``, so a token
+revoked in another process stops working within that interval (and
+immediately in the process that revoked it).
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+# Re-read recent rows so ones committed late by slow writers are not missed.
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expiry = {}  # jti -> expiry timestamp
+        self._synced_at = None
+        self._checked_at = 0.0
+
+    def is_revoked(self, jti):
+        self._sync_if_due()
+        return jti in self._expiry
+
+    def revoke(self, jti, exp):
+        """
+        Revoke the token with ``jti`` expiring at ``exp`` (a UNIX timestamp).
+        Returns False when it was already revoked.
+        """
+        expires_at = datetime.fromtimestamp(exp, tz=dt_timezone.utc)
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        with self._lock:
+            self._expiry[jti] = exp
+        return True
+
+    def _sync_if_due(self):
+        now = time.monotonic()
+        if now - self._checked_at < settings.JWT_REVOCATION_SYNC_INTERVAL:
+            return
+        with self._lock:
+            if now - self._checked_at < settings.JWT_REVOCATION_SYNC_INTERVAL:
+                return
+            self._checked_at = now
+            self._sync()
+
+    def _sync(self):
+        started = timezone.now()
+        # Never from a replica: one that lags would move _synced_at past
+        # revocations it has not received yet, and they would be skipped for good.
+        rows = RevokedToken.objects.using(DEFAULT_DB_ALIAS).filter(expires_at__gt=started)
+        if self._synced_at is not None:
+            rows = rows.filter(revoked_at__gte=self._synced_at - SYNC_OVERLAP)
+        for jti, expires_at in rows.values_list('jti', 'expires_at'):
+            self._expiry[jti] = expires_at.timestamp()
+        cutoff = started.timestamp()
+        self._expiry = {jti: exp for jti, exp in self._expiry.items() if exp > cutoff}
+        self._synced_at = started
+
+
+revocations = RevocationList()
+
+
+def prune_revoked_tokens():
+    """Delete entries for tokens that have expired anyway; returns the count."""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
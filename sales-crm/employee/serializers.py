@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from crm_project.metrics import TimedSerializerMixin
 from .models import Employee
 
 User = get_user_model()
@@ -21,7 +22,7 @@ class PasswordChangeSerializer(serializers.Serializer):
     old_password = serializers.CharField(write_only=True)
     new_password = serializers.CharField(write_only=True)
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
     
     class Meta:
@@ -43,14 +44,9 @@ class EmployeeSerializer(serializers.ModelSerializer):
                 **validated_data,
                 'password': '[REDACTED]'
             })
-            # Use create_user to properly hash password
-            password = validated_data.pop('password')
-            employee = Employee.objects.create_user(
-                **validated_data
-            )
-            employee.set_password(password)
-            employee.save()
-            return employee
+            # create_user hashes the password once; hashing it again would
+            # double the cost of creating an employee.
+            return Employee.objects.create_user(**validated_data)
         except Exception as e:
             print(f"Error in EmployeeSerializer.create: {str(e)}")
             raise serializers.ValidationError(str(e))
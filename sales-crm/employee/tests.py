@@ -1,3 +1,200 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
\ No newline at end of file
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from crm_project.testing import QueryBudgetTestCase
+from .authentication import StatelessJWTAuthentication
+from .hashing import HashingOverloaded, hash_password
+from .models import Employee
+from .revocation import RevocationList
+from .tokens import issue_tokens
+
+
+class EmployeeQueryBudgetTests(QueryBudgetTestCase):
+    def seed(self, count):
+        start = self.seeded
+        Employee.objects.bulk_create([
+            Employee(username=f'rep-{n}', email=f'rep-{n}@example.com', first_name='Rep', last_name=str(n),
+                     department='Sales')
+            for n in range(start, start + count)
+        ])
+
+    def latest(self):
+        return Employee.objects.order_by('-pk').first()
+
+    def employee_data(self):
+        n = self.seeded
+        return {'username': f'hire-{n}', 'email': f'hire-{n}@example.com', 'password': 'secret',
+                'first_name': 'New', 'last_name': 'Hire'}
+
+    def test_register(self):
+        self.assertQueryBudget(5, 'post', '/api/employee/register/', lambda: {
+            'username': f'signup-{self.seeded}', 'password': 'secret', 'email': f'signup-{self.seeded}@example.com'})
+
+    def test_login(self):
+        self.assertQueryBudget(2, 'post', '/api/employee/login/', {'username': 'budget', 'password': 'x'})
+
+    def test_logout(self):
+        def path():
+            self.client.force_authenticate(self.user, token=Token.objects.create(user=self.user))
+            return '/api/employee/logout/'
+        self.assertQueryBudget(1, 'post', path)
+
+    def test_password_reset(self):
+        self.assertQueryBudget(1, 'post', '/api/employee/reset-password/', lambda: {'email': self.latest().email})
+
+    def test_password_reset_confirm(self):
+        def path():
+            employee = self.latest()
+            uid = urlsafe_base64_encode(force_bytes(employee.pk))
+            return f'/api/employee/reset-password-confirm/{uid}/{default_token_generator.make_token(employee)}/'
+        self.assertQueryBudget(3, 'post', path, {'new_password': 'secret'})
+
+    def test_password_change(self):
+        self.assertQueryBudget(2, 'post', '/api/employee/change-password/', {'old_password': 'x', 'new_password': 'x'})
+
+    def test_employee_list(self):
+        self.assertQueryBudget(1, 'get', '/api/employee/employees/')
+
+    def test_employee_search(self):
+        self.assertQueryBudget(1, 'get', '/api/employee/employees/?q=rep&department=Sales')
+
+    def test_employee_create(self):
+        self.assertQueryBudget(3, 'post', '/api/employee/employees/', self.employee_data)
+
+    def test_employee_detail(self):
+        self.assertQueryBudget(1, 'get', lambda: f'/api/employee/employees/{self.latest().pk}/')
+
+    def test_employee_update(self):
+        self.assertQueryBudget(4, 'put', lambda: f'/api/employee/employees/{self.latest().pk}/', self.employee_data)
+
+    def test_employee_partial_update(self):
+        self.assertQueryBudget(3, 'patch', lambda: f'/api/employee/employees/{self.latest().pk}/',
+                               {'position': 'Lead'})
+
+    def test_employee_delete(self):
+        self.assertQueryBudget(9, 'delete', lambda: f'/api/employee/employees/{self.latest().pk}/')
+
+    def test_jwt_create(self):
+        self.assertQueryBudget(1, 'post', '/api/employee/jwt/create/', {'username': 'budget', 'password': 'x'})
+
+    def test_jwt_refresh(self):
+        self.assertQueryBudget(2, 'post', '/api/employee/jwt/refresh/',
+                               lambda: {'refresh': issue_tokens(self.user)['refresh']})
+
+    def test_jwt_verify(self):
+        self.assertQueryBudget(0, 'post', '/api/employee/jwt/verify/',
+                               lambda: {'token': issue_tokens(self.user)['access']})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EmployeeCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(Employee.objects.create_user(username='manager', password=None))
+
+    def create(self, username='hire'):
+        return self.client.post('/api/employee/employees/', {
+            'username': username, 'email': f'{username}@example.com', 'password': 'secret',
+            'first_name': 'New', 'last_name': 'Hire'}, format='json')
+
+    def test_password_is_hashed_on_the_pool(self):
+        with mock.patch('employee.views.hash_password', wraps=hash_password) as hashed:
+            response = self.create()
+        self.assertEqual(response.status_code, 201)
+        hashed.assert_awaited_once_with('secret')
+        self.assertNotIn('password', response.json())
+        self.assertTrue(Employee.objects.get(pk=response.json()['id']).check_password('secret'))
+
+    def test_overloaded_pool(self):
+        with mock.patch('employee.views.hash_password', side_effect=HashingOverloaded):
+            response = self.create()
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Employee.objects.filter(username='hire').exists())
+
+    @override_settings(LOGIN_THROTTLE_PER_IP=1)
+    def test_throttled(self):
+        self.assertEqual(self.create('first').status_code, 201)
+        response = self.create('second')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().post('/api/employee/employees/', {}, format='json').status_code, 401)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   LOGIN_THROTTLE_PER_IP=1)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def login(self, username, forwarded_for):
+        return APIClient().post('/api/employee/login/', {'username': username, 'password': 'wrong'}, format='json',
+                                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded_for)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_clients_behind_a_proxy_are_counted_apart(self):
+        self.assertNotEqual(self.login('alice', '203.0.113.5').status_code, 429)
+        self.assertNotEqual(self.login('bob', '198.51.100.7').status_code, 429)
+        # Only the entry the proxy appended counts, not what the client sent.
+        self.assertEqual(self.login('carol', 'spoofed, 203.0.113.5').status_code, 429)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.assertNotEqual(self.login('alice', '203.0.113.5').status_code, 429)
+        self.assertEqual(self.login('bob', '198.51.100.7').status_code, 429)
+
+
+class JWTRevocationTests(TestCase):
+    def setUp(self):
+        # Views copy the authentication classes when they are defined, so the
+        # API_AUTH_MODE=jwt setup is patched in for the class-based views.
+        jwt_auth = mock.patch.object(APIView, 'authentication_classes', [StatelessJWTAuthentication])
+        jwt_auth.start()
+        self.addCleanup(jwt_auth.stop)
+        self.user = Employee.objects.create_user(username='jwt', password=None)
+        self.profile = f'/api/employee/employees/{self.user.pk}/'
+        self.tokens = issue_tokens(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def refresh(self, token):
+        return APIClient().post('/api/employee/jwt/refresh/', {'refresh': token}, format='json')
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        self.assertEqual(self.client.get(self.profile).status_code, 200)
+        response = self.client.post('/api/employee/logout/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.profile)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_revoked')
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+    @override_settings(JWT_REVOCATION_SYNC_INTERVAL=0)
+    def test_other_processes_see_the_logout(self):
+        other = RevocationList()
+        jti = AccessToken(self.tokens['access'])['jti']
+        self.assertFalse(other.is_revoked(jti))
+        self.assertEqual(self.client.post('/api/employee/logout/', format='json').status_code, 200)
+        self.assertTrue(other.is_revoked(jti))
+
+    def test_refresh_tokens_are_single_use(self):
+        response = self.refresh(self.tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()['refresh']
+        self.assertNotEqual(rotated, self.tokens['refresh'])
+
+        replayed = self.refresh(self.tokens['refresh'])
+        self.assertEqual(replayed.status_code, 401)
+        self.assertEqual(replayed.json()['detail'], 'Refresh token has already been used or revoked')
+        self.assertEqual(self.refresh(rotated).status_code, 200)
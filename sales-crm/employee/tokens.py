@@ -0,0 +1,42 @@
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import revocations
+
+
+class EmployeeRefreshToken(RefreshToken):
+    """Carries the user fields the API reads from ``request.user`` as claims."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        return token
+
+
+def issue_tokens(user):
+    refresh = EmployeeRefreshToken.for_user(user)
+    return {'access': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+class EmployeeTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = EmployeeRefreshToken
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh tokens are single use: the old token is revoked when it is
+    exchanged, and the unique ``jti`` makes a second (possibly concurrent)
+    use of the same token fail.
+    """
+    token_class = EmployeeRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if not revocations.revoke(refresh[api_settings.JTI_CLAIM], refresh['exp']):
+            raise InvalidToken("Refresh token has already been used or revoked")
+        return super().validate(attrs)
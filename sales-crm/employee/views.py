@@ -1,6 +1,7 @@
 from django.shortcuts import render
 
 # Create your views here.
+from asgiref.sync import sync_to_async
 from rest_framework import status, generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -8,69 +9,139 @@ from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
+from search.filters import FullTextSearchFilter
 
-from django.contrib.auth import authenticate, get_user_model
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 
 from django.core.mail import send_mail
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 
+from crm_project.async_api import authenticated_user, invalid_body, not_authenticated, request_data
+
 from .serializers import PasswordChangeSerializer, PasswordResetSerializer, UserSerializer, EmployeeSerializer
+from .hashing import HashingOverloaded, hash_password, verify_password
 from .models import Employee
+from .revocation import revocations
+from .throttling import throttle_wait
+from .tokens import EmployeeRefreshToken, issue_tokens
 
 User = get_user_model()
 
+async def _credentials(user):
+    """Token(s) for a freshly authenticated user in the configured API_AUTH_MODE."""
+    if settings.API_AUTH_MODE == 'token':
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return {"token": token.key}
+    # "token" stays the credential the frontend sends; it is the access JWT.
+    tokens = issue_tokens(user)
+    return {"token": tokens["access"], **tokens}
+
+def _throttled(retry_after):
+    response = JsonResponse({"error": "Too many attempts, try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+def _overloaded():
+    response = JsonResponse({"error": "Server busy, try again shortly."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
+
+# The views that hash passwords are async: PBKDF2 runs on the bounded pool in
+# employee/hashing.py, after the throttles in employee/throttling.py, so a
+# login storm does not tie up request workers.
+
 # Register a new user
-class RegisterView(APIView):
-    permission_classes = [AllowAny]
+@method_decorator(csrf_exempt, name='dispatch')
+class RegisterView(View):
+    async def post(self, request):
+        data = request_data(request)
+        if data is None:
+            return invalid_body()
+        retry_after = await throttle_wait(request)
+        if retry_after:
+            return _throttled(retry_after)
+        serializer = UserSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def post(self, request):
-        serializer = UserSerializer(data=request.data)
-        if serializer.is_valid():
-            user = serializer.save()
-            token, created = Token.objects.get_or_create(user=user)
-            return Response({"token": token.key}, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields = dict(serializer.validated_data)
+        try:
+            password = await hash_password(fields.pop('password'))
+        except HashingOverloaded:
+            return _overloaded()
+        # What create_user does, with the password hashed off the event loop.
+        user = User(**fields, password=password)
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        try:
+            await user.asave()
+        except IntegrityError:
+            return JsonResponse({"username": ["A user with that username already exists."]},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse(await _credentials(user), status=status.HTTP_201_CREATED)
 
 # Login
-class LoginView(APIView):
-    permission_classes = [AllowAny]
+@method_decorator(csrf_exempt, name='dispatch')
+class LoginView(View):
+    async def post(self, request):
+        data = request_data(request) or {}
+        username = data.get("username")
+        password = data.get("password")
 
-    def post(self, request):
-        try:
-            username = request.data.get("username")
-            password = request.data.get("password")
-            
-            if not username or not password:
-                return Response(
-                    {"error": "Both username and password are required"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if not username or not password:
+            return JsonResponse(
+                {"error": "Both username and password are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        retry_after = await throttle_wait(request, username)
+        if retry_after:
+            return _throttled(retry_after)
 
-            user = authenticate(username=username, password=password)
-            if user:
-                token, _ = Token.objects.get_or_create(user=user)
-                return Response({
-                    "token": token.key,
-                    "is_superuser": user.is_superuser,
-                    "username": user.username
-                })
-            return Response(
-                {"error": "Invalid credentials"}, 
+        user = await User.objects.filter(**{User.USERNAME_FIELD: username}).afirst()
+        try:
+            valid, new_hash = await verify_password(password, user.password if user else None)
+        except HashingOverloaded:
+            return _overloaded()
+        if not valid or not user.is_active:
+            return JsonResponse(
+                {"error": "Invalid credentials"},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        except Exception as e:
-            return Response(
-                {"error": str(e)}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        if new_hash:
+            await User.objects.filter(pk=user.pk).aupdate(password=new_hash)
+        return JsonResponse({
+            **await _credentials(user),
+            "is_superuser": user.is_superuser,
+            "username": user.username
+        })
 
 # Sign out
 class LogoutView(APIView):
     def post(self, request):
-        request.auth.delete()  # Delete token
+        if isinstance(request.auth, Token):
+            request.auth.delete()  # Delete token
+        else:
+            # JWTs cannot be deleted: revoke the access token and, if sent, its refresh token.
+            revocations.revoke(request.auth[jwt_settings.JTI_CLAIM], request.auth['exp'])
+            if request.data.get("refresh"):
+                try:
+                    refresh = EmployeeRefreshToken(request.data["refresh"])
+                except TokenError as e:
+                    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                revocations.revoke(refresh[jwt_settings.JTI_CLAIM], refresh['exp'])
         return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
 
 # Send password reset link via email
@@ -120,68 +191,30 @@ class PasswordResetConfirmView(APIView):
             return Response({"error": "Invalid request."}, status=status.HTTP_400_BAD_REQUEST)
 
 # Change password within account
-class PasswordChangeView(APIView):
-    def post(self, request):
-        serializer = PasswordChangeSerializer(data=request.data)
-        if serializer.is_valid():
-            user = request.user
-            old_password = serializer.validated_data['old_password']
-            new_password = serializer.validated_data['new_password']
-
-            if not user.check_password(old_password):
-                return Response({"error": "Old password is incorrect."}, status=status.HTTP_400_BAD_REQUEST)
-
-            user.set_password(new_password)
-            user.save()
-            return Response({"message": "Password changed successfully."}, status=status.HTTP_200_OK)
+@method_decorator(csrf_exempt, name='dispatch')
+class PasswordChangeView(View):
+    async def post(self, request):
+        user = await authenticated_user(request)
+        if user is None:
+            return not_authenticated()
+        serializer = PasswordChangeSerializer(data=request_data(request) or {})
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
-# View employee list and create new employee
-class EmployeeListCreateView(generics.ListCreateAPIView):
-    queryset = Employee.objects.all()
-    serializer_class = EmployeeSerializer
-    permission_classes = [permissions.IsAuthenticated]  # User must be registered.
-
-    def create(self, request, *args, **kwargs):
+        retry_after = await throttle_wait(request, user.username)
+        if retry_after:
+            return _throttled(retry_after)
+        # With JWT auth the user is a TokenUser built from the token's claims.
+        encoded = await User.objects.filter(pk=user.pk).values_list('password', flat=True).afirst()
         try:
-            # Debug logging
-            print("\n=== Employee Creation Debug ===")
-            print("Headers:", request.headers)
-            print("Data:", request.data)
-            print("User:", request.user)
-            print("Auth:", request.auth)
-            
-            serializer = self.get_serializer(data=request.data)
-            if not serializer.is_valid():
-                print("Validation errors:", serializer.errors)
-                return Response(
-                    {"errors": serializer.errors},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            try:
-                employee = serializer.save()
-                print("Employee created successfully:", employee.id)
-                return Response(
-                    EmployeeSerializer(employee).data,
-                    status=status.HTTP_201_CREATED
-                )
-            except Exception as e:
-                print("Error saving employee:", str(e))
-                return Response(
-                    {"message": str(e)},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-        except Exception as e:
-            print("Unexpected error:", str(e))
-            import traceback
-            print(traceback.format_exc())
-            return Response(
-                {"message": "Internal server error"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            valid, _ = await verify_password(serializer.validated_data['old_password'], encoded)
+            if not valid:
+                return JsonResponse({"error": "Old password is incorrect."}, status=status.HTTP_400_BAD_REQUEST)
+            password = await hash_password(serializer.validated_data['new_password'])
+        except HashingOverloaded:
+            return _overloaded()
+        await User.objects.filter(pk=user.pk).aupdate(password=password)
+        return JsonResponse({"message": "Password changed successfully."}, status=status.HTTP_200_OK)
 
 # View, edit, or delete a specific employee.
 class EmployeeDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -189,13 +222,51 @@ class EmployeeDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = EmployeeSerializer
     permission_classes = [permissions.IsAuthenticated]  # User must be registered.
 
-# Add search and filter
-class EmployeeListCreateView(generics.ListCreateAPIView):
+# View employee list, with search and filter
+class EmployeeListView(generics.ListAPIView):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [permissions.IsAuthenticated]
     
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchFilter, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['department', 'position', 'is_active']  # Filter by fields
-    search_fields = ['username', 'first_name', 'last_name', 'email']  # Keyword search
-    ordering_fields = ['salary', 'first_name', 'last_name']  # Sort by fields
\ No newline at end of file
+    search_fields = ['username', 'first_name', 'last_name', 'email']  # Keyword search (?search=, LIKE scans)
+    search_index = 'employee'  # Full-text search (?q=), see search/backends.py
+    ordering_fields = ['salary', 'first_name', 'last_name']  # Sort by fields
+
+# Create a new employee; listing is handed to EmployeeListView
+@method_decorator(csrf_exempt, name='dispatch')
+class EmployeeListCreateView(View):
+    list_view = staticmethod(EmployeeListView.as_view())
+
+    async def get(self, request):
+        return await sync_to_async(self.list_view)(request)
+
+    async def post(self, request):
+        if await authenticated_user(request) is None:
+            return not_authenticated()
+        data = request_data(request)
+        if data is None:
+            return invalid_body()
+        retry_after = await throttle_wait(request)
+        if retry_after:
+            return _throttled(retry_after)
+        serializer = EmployeeSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = dict(serializer.validated_data)
+        try:
+            password = await hash_password(fields.pop('password'))
+        except HashingOverloaded:
+            return _overloaded()
+        # As in RegisterView: create_user, with the password hashed on the pool.
+        employee = Employee(**fields, password=password)
+        employee.username = Employee.normalize_username(employee.username)
+        employee.email = Employee.objects.normalize_email(employee.email)
+        try:
+            await employee.asave()
+        except IntegrityError:
+            return JsonResponse({"errors": {"username": ["A user with that username already exists."]}},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse(EmployeeSerializer(employee).data, status=status.HTTP_201_CREATED)
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Set-based receivables maintenance: the overdue sweep is one UPDATE and the
+aging report one GROUP BY query, both driven by ``invoice_status_due_idx``.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from crm_project.db import retry_on_lock
+
+from .models import Invoice
+
+OUTSTANDING_STATUSES = ('SENT', 'OVERDUE')
+# (bucket, oldest days past due, newest days past due); invoices not yet due
+# count as 0-30.
+AGING_BUCKETS = (
+    ('0-30', 30, None),
+    ('31-60', 60, 31),
+    ('61-90', 90, 61),
+    ('90+', None, 91),
+)
+
+
+@retry_on_lock
+def sweep_overdue(today=None):
+    """Mark every sent invoice past its due date as overdue; returns the row count."""
+    today = today or timezone.localdate()
+    return Invoice.objects.filter(status='SENT', due_date__lt=today).update(status='OVERDUE')
+
+
+def aging_report(queryset=None, today=None):
+    """
+    Outstanding amounts per customer split into aging buckets, computed in
+    one aggregate query with a conditional ``Sum`` per bucket.
+    """
+    today = today or timezone.localdate()
+    queryset = Invoice.objects.all() if queryset is None else queryset
+    money = DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0.00'), output_field=money)
+    buckets = {}
+    for name, oldest, newest in AGING_BUCKETS:
+        condition = Q()
+        if oldest is not None:
+            condition &= Q(due_date__gte=today - timedelta(days=oldest))
+        if newest is not None:
+            condition &= Q(due_date__lte=today - timedelta(days=newest))
+        buckets[name] = Coalesce(Sum('total_amount', filter=condition, output_field=money), zero)
+    rows = (
+        queryset.filter(status__in=OUTSTANDING_STATUSES)
+        .order_by()
+        .values('customer', 'customer__company_name')
+        .annotate(total=Coalesce(Sum('total_amount', output_field=money), zero), **buckets)
+        .order_by('-total', 'customer')
+    )
+    return [
+        {
+            'customer': row['customer'],
+            'customer_name': row['customer__company_name'],
+            'buckets': {name: row[name] for name, _, _ in AGING_BUCKETS},
+            'total': row['total'],
+        }
+        for row in rows
+    ]
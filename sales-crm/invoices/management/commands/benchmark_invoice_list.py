@@ -0,0 +1,76 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from employee.models import Employee
+from invoices.models import Invoice, InvoiceItem
+from invoices.views import InvoicePagination, InvoiceViewSet
+from leads.models import Customer
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed invoices inside a transaction that is rolled back afterwards and report "
+        "query count and latency of the invoice list as the table grows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=50000, help="Invoices to seed in total.")
+        parser.add_argument('--items', type=int, default=3, help="Items per invoice.")
+        parser.add_argument('--checkpoints', type=int, default=4,
+                            help="Number of table sizes to measure at, up to --invoices.")
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        total, checkpoints = options['invoices'], options['checkpoints']
+        sizes = sorted({max(1, total * n // checkpoints) for n in range(1, checkpoints + 1)})
+        self.stdout.write(f"{'invoices':>10} {'page 1 queries':>15} {'page 1 ms':>10} {'deep queries':>13} {'deep ms':>8}")
+
+        with transaction.atomic():
+            user = Employee.objects.create_user(username='invoice-benchmark', password=None)
+            customers = Customer.objects.bulk_create(
+                [Customer(email=f'invoice-benchmark-{n}@example.com', company_name=f'Customer {n}') for n in range(100)]
+            )
+            seeded = 0
+            for size in sizes:
+                self.seed(seeded, size, customers, options['items'])
+                seeded = size
+                first = self.measure(user, options['page_size'])
+                middle = Invoice.objects.order_by('-created_date', '-id')[size // 2]
+                deep = self.measure(user, options['page_size'], InvoicePagination().encode_cursor(middle))
+                self.stdout.write(f"{size:>10} {first[0]:>15} {first[1]:>10.1f} {deep[0]:>13} {deep[1]:>8.1f}")
+            transaction.set_rollback(True)
+
+    def seed(self, start, stop, customers, items_per_invoice):
+        due = date.today() + timedelta(days=30)
+        for offset in range(start, stop, 5000):
+            invoices = Invoice.objects.bulk_create([
+                Invoice(
+                    customer=customers[n % len(customers)],
+                    invoice_number=f'BENCH-{n:08d}',
+                    due_date=due,
+                    total_amount=0,
+                )
+                for n in range(offset, min(offset + 5000, stop))
+            ])
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(invoice=invoice, description=f'Line {k}', quantity=k + 1, unit_price='9.99')
+                for invoice in invoices for k in range(items_per_invoice)
+            ], batch_size=2000)
+
+    def measure(self, user, page_size, cursor=None):
+        params = {'page_size': page_size}
+        if cursor:
+            params['cursor'] = cursor
+        request = APIRequestFactory().get('/api/invoices/', params, HTTP_HOST='localhost')
+        force_authenticate(request, user)
+        view = InvoiceViewSet.as_view({'get': 'list'})
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            view(request).render()
+            elapsed = (time.perf_counter() - started) * 1000
+        return len(queries), elapsed
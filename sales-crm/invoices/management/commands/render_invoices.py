@@ -0,0 +1,51 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from invoices import pdf
+from invoices.models import Invoice
+
+CHUNK_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "Render invoice PDFs into the file cache in a process pool, skipping unchanged invoices."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="Invoice ids (default: all invoices).")
+        parser.add_argument('--status', help="Only invoices with this status.")
+        parser.add_argument('--workers', type=int, default=settings.INVOICE_PDF_WORKERS,
+                            help="Rendering processes.")
+        parser.add_argument('--force', action='store_true', help="Re-render PDFs that are already cached.")
+
+    def handle(self, *args, **options):
+        invoices = Invoice.objects.select_related('customer').prefetch_related('items').order_by('pk')
+        if options['ids']:
+            invoices = invoices.filter(pk__in=options['ids'])
+        if options['status']:
+            invoices = invoices.filter(status=options['status'])
+
+        site = pdf.branding()
+        logo = pdf.fetch_logo(site)  # once per run, not per invoice
+        rendered = cached = 0
+        rows = invoices.iterator(chunk_size=CHUNK_SIZE)
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn')
+        ) as pool:
+            # One chunk in flight at a time keeps memory flat for any number of invoices.
+            while chunk := list(islice(rows, CHUNK_SIZE)):
+                futures = {}
+                for invoice in chunk:
+                    document = pdf.invoice_document(invoice, site)
+                    key = pdf.content_hash(document)
+                    if not options['force'] and pdf.cache_path(key).exists():
+                        cached += 1
+                        continue
+                    futures[pdf.submit(pool, document, logo)] = key
+                for future in as_completed(futures):
+                    pdf.store(futures[future], future.result())
+                    rendered += 1
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} invoice PDF(s), {cached} already cached."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from invoices.aging import sweep_overdue
+
+
+class Command(BaseCommand):
+    help = "Mark sent invoices past their due date as overdue with a single UPDATE."
+
+    def handle(self, *args, **options):
+        updated = sweep_overdue()
+        self.stdout.write(self.style.SUCCESS(f"Marked {updated} invoice(s) overdue."))
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0002_access_pattern_indexes'),
+        ('leads', '0008_access_pattern_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['-created_date', '-id'], name='invoice_created_id_idx'),
+        ),
+    ]
@@ -25,6 +25,16 @@ class Invoice(models.Model):
         related_name='created_invoices'
     )
 
+    class Meta:
+        indexes = [
+            # Overdue sweeps and receivables: status filter plus due date range.
+            models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+            # A customer's invoices, newest first.
+            models.Index(fields=['customer', '-created_date'], name='invoice_customer_created_idx'),
+            # Keyset pagination order used by the invoice list.
+            models.Index(fields=['-created_date', '-id'], name='invoice_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.customer.company_name}"
 
@@ -40,3 +50,16 @@ class InvoiceItem(models.Model):
 
     def __str__(self):
         return f"{self.description} - {self.invoice.invoice_number}"
+
+
+class InvoiceSequence(models.Model):
+    """
+    Counter row for server-assigned invoice numbers. Processes reserve
+    blocks of values from it (see invoices/numbering.py) rather than
+    touching it once per invoice.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
@@ -0,0 +1,120 @@
+"""
+Invoice number allocation with per-process block reservation.
+
+The ``InvoiceSequence`` row holds the next unreserved value. A process
+reserves ``INVOICE_NUMBER_BLOCK_SIZE`` values at once with a single
+``UPDATE ... SET next_value = next_value + n`` and then hands them out from
+memory under a lock, so most invoices need no database round trip for
+their number. The UPDATE takes the row (PostgreSQL/MySQL) or database
+(SQLite) write lock, so two processes can never reserve the same block.
+
+Numbers are unique and increase within a process, but they are not
+gapless: values left in a block when a process exits are never used.
+
+Clients may still send their own numbers. The counter row starts above the
+highest existing number in the server's format, and generated numbers that
+a client has already used since are skipped.
+"""
+import os
+import re
+import string
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from crm_project.db import retry_on_lock
+
+from .models import Invoice, InvoiceSequence
+
+
+class BlockAllocator:
+    def __init__(self, name, start=lambda: settings.INVOICE_NUMBER_START):
+        self.name = name
+        self.start = start  # first value, when the counter row is created
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+
+    def reset(self):
+        """Forget the reserved block (its remaining values are skipped)."""
+        self._next = self._end = 0
+
+    def take(self, count=1):
+        """Return ``count`` unique sequence values."""
+        values = []
+        with self._lock:
+            while len(values) < count:
+                if self._next >= self._end:
+                    needed = count - len(values)
+                    if connection.in_atomic_block:
+                        # The caller's transaction could still roll the
+                        # reservation back, after which another process
+                        # would reserve the same values again. Only take
+                        # what this transaction uses, never cache spares.
+                        start, end = self._reserve(needed)
+                        values.extend(range(start, end))
+                        break
+                    self._next, self._end = self._reserve(max(settings.INVOICE_NUMBER_BLOCK_SIZE, needed))
+                n = min(count - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + n))
+                self._next += n
+        return values
+
+    @retry_on_lock
+    def _reserve(self, size):
+        sequence = InvoiceSequence.objects.filter(name=self.name)
+        with transaction.atomic():
+            if not sequence.update(next_value=F('next_value') + size):
+                try:
+                    with transaction.atomic():
+                        InvoiceSequence.objects.create(name=self.name, next_value=self.start() + size)
+                except IntegrityError:
+                    # Another process created the row first.
+                    sequence.update(next_value=F('next_value') + size)
+            end = sequence.values_list('next_value', flat=True).get()
+        return end - size, end
+
+
+def format_invoice_number(number):
+    return settings.INVOICE_NUMBER_FORMAT.format(prefix=settings.INVOICE_NUMBER_PREFIX, number=number)
+
+
+def invoice_number_pattern():
+    """Regex matching ``format_invoice_number`` output, the number as its one group."""
+    parts = []
+    for literal, field, _, _ in string.Formatter().parse(settings.INVOICE_NUMBER_FORMAT):
+        parts.append(re.escape(literal))
+        if field == 'prefix':
+            parts.append(re.escape(settings.INVOICE_NUMBER_PREFIX))
+        elif field == 'number':
+            parts.append(r'(\d+)')
+    return f"^{''.join(parts)}$"
+
+
+def first_free_number():
+    """Where a new counter starts: after the highest number already used, if any."""
+    pattern = invoice_number_pattern()
+    numbers = Invoice.objects.filter(invoice_number__regex=pattern).values_list('invoice_number', flat=True)
+    highest = max((int(re.match(pattern, number).group(1)) for number in numbers.iterator()), default=0)
+    return max(settings.INVOICE_NUMBER_START, highest + 1)
+
+
+invoice_sequence = BlockAllocator('invoice', start=first_free_number)
+# A block reserved before a fork (e.g. gunicorn --preload) must not be
+# shared by the workers.
+os.register_at_fork(after_in_child=invoice_sequence.reset)
+
+
+def next_invoice_numbers(count):
+    """``count`` new invoice numbers, skipping any an existing invoice already has."""
+    numbers = []
+    while len(numbers) < count:
+        candidates = [format_invoice_number(number) for number in invoice_sequence.take(count - len(numbers))]
+        batch_size = connection.ops.bulk_batch_size(['invoice_number'], candidates) or len(candidates)
+        used = set()
+        for start in range(0, len(candidates), batch_size):
+            used.update(Invoice.objects.filter(invoice_number__in=candidates[start:start + batch_size])
+                        .values_list('invoice_number', flat=True))
+        numbers += [number for number in candidates if number not in used]
+    return numbers
@@ -0,0 +1,136 @@
+"""
+Invoice PDFs, cached on disk by content hash.
+
+The cache key is a SHA-256 of everything that appears on the page: the
+invoice, its customer and items, the site ``Settings`` branding and the
+layout version. Any edit produces a new key, so cached files never need
+invalidating, and the key doubles as the HTTP ETag. Rendering is CPU-bound
+and runs in a process pool (invoices/pdf_layout.py) so it does not hold
+the GIL of the web or command process; ``acached_pdf`` awaits it, so a
+request waiting on a render holds no worker thread.
+
+The logo is fetched here, with the checks in settings/logo.py, and handed
+to the workers as bytes.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from settings import logo as site_logo
+from settings.cache import site_settings
+from .pdf_layout import LAYOUT_VERSION, render_pdf
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def branding():
+    payload, _ = site_settings.get()
+    return payload
+
+
+def invoice_document(invoice, site=None):
+    """
+    Plain, JSON-serialisable snapshot of what goes on the PDF. Expects
+    ``customer`` and ``items`` to be loaded (select/prefetch_related).
+    """
+    customer = invoice.customer
+    return {
+        'invoice_number': invoice.invoice_number,
+        'created_date': invoice.created_date.isoformat(),
+        'due_date': invoice.due_date.isoformat(),
+        'status': invoice.status,
+        'total_amount': str(invoice.total_amount),
+        'customer': {
+            'company_name': customer.company_name,
+            'contact_person': customer.contact_person,
+            'address': customer.address,
+            'email': customer.email,
+        },
+        'items': [
+            {
+                'description': item.description,
+                'quantity': item.quantity,
+                'unit_price': str(item.unit_price),
+                'amount': str(item.total),
+            }
+            for item in invoice.items.all()
+        ],
+        'branding': site if site is not None else branding(),
+    }
+
+
+def content_hash(document):
+    payload = json.dumps([LAYOUT_VERSION, document], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_path(key):
+    return Path(settings.INVOICE_PDF_CACHE_DIR) / key[:2] / f"{key}.pdf"
+
+
+def store(key, data):
+    """Write atomically so concurrent readers never see a partial file."""
+    path = cache_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a threaded server process is unsafe, and the
+            # workers only need reportlab.
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.INVOICE_PDF_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def fetch_logo(site):
+    """The bytes of the ``site`` branding's logo, or None when unset or not fetchable."""
+    url = site['logo']
+    if not url:
+        return None
+    try:
+        return site_logo.fetch(url, settings.INVOICE_PDF_LOGO_TIMEOUT, settings.SITE_LOGO_MAX_BYTES,
+                               tuple(settings.SITE_LOGO_ALLOWED_HOSTS))
+    except Exception:
+        # A broken logo link should not stop invoices from rendering.
+        logger.warning("Could not fetch the site logo %s", url, exc_info=True)
+        return None
+
+
+def submit(pool, document, logo):
+    """Queue ``document`` for rendering on ``pool``; ``logo`` comes from ``fetch_logo``."""
+    return pool.submit(render_pdf, document, logo)
+
+
+async def acached_pdf(document, key=None):
+    """Return the path of the rendered PDF for ``document``, rendering it on a miss."""
+    key = key or content_hash(document)
+    path = cache_path(key)
+    if path.exists():
+        return path
+    logo = await sync_to_async(fetch_logo, thread_sensitive=False)(document['branding'])
+    data = await asyncio.wrap_future(submit(executor(), document, logo))
+    return await sync_to_async(store, thread_sensitive=False)(key, data)
@@ -0,0 +1,112 @@
+"""
+Invoice PDF drawing with reportlab.
+
+This module only depends on reportlab and the plain ``document`` dict built
+by invoices/pdf.py, so the process pool can import it in fresh worker
+processes without setting up Django. The logo arrives as bytes: it is
+fetched once by the caller (invoices/pdf.py), not by every worker.
+"""
+import io
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+# Bump when the layout changes so cached PDFs are re-rendered.
+LAYOUT_VERSION = 1
+
+_MARGIN = 18 * mm
+_ROW_HEIGHT = 7 * mm
+_COLUMNS = ((0, "Description"), (100 * mm, "Qty"), (120 * mm, "Unit price"), (150 * mm, "Amount"))
+
+
+def _color(value, default):
+    try:
+        return colors.HexColor(value)
+    except (TypeError, ValueError):
+        return colors.HexColor(default)
+
+
+def _logo(data):
+    if not data:
+        return None
+    try:
+        image = ImageReader(io.BytesIO(data))
+        image.getSize()
+        return image
+    except Exception:
+        # A broken logo should not stop the invoice from rendering.
+        return None
+
+
+def render_pdf(document, logo=None):
+    """Return the PDF bytes for an invoice ``document``, with the ``logo`` image bytes if any."""
+    palette = document['branding']['colors'] or {}
+    primary = _color(palette.get('primary'), '#4f46e5')
+    text = _color(palette.get('text'), '#111827')
+    width, height = A4
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)  # invariant: same input, same bytes
+    pdf.setTitle(f"Invoice {document['invoice_number']}")
+
+    def header():
+        pdf.setFillColor(primary)
+        pdf.rect(0, height - 30 * mm, width, 30 * mm, stroke=0, fill=1)
+        if logo is not None:
+            pdf.drawImage(logo, _MARGIN, height - 26 * mm, height=22 * mm, width=50 * mm,
+                          preserveAspectRatio=True, mask='auto')
+        pdf.setFillColor(colors.white)
+        pdf.setFont('Helvetica-Bold', 18)
+        pdf.drawRightString(width - _MARGIN, height - 18 * mm, f"INVOICE {document['invoice_number']}")
+        pdf.setFillColor(text)
+        return height - 40 * mm
+
+    def table_header(y):
+        pdf.setFont('Helvetica-Bold', 10)
+        for x, title in _COLUMNS:
+            pdf.drawString(_MARGIN + x, y, title)
+        pdf.setStrokeColor(primary)
+        pdf.line(_MARGIN, y - 2 * mm, width - _MARGIN, y - 2 * mm)
+        pdf.setFont('Helvetica', 10)
+        return y - _ROW_HEIGHT
+
+    logo = _logo(logo)
+    y = header()
+    pdf.setFont('Helvetica', 10)
+    customer = document['customer']
+    for line in (customer['company_name'], customer['contact_person'], customer['address'], customer['email']):
+        if line:
+            pdf.drawString(_MARGIN, y, line)
+            y -= 5 * mm
+    details = (
+        ("Issued", document['created_date'][:10]),
+        ("Due", document['due_date']),
+        ("Status", document['status']),
+    )
+    detail_y = height - 40 * mm
+    for label, value in details:
+        pdf.drawRightString(width - _MARGIN, detail_y, f"{label}: {value}")
+        detail_y -= 5 * mm
+
+    y = table_header(min(y, detail_y) - 8 * mm)
+    for item in document['items']:
+        if y < _MARGIN + 20 * mm:
+            pdf.showPage()
+            y = table_header(header())
+        pdf.drawString(_MARGIN, y, item['description'][:60])
+        pdf.drawString(_MARGIN + _COLUMNS[1][0], y, str(item['quantity']))
+        pdf.drawString(_MARGIN + _COLUMNS[2][0], y, item['unit_price'])
+        pdf.drawString(_MARGIN + _COLUMNS[3][0], y, item['amount'])
+        y -= _ROW_HEIGHT
+
+    pdf.setStrokeColor(primary)
+    pdf.line(_MARGIN, y + 3 * mm, width - _MARGIN, y + 3 * mm)
+    pdf.setFont('Helvetica-Bold', 12)
+    pdf.drawString(_MARGIN + _COLUMNS[2][0], y - 3 * mm, "Total")
+    pdf.drawString(_MARGIN + _COLUMNS[3][0], y - 3 * mm, document['total_amount'])
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
@@ -1,15 +1,53 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
+from crm_project.db import retry_on_lock
+from crm_project.metrics import TimedSerializerMixin
 from .models import Invoice, InvoiceItem
+from .numbering import next_invoice_numbers
+from leads.models import Customer
 from leads.serializers import CustomerSerializer
+from search.backends import index_objects
+
+
+def create_invoices(validated):
+    """
+    Insert invoices and all of their items with one ``bulk_create`` each,
+    inside a single transaction. ``validated`` is a list of validated
+    invoice dicts (with ``items`` and ``total_amount``); returns the invoices.
+    """
+    batch_size = settings.INVOICE_BULK_BATCH_SIZE
+    items = [data.pop('items', []) for data in validated]
+    # Numbers are allocated before the transaction so a block reservation
+    # is committed on its own and can be cached by this process.
+    unnumbered = [data for data in validated if not data.get('invoice_number')]
+    for data, number in zip(unnumbered, next_invoice_numbers(len(unnumbered))):
+        data['invoice_number'] = number
+    return _insert_invoices(validated, items, batch_size)
+
 
-class InvoiceItemSerializer(serializers.ModelSerializer):
+@retry_on_lock
+def _insert_invoices(validated, items, batch_size):
+    with transaction.atomic():
+        invoices = Invoice.objects.bulk_create([Invoice(**data) for data in validated], batch_size=batch_size)
+        InvoiceItem.objects.bulk_create(
+            [InvoiceItem(invoice=invoice, **item) for invoice, rows in zip(invoices, items) for item in rows],
+            batch_size=batch_size,
+        )
+        index_objects(invoices)
+    return invoices
+
+
+class InvoiceItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     total = serializers.DecimalField(read_only=True, max_digits=10, decimal_places=2)
     
     class Meta:
         model = InvoiceItem
         fields = ['id', 'description', 'quantity', 'unit_price', 'total']
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = InvoiceItemSerializer(many=True, required=False)
     customer_details = CustomerSerializer(source='customer', read_only=True)
     
@@ -17,3 +55,107 @@ class InvoiceSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = ['id', 'customer', 'customer_details', 'invoice_number', 'created_date', 
                  'due_date', 'total_amount', 'status', 'created_by', 'items']
+        # Derived from the items and the authenticated user, never taken from the client.
+        read_only_fields = ['total_amount', 'created_by']
+        # Assigned from the invoice sequence when omitted.
+        extra_kwargs = {'invoice_number': {'required': False}}
+
+    def validate(self, attrs):
+        if self.instance is None or 'items' in attrs:
+            total = sum((item['quantity'] * item['unit_price'] for item in attrs.get('items', [])), Decimal('0.00'))
+            try:
+                self.fields['total_amount'].validate_precision(total)
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({'items': [f"Invoice total {total}: {e.detail[0]}"]})
+            attrs['total_amount'] = total
+        return attrs
+
+    def create(self, validated_data):
+        return create_invoices([validated_data])[0]
+
+    def update(self, instance, validated_data):
+        items = validated_data.pop('items', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if items is not None:
+                # A new item list replaces the old one; the total was recomputed in validate().
+                instance.items.all().delete()
+                InvoiceItem.objects.bulk_create([InvoiceItem(invoice=instance, **item) for item in items])
+        return instance
+
+
+class BulkInvoiceListSerializer(serializers.ListSerializer):
+    """
+    Validates a whole billing run with a constant number of queries: customers
+    are resolved with one ``in_bulk`` and invoice numbers are checked for
+    uniqueness with one ``IN`` lookup instead of once per invoice.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError("Expected a list of invoices.")
+        limit = settings.INVOICE_BULK_MAX_SIZE
+        if len(data) > limit:
+            raise serializers.ValidationError(f"At most {limit} invoices per request.")
+        customer_ids = {row.get('customer') for row in data if isinstance(row, dict)}
+        self.context['customers'] = Customer.objects.in_bulk(
+            [pk for pk in customer_ids if isinstance(pk, int) or (isinstance(pk, str) and pk.isdigit())]
+        )
+        validated = super().to_internal_value(data)
+
+        numbers = [row.get('invoice_number') for row in validated]
+        taken = set(Invoice.objects.filter(invoice_number__in=filter(None, numbers)).values_list('invoice_number', flat=True))
+        seen, errors = set(), []
+        for number in numbers:
+            if not number:
+                errors.append({})
+                continue
+            if number in taken:
+                errors.append({'invoice_number': ["invoice with this invoice number already exists."]})
+            elif number in seen:
+                errors.append({'invoice_number': ["Duplicate invoice number earlier in this request."]})
+            else:
+                errors.append({})
+            seen.add(number)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+    def create(self, validated_data):
+        return create_invoices(validated_data)
+
+
+class _BulkCustomerField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        try:
+            return self.context['customers'][int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+class BulkInvoiceSerializer(InvoiceSerializer):
+    customer = _BulkCustomerField(queryset=Customer.objects.all())
+
+    class Meta(InvoiceSerializer.Meta):
+        list_serializer_class = BulkInvoiceListSerializer
+        # Uniqueness is checked for the whole list at once by the list serializer.
+        extra_kwargs = {'invoice_number': {'required': False, 'validators': []}}
+
+
+class InvoiceListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Slim list row; expects the annotations added by ``InvoiceViewSet.get_queryset``."""
+    customer_name = serializers.CharField(read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+    subtotal = serializers.DecimalField(read_only=True, max_digits=12, decimal_places=2)
+
+    class Meta:
+        model = Invoice
+        fields = ['id', 'customer', 'customer_name', 'invoice_number', 'created_date', 'due_date',
+                  'total_amount', 'status', 'created_by', 'item_count', 'subtotal']
+
+
+class AgingRowSerializer(TimedSerializerMixin, serializers.Serializer):
+    customer = serializers.IntegerField()
+    customer_name = serializers.CharField()
+    buckets = serializers.DictField(child=serializers.DecimalField(max_digits=14, decimal_places=2))
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
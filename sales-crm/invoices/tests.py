@@ -1,3 +1,285 @@
-from django.test import TestCase
+import io
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from employee.models import Employee
+from leads.models import Customer
+from crm_project.testing import QueryBudgetTestCase, QueryPlanTestCase
+from . import pdf
+from .aging import aging_report, sweep_overdue
+from .models import Invoice, InvoiceItem, InvoiceSequence
+from .numbering import BlockAllocator, invoice_sequence, next_invoice_numbers
+
+
+class InvoiceQueryPlanTests(QueryPlanTestCase):
+    def test_overdue_sweep(self):
+        self.assertIndexed(Invoice.objects.filter(status='SENT', due_date__lt=timezone.localdate()))
+
+    def test_customer_invoices_newest_first(self):
+        self.assertIndexed(Invoice.objects.filter(customer_id=1).order_by('-created_date')[:20])
+
+    def test_invoice_number_lookup(self):
+        self.assertIndexed(Invoice.objects.filter(invoice_number='INV-000001'))
+
+
+class InvoiceQueryBudgetTests(QueryBudgetTestCase):
+    def seed(self, count):
+        start = self.seeded
+        customers = Customer.objects.bulk_create([
+            Customer(company_name=f'Customer {n}', email=f'customer-{n}@example.com', contact_person='Jo')
+            for n in range(start, start + count)
+        ])
+        due = timezone.localdate() - timedelta(days=45)
+        invoices = Invoice.objects.bulk_create([
+            Invoice(customer=customer, invoice_number=f'SEED-{n:05d}', due_date=due, total_amount=Decimal('30.00'),
+                    status='SENT', created_by=self.user)
+            for n, customer in enumerate(customers, start)
+        ])
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(invoice=invoice, description=description, quantity=1, unit_price=Decimal('15.00'))
+            for invoice in invoices for description in ('Setup', 'Support')
+        ])
+
+    def latest(self):
+        return Invoice.objects.order_by('-pk').first()
+
+    def invoice_data(self):
+        return {
+            'customer': self.latest().customer_id,
+            'due_date': timezone.localdate().isoformat(),
+            'items': [{'description': 'Licence', 'quantity': 2, 'unit_price': '40.00'}],
+        }
+
+    def test_invoice_list(self):
+        self.assertQueryBudget(1, 'get', '/api/invoices/')
+
+    def test_invoice_list_filtered(self):
+        self.assertQueryBudget(2, 'get', '/api/invoices/?status=SENT&include_count=1')
+
+    def test_invoice_create(self):
+        self.assertQueryBudget(8, 'post', '/api/invoices/', self.invoice_data)
+
+    def test_invoice_detail(self):
+        self.assertQueryBudget(2, 'get', lambda: f'/api/invoices/{self.latest().pk}/')
+
+    def test_invoice_update(self):
+        self.assertQueryBudget(8, 'put', lambda: f'/api/invoices/{self.latest().pk}/', self.invoice_data)
+
+    def test_invoice_partial_update(self):
+        self.assertQueryBudget(5, 'patch', lambda: f'/api/invoices/{self.latest().pk}/', {'status': 'PAID'})
+
+    def test_invoice_delete(self):
+        self.assertQueryBudget(5, 'delete', lambda: f'/api/invoices/{self.latest().pk}/')
+
+    def test_invoice_bulk_create(self):
+        self.assertQueryBudget(7, 'post', '/api/invoices/bulk/', lambda: [self.invoice_data() for _ in range(3)])
+
+    def test_invoice_pdf(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(INVOICE_PDF_CACHE_DIR=directory):
+            self.assertQueryBudget(2, 'get', lambda: f'/api/invoices/{self.latest().pk}/pdf/')
+
+    def test_aging_report(self):
+        self.assertQueryBudget(1, 'get', '/api/invoices/aging/')
+
+    def test_invoice_export_csv(self):
+        self.assertQueryBudget(2, 'get', '/api/invoices/export/')
+
+    def test_invoice_export_ndjson(self):
+        self.assertQueryBudget(2, 'get', '/api/invoices/export/?file_format=ndjson')
+
+
+class ReceivablesTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.user = Employee.objects.create_user(username='ledger', password=None)
+        self.acme = Customer.objects.create(company_name='Acme', email='acme@example.com')
+        self.globex = Customer.objects.create(company_name='Globex', email='globex@example.com')
+
+    def invoice(self, customer, days_past_due, amount, status='SENT'):
+        return Invoice.objects.create(
+            customer=customer, invoice_number=f'AR-{Invoice.objects.count()}', created_by=self.user,
+            due_date=self.today - timedelta(days=days_past_due), total_amount=Decimal(amount), status=status)
+
+    def test_aging_bucket_boundaries(self):
+        # Not yet due and up to 30 days late: 0-30.
+        for days, amount in ((-10, '1'), (0, '2'), (30, '4'), (31, '8'), (60, '16'),
+                             (61, '32'), (90, '64'), (91, '128'), (400, '256')):
+            self.invoice(self.acme, days, amount)
+        row, = aging_report(today=self.today)
+        self.assertEqual(row['buckets'], {'0-30': Decimal('7'), '31-60': Decimal('24'),
+                                          '61-90': Decimal('96'), '90+': Decimal('384')})
+        self.assertEqual(row['total'], Decimal('511'))
+
+    def test_only_outstanding_invoices_age(self):
+        self.invoice(self.acme, 45, '10.00', status='OVERDUE')
+        self.invoice(self.acme, 45, '20.00')
+        self.invoice(self.acme, 45, '40.00', status='PAID')
+        self.invoice(self.acme, 45, '80.00', status='DRAFT')
+        row, = aging_report(today=self.today)
+        self.assertEqual((row['buckets']['31-60'], row['total']), (Decimal('30.00'), Decimal('30.00')))
+
+    def test_report_endpoint(self):
+        self.invoice(self.acme, 5, '10.00')
+        self.invoice(self.globex, 100, '50.00')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get('/api/invoices/aging/').json()
+        self.assertEqual(data['as_of'], self.today.isoformat())
+        # Largest balance first.
+        self.assertEqual([row['customer_name'] for row in data['customers']], ['Globex', 'Acme'])
+
+        data = client.get('/api/invoices/aging/', {'customer': self.acme.pk}).json()
+        self.assertEqual(data['customers'], [{
+            'customer': self.acme.pk, 'customer_name': 'Acme', 'total': '10.00',
+            'buckets': {'0-30': '10.00', '31-60': '0.00', '61-90': '0.00', '90+': '0.00'},
+        }])
+
+    def test_sweep_marks_only_sent_invoices_past_due(self):
+        late = self.invoice(self.acme, 1, '10.00')
+        due_today = self.invoice(self.acme, 0, '10.00')
+        untouched = [self.invoice(self.acme, 30, '10.00', status=status) for status in ('DRAFT', 'PAID', 'OVERDUE')]
+        self.assertEqual(sweep_overdue(today=self.today), 1)
+        statuses = dict(Invoice.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[late.pk], 'OVERDUE')
+        self.assertEqual(statuses[due_today.pk], 'SENT')
+        self.assertEqual([statuses[invoice.pk] for invoice in untouched], ['DRAFT', 'PAID', 'OVERDUE'])
+
+    def test_sweep_command(self):
+        self.invoice(self.globex, 3, '10.00')
+        out = io.StringIO()
+        call_command('sweep_overdue_invoices', stdout=out)
+        self.assertIn('Marked 1 invoice(s) overdue.', out.getvalue())
+        self.assertEqual(sweep_overdue(), 0)
+
+
+class InvoicePDFTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache_dir = override_settings(INVOICE_PDF_CACHE_DIR=directory.name)
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        self.user = Employee.objects.create_user(username='pdf', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        customer = Customer.objects.create(company_name='Printed Co', email='print@example.com')
+        self.invoices = [
+            Invoice.objects.create(customer=customer, invoice_number=f'PDF-{n}', created_by=self.user,
+                                   due_date=timezone.localdate(), total_amount=Decimal('10.00'))
+            for n in range(2)
+        ]
+        self.url = f'/api/invoices/{self.invoices[0].pk}/pdf/'
+
+    def test_renders_with_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="PDF-0.pdf"')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{64}"$')
+
+    def test_if_none_match_is_parsed_as_a_list(self):
+        etag = self.client.get(self.url)['ETag']
+        for header in (etag, f'"other", {etag}', f'W/{etag}', '*'):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        # The ETag inside a longer tag is not a match.
+        embedded = f'"x{etag.strip(chr(34))}x"'
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=embedded).status_code, 200)
+
+    def test_error_shapes(self):
+        response = self.client.get('/api/invoices/999999/pdf/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'No Invoice matches the given query.'})
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+
+    def test_render_invoices_fetches_the_logo_once(self):
+        site = {'logo': 'https://cdn.example.com/logo.png', 'colors': {}}
+        with mock.patch('invoices.pdf.branding', return_value=site), \
+                mock.patch('invoices.pdf.site_logo.fetch', return_value=b'not an image') as fetch:
+            call_command('render_invoices', workers=1, stdout=io.StringIO())
+        fetch.assert_called_once_with(site['logo'], settings.INVOICE_PDF_LOGO_TIMEOUT, settings.SITE_LOGO_MAX_BYTES,
+                                      tuple(settings.SITE_LOGO_ALLOWED_HOSTS))
+        for invoice in self.invoices:
+            self.assertTrue(pdf.cache_path(pdf.content_hash(pdf.invoice_document(invoice, site))).exists())
+
+
+@override_settings(INVOICE_NUMBER_BLOCK_SIZE=10, INVOICE_NUMBER_START=1)
+class InvoiceNumberingTests(TransactionTestCase):
+    """Outside a TestCase transaction, so blocks are reserved and cached as in production."""
+
+    def setUp(self):
+        invoice_sequence.reset()
+        self.addCleanup(invoice_sequence.reset)
+        self.customer = Customer.objects.create(company_name='Numbered', email='numbered@example.com')
+
+    def next_value(self, name='invoice'):
+        return InvoiceSequence.objects.get(name=name).next_value
+
+    def invoice(self, number):
+        return Invoice.objects.create(customer=self.customer, invoice_number=number,
+                                      due_date=timezone.localdate(), total_amount=Decimal('1.00'))
+
+    def test_block_reservation(self):
+        allocator = BlockAllocator('test')
+        self.assertEqual(allocator.take(3), [1, 2, 3])
+        self.assertEqual(self.next_value('test'), 11)
+        with self.assertNumQueries(0):  # served from the reserved block
+            self.assertEqual(allocator.take(7), [4, 5, 6, 7, 8, 9, 10])
+        self.assertEqual(allocator.take(2), [11, 12])
+        self.assertEqual(self.next_value('test'), 21)
+        # Another process reserves its own block.
+        self.assertEqual(BlockAllocator('test').take(1), [21])
+        # A request larger than a block gets a block of its size.
+        self.assertEqual(len(set(allocator.take(25))), 25)
+
+    def test_no_spares_cached_inside_a_transaction(self):
+        allocator = BlockAllocator('test')
+        with transaction.atomic():
+            self.assertEqual(allocator.take(2), [1, 2])
+            self.assertEqual(self.next_value('test'), 3)
+            transaction.set_rollback(True)
+        # The rollback released the values and nothing was kept in memory.
+        self.assertFalse(InvoiceSequence.objects.filter(name='test').exists())
+        self.assertEqual(allocator.take(1), [1])
+
+    def test_counter_starts_above_existing_numbers(self):
+        self.invoice('INV-000041')
+        self.invoice('INV-7')
+        self.invoice('OTHER-000900')  # not in the server's format
+        self.assertEqual(next_invoice_numbers(2), ['INV-000042', 'INV-000043'])
+
+    @override_settings(INVOICE_NUMBER_START=100)
+    def test_counter_respects_start(self):
+        self.invoice('INV-000041')
+        self.assertEqual(next_invoice_numbers(1), ['INV-000100'])
+
+    def test_skips_numbers_clients_used(self):
+        self.assertEqual(next_invoice_numbers(1), ['INV-000001'])
+        self.invoice('INV-000002')
+        self.invoice('INV-000004')
+        self.assertEqual(next_invoice_numbers(3), ['INV-000003', 'INV-000005', 'INV-000006'])
+
+    def test_create_after_client_supplied_numbers(self):
+        self.invoice('INV-000001')
+        client = APIClient()
+        client.force_authenticate(Employee.objects.create_user(username='numbering', password=None))
+        response = client.post('/api/invoices/', {
+            'customer': self.customer.pk, 'due_date': timezone.localdate().isoformat(),
+            'items': [{'description': 'Work', 'quantity': 1, 'unit_price': '5.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['invoice_number'], 'INV-000002')
@@ -6,5 +6,6 @@ router = DefaultRouter()
 router.register(r'invoices', views.InvoiceViewSet)
 
 urlpatterns = [
+    path('invoices/<int:pk>/pdf/', views.invoice_pdf, name='invoice-pdf'),
     path('', include(router.urls)),
 ]
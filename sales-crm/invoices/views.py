@@ -1,32 +1,163 @@
+import json
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import content_disposition_header, parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from crm_project.async_api import api_error, authenticated_user, not_authenticated
+from leads.exports import chunked_values, csv_lines, export_options, export_response
+from leads.filters import filter_by_query_params
+from leads.pagination import KeysetPagination
+from .aging import aging_report
 from .models import Invoice, InvoiceItem
-from .serializers import InvoiceSerializer, InvoiceItemSerializer
+from .pdf import acached_pdf, content_hash, invoice_document
+from .serializers import AgingRowSerializer, BulkInvoiceSerializer, InvoiceSerializer, InvoiceListSerializer
+
+INVOICE_FILTER_FIELDS = ('status', 'customer', 'created_by')
+INVOICE_EXPORT_FIELDS = ('id', 'invoice_number', 'customer', 'created_date', 'due_date',
+                         'total_amount', 'status', 'created_by')
+ITEM_EXPORT_FIELDS = ('description', 'quantity', 'unit_price', 'line_total')
+
+
+def _invoices_with_items(queryset):
+    """Yield ``(invoice_row, [item_row, ...])`` fetching items one invoice chunk at a time."""
+    invoices = chunked_values(queryset.order_by('pk'), *INVOICE_EXPORT_FIELDS)
+    while chunk := list(islice(invoices, settings.EXPORT_CHUNK_SIZE)):
+        items = defaultdict(list)
+        item_rows = InvoiceItem.objects.filter(invoice_id__in=[row[0] for row in chunk]).order_by('pk').values_list(
+            'invoice_id', 'description', 'quantity', 'unit_price'
+        )
+        for invoice_id, description, quantity, unit_price in item_rows:
+            items[invoice_id].append((description, quantity, unit_price, quantity * unit_price))
+        for row in chunk:
+            yield row, items[row[0]]
+
+
+def _invoice_csv_rows(queryset):
+    # One line per invoice item; invoices without items get one line with blank item columns.
+    blank = (None,) * len(ITEM_EXPORT_FIELDS)
+    for invoice, items in _invoices_with_items(queryset):
+        for item in items or [blank]:
+            yield invoice + item
+
+
+def _invoice_ndjson_lines(queryset):
+    for invoice, items in _invoices_with_items(queryset):
+        record = dict(zip(INVOICE_EXPORT_FIELDS, invoice))
+        record['items'] = [dict(zip(ITEM_EXPORT_FIELDS, item)) for item in items]
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+class InvoicePagination(KeysetPagination):
+    timestamp_field = 'created_date'
+
 
 class InvoiceViewSet(viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = InvoicePagination
+
+    def get_queryset(self):
+        queryset = filter_by_query_params(super().get_queryset(), self.request.query_params, INVOICE_FILTER_FIELDS)
+        if self.action == 'list':
+            # Correlated subqueries run only for the rows of the current page,
+            # unlike a JOIN + GROUP BY over every invoice and item.
+            items = InvoiceItem.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice')
+            money = DecimalField(max_digits=12, decimal_places=2)
+            return queryset.annotate(
+                customer_name=F('customer__company_name'),
+                item_count=Coalesce(Subquery(items.annotate(n=Count('pk')).values('n')), 0),
+                subtotal=Coalesce(
+                    Subquery(items.annotate(total=Sum(F('quantity') * F('unit_price'), output_field=money)).values('total')),
+                    Value(Decimal('0.00')),
+                    output_field=money,
+                ),
+            )
+        return queryset.select_related('customer', 'created_by').prefetch_related('items')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return InvoiceListSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
-        # The user is already an Employee instance
-        serializer.save(created_by=self.request.user)
-
-    def create(self, request, *args, **kwargs):
-        # Extract items data if present
-        items_data = request.data.pop('items', [])
-        
-        # Create invoice
-        serializer = self.get_serializer(data=request.data)
+        # By id: with JWT auth request.user is a TokenUser, not an Employee.
+        serializer.save(created_by_id=self.request.user.pk)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create a list of invoices (with items) in one transaction; all or nothing."""
+        serializer = BulkInvoiceSerializer(data=request.data, many=True, context=self.get_serializer_context())
         serializer.is_valid(raise_exception=True)
-        invoice = serializer.save(created_by=self.request.user)  # User is already an Employee
+        invoices = serializer.save(created_by_id=request.user.pk)
+        return Response(
+            {
+                'created': len(invoices),
+                'invoices': [
+                    {'id': invoice.pk, 'invoice_number': invoice.invoice_number, 'total_amount': str(invoice.total_amount)}
+                    for invoice in invoices
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        queryset = filter_by_query_params(Invoice.objects.all(), request.query_params, ('customer',))
+        return Response({'as_of': timezone.localdate(), 'customers': AgingRowSerializer(aging_report(queryset), many=True).data})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        fmt, gzip = export_options(request)
+        queryset = self.get_queryset()
+        if fmt == 'csv':
+            lines = csv_lines(INVOICE_EXPORT_FIELDS + ITEM_EXPORT_FIELDS, _invoice_csv_rows(queryset))
+        else:
+            lines = _invoice_ndjson_lines(queryset)
+        return export_response(lines, 'invoices', fmt, gzip)
+
+
+def _pdf_document(pk):
+    invoice = Invoice.objects.select_related('customer').prefetch_related('items').filter(pk=pk).first()
+    return None if invoice is None else (invoice.invoice_number, invoice_document(invoice))
+
+
+def _etag_matches(if_none_match, etag):
+    """Weak comparison of ``etag`` against an If-None-Match list (RFC 9110 13.1.2)."""
+    return any(tag == '*' or tag.removeprefix('W/') == etag for tag in parse_etags(if_none_match))
 
-        # Create invoice items if any
-        for item_data in items_data:
-            item_data['invoice'] = invoice.id
-            item_serializer = InvoiceItemSerializer(data=item_data)
-            if item_serializer.is_valid():
-                item_serializer.save()
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+# Async so a request waiting on a render (a process pool job) holds no
+# worker thread; see invoices/pdf.py.
+@csrf_exempt
+@require_GET
+async def invoice_pdf(request, pk):
+    if await authenticated_user(request) is None:
+        return not_authenticated()
+    found = await sync_to_async(_pdf_document)(pk)
+    if found is None:
+        return api_error(NotFound("No Invoice matches the given query."))
+    invoice_number, document = found
+    key = content_hash(document)
+    headers = {'ETag': f'"{key}"', 'Cache-Control': 'private, no-cache'}
+    if _etag_matches(request.headers.get('If-None-Match', ''), f'"{key}"'):
+        return HttpResponseNotModified(headers=headers)
+    path = await acached_pdf(document, key)
+    data = await sync_to_async(path.read_bytes, thread_sensitive=False)()
+    headers['Content-Disposition'] = content_disposition_header(False, f"{invoice_number}.pdf")
+    return HttpResponse(data, content_type='application/pdf', headers=headers)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Lead, Customer
+from .models import Lead, Customer, ReferenceLead
 
 admin.site.register(Lead)
-admin.site.register(Customer)
\ No newline at end of file
+admin.site.register(Customer)
+admin.site.register(ReferenceLead)
\ No newline at end of file
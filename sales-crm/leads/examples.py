@@ -0,0 +1,289 @@
+"""
+Nearest-neighbour selection of few-shot examples for ``ScoreTheLead``.
+
+Every ``ReferenceLead`` is reduced to a small float32 feature vector:
+
+    [ log employee count | log budget | description tokens (hashed, unit) ]
+
+plus an industry code and a country code (crc32 of the normalised value).
+The distance is the squared euclidean distance as if industry and country
+were one-hot encoded, computed from the codes so the matrix does not need a
+column per value. Rows are kept in one contiguous matrix per tier. Picking
+examples for a lead is one matrix-vector product and two code comparisons
+per tier plus an arg-min/arg-partition.
+
+The index is patched row by row from model signals in the process that made
+the change. Every process also polls the database once per
+``LEAD_EXAMPLES_SYNC_INTERVAL`` for rows updated since its last sync and for
+``ReferenceLeadDeletion`` tombstones, so other processes' changes show up
+without a shared counter.
+"""
+import math
+import re
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .baml_client.types import LeadInfo, LeadExamples
+from .models import ReferenceLead, ReferenceLeadDeletion
+
+DESCRIPTION_BUCKETS = 128
+_DESCRIPTION_OFFSET = 2
+DIMENSIONS = _DESCRIPTION_OFFSET + DESCRIPTION_BUCKETS
+NO_CODE = -1
+
+# Scale log counts/budgets into roughly [0, 1] so no feature dominates.
+_LOG_EMPLOYEES_MAX = math.log1p(1_000_000)
+_LOG_BUDGET_MAX = math.log1p(1_000_000_000)
+_TOKEN_RE = re.compile(r'[a-z0-9]{3,}')
+
+SYNC_OVERLAP = timedelta(minutes=1)
+# Tombstones older than this are pruned; a process that has not synced for
+# longer rebuilds instead.
+TOMBSTONE_RETENTION = timedelta(days=1)
+TIERS = ("amazing", "decent", "terrible")
+
+
+def _crc(text):
+    # crc32 rather than hash(): stable across processes and restarts.
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def category_code(value):
+    value = (value or '').strip().lower()
+    return _crc(value) if value else NO_CODE
+
+
+def feature_vector(employee_count, budget_estimate, description):
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    vector[0] = math.log1p(max(employee_count or 0, 0)) / _LOG_EMPLOYEES_MAX
+    vector[1] = math.log1p(max(budget_estimate or 0, 0)) / _LOG_BUDGET_MAX
+    tokens = _TOKEN_RE.findall((description or '').lower())
+    if tokens:
+        words = vector[_DESCRIPTION_OFFSET:]
+        for token in tokens:
+            words[_crc(token) % DESCRIPTION_BUCKETS] += 1.0
+        words /= np.linalg.norm(words)
+    return vector
+
+
+def lead_info_features(lead_info):
+    """``(vector, industry code, country code)`` for a ``LeadInfo``."""
+    return (
+        feature_vector(lead_info.employeeCount, lead_info.budgetEstimate, lead_info.description),
+        category_code(lead_info.industry),
+        category_code(lead_info.country),
+    )
+
+
+def reference_lead_info(reference):
+    return LeadInfo(
+        companyName=reference.company_name,
+        industry=reference.industry,
+        employeeCount=reference.employee_count,
+        budgetEstimate=reference.budget_estimate,
+        country=reference.country,
+        description=reference.description,
+        expectedScore=reference.expected_score,
+    )
+
+
+class _TierIndex:
+    """Growable feature matrix for one tier with O(1) row upsert/removal."""
+
+    def __init__(self):
+        self.vectors = np.zeros((16, DIMENSIONS), dtype=np.float32)
+        self.half_norms = np.zeros(16, dtype=np.float32)
+        self.industries = np.full(16, NO_CODE, dtype=np.int64)
+        self.countries = np.full(16, NO_CODE, dtype=np.int64)
+        self.ids = np.zeros(16, dtype=np.int64)
+        self.scratch = np.zeros(16, dtype=np.float32)
+        self.matches = np.zeros(16, dtype=bool)
+        self.size = 0
+        self.row_of = {}
+
+    def upsert(self, pk, features):
+        vector, industry, country = features
+        row = self.row_of.get(pk)
+        if row is None:
+            if self.size == len(self.ids):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.row_of[pk] = row
+            self.ids[row] = pk
+        self.vectors[row] = vector
+        self.industries[row] = industry
+        self.countries[row] = country
+        # A one-hot value would add 1 to ||x||^2.
+        self.half_norms[row] = 0.5 * (float(vector @ vector) + (industry != NO_CODE) + (country != NO_CODE))
+
+    def remove(self, pk):
+        row = self.row_of.pop(pk, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            # Move the last row into the hole to keep the matrix dense.
+            moved = int(self.ids[last])
+            self.vectors[row] = self.vectors[last]
+            self.half_norms[row] = self.half_norms[last]
+            self.industries[row] = self.industries[last]
+            self.countries[row] = self.countries[last]
+            self.ids[row] = moved
+            self.row_of[moved] = row
+        self.size = last
+
+    def nearest(self, features, k):
+        if self.size == 0:
+            return []
+        query, industry, country = features
+        # argmin ||x - q||^2 == argmin (||x||^2 / 2 - x.q); ||q|| is constant.
+        # The one-hot part of x.q is 1 for each category both sides share.
+        distances = self.scratch[:self.size]
+        matches = self.matches[:self.size]
+        np.dot(self.vectors[:self.size], query, out=distances)
+        np.subtract(self.half_norms[:self.size], distances, out=distances)
+        for codes, code in ((self.industries, industry), (self.countries, country)):
+            if code != NO_CODE:
+                np.equal(codes[:self.size], code, out=matches)
+                np.subtract(distances, matches, out=distances)
+        if k == 1:
+            return [int(self.ids[distances.argmin()])]
+        if k >= self.size:
+            order = distances.argsort(kind='stable')
+        else:
+            nearest = np.argpartition(distances, k)[:k]
+            order = nearest[distances[nearest].argsort(kind='stable')]
+        return [int(pk) for pk in self.ids[order]]
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        self.vectors = np.resize(self.vectors, (capacity, DIMENSIONS))
+        self.half_norms = np.resize(self.half_norms, capacity)
+        self.industries = np.resize(self.industries, capacity)
+        self.countries = np.resize(self.countries, capacity)
+        self.ids = np.resize(self.ids, capacity)
+        self.scratch = np.zeros(capacity, dtype=np.float32)
+        self.matches = np.zeros(capacity, dtype=bool)
+
+
+class _Rows:
+    """The tiers plus per-pk lookups; replaced as a whole by a rebuild."""
+
+    def __init__(self):
+        self.tiers = {tier: _TierIndex() for tier in TIERS}
+        self.tier_of = {}
+        self.infos = {}
+
+    def upsert(self, reference):
+        info = reference_lead_info(reference)
+        previous = self.tier_of.get(reference.pk)
+        if previous is not None and previous != reference.tier:
+            self.tiers[previous].remove(reference.pk)
+        self.tiers[reference.tier].upsert(reference.pk, lead_info_features(info))
+        self.tier_of[reference.pk] = reference.tier
+        self.infos[reference.pk] = info
+
+    def remove(self, pk):
+        tier = self.tier_of.pop(pk, None)
+        if tier is not None:
+            self.tiers[tier].remove(pk)
+            self.infos.pop(pk, None)
+
+
+class ExampleIndex:
+    def __init__(self):
+        # _lock guards the rows against concurrent readers; _sync_lock lets
+        # one thread at a time rebuild or sync, so readers never wait on a load.
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._rows = _Rows()
+        self._synced_at = None
+        self._checked_at = 0.0
+
+    def select(self, lead_info, k=None):
+        """Return ``LeadExamples`` with the ``k`` nearest leads of each tier."""
+        k = k or settings.LEAD_EXAMPLES_PER_TIER
+        self._sync_if_stale()
+        query = lead_info_features(lead_info)
+        with self._lock:
+            rows = self._rows
+            picked = {tier: rows.tiers[tier].nearest(query, k) for tier in TIERS}
+            return LeadExamples(
+                amazingLeads=[rows.infos[pk] for pk in picked["amazing"]],
+                decentLeads=[rows.infos[pk] for pk in picked["decent"]],
+                terribleLeads=[rows.infos[pk] for pk in picked["terrible"]],
+            )
+
+    def upsert(self, reference):
+        with self._lock:
+            self._rows.upsert(reference)
+
+    def remove(self, pk):
+        with self._lock:
+            self._rows.remove(pk)
+
+    def rebuild(self):
+        with self._sync_lock:
+            self._rebuild()
+
+    def sync(self):
+        """Apply rows changed since the last load and drop deleted ones."""
+        with self._sync_lock:
+            self._sync()
+
+    def _rebuild(self):
+        # Load into fresh rows and swap them in, so readers keep the old
+        # index until the new one is complete.
+        rows = _Rows()
+        synced_at = timezone.now() - SYNC_OVERLAP
+        for reference in ReferenceLead.objects.iterator(chunk_size=2000):
+            rows.upsert(reference)
+        with self._lock:
+            self._rows = rows
+        self._synced_at = synced_at
+
+    def _sync(self):
+        if self._synced_at is None or self._synced_at < timezone.now() - TOMBSTONE_RETENTION:
+            self._rebuild()
+            return
+        # Overlap the window so rows committed late by slow writers are not missed.
+        synced_at = timezone.now() - SYNC_OVERLAP
+        changed = ReferenceLead.objects.filter(updated_at__gte=self._synced_at)
+        for reference in changed.iterator(chunk_size=2000):
+            self.upsert(reference)
+        deleted = ReferenceLeadDeletion.objects.filter(deleted_at__gte=self._synced_at)
+        for pk in deleted.values_list('reference_id', flat=True):
+            self.remove(pk)
+        self._synced_at = synced_at
+
+    def _sync_if_stale(self):
+        # Poll the database at most once per interval, not per lookup.
+        if self._synced_at is not None and time.monotonic() - self._checked_at < settings.LEAD_EXAMPLES_SYNC_INTERVAL:
+            return
+        with self._sync_lock:
+            # Another thread may have synced while this one waited.
+            if self._synced_at is not None and time.monotonic() - self._checked_at < settings.LEAD_EXAMPLES_SYNC_INTERVAL:
+                return
+            self._sync()
+            self._checked_at = time.monotonic()
+
+
+def record_deletion(pk):
+    """Leave a tombstone so other processes drop reference lead ``pk``."""
+    now = timezone.now()
+    ReferenceLeadDeletion.objects.create(reference_id=pk, deleted_at=now)
+    ReferenceLeadDeletion.objects.filter(deleted_at__lt=now - TOMBSTONE_RETENTION).delete()
+
+
+example_index = ExampleIndex()
+
+
+def examples_for(lead_info):
+    return example_index.select(lead_info)
@@ -0,0 +1,32 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+
+# Columns the list, export and bulk endpoints accept as exact-match filters.
+LEAD_FILTER_FIELDS = ('status', 'source', 'country', 'industry', 'assigned_to')
+CUSTOMER_FILTER_FIELDS = ('industry', 'country')
+
+
+def _filter(queryset, filters, key):
+    try:
+        return queryset.filter(**filters)
+    except (ValueError, DjangoValidationError) as e:
+        raise serializers.ValidationError({key: str(e)})
+
+
+def apply_lead_filters(queryset, filters):
+    """Narrow ``queryset`` by exact matches on ``LEAD_FILTER_FIELDS``."""
+    unknown = set(filters) - set(LEAD_FILTER_FIELDS)
+    if unknown:
+        raise serializers.ValidationError(
+            {'filter': f"Unsupported filter field(s): {', '.join(sorted(unknown))}"}
+        )
+    return _filter(queryset, filters, 'filter')
+
+
+def filter_by_query_params(queryset, query_params, fields):
+    """
+    Apply ``?field=value`` filters for the whitelisted ``fields``; other
+    parameters (cursor, page_size, ...) are left for the caller.
+    """
+    filters = {field: query_params[field] for field in fields if query_params.get(field)}
+    return _filter(queryset, filters, 'query') if filters else queryset
@@ -0,0 +1,124 @@
+"""
+Streaming bulk import of leads from CSV or NDJSON.
+
+Rows are read one at a time from the file object and handled in chunks:
+each chunk is validated in Python, checked against existing emails with a
+single ``email IN (...)`` lookup on the unique index, and written with
+``bulk_create`` inside its own transaction. Memory use is bounded by the
+chunk size, not the file size.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from crm_project.db import retry_on_lock
+from search.backends import index_objects
+
+from .models import Lead
+from .pipeline import PipelineDelta, pipeline_values
+from .serializers import LeadImportSerializer
+
+FORMATS = ('csv', 'ndjson')
+
+
+def guess_format(filename):
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return 'csv'
+
+
+def iter_rows(stream, fmt):
+    """Yield ``(row_number, dict)`` pairs from a binary file object."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(text), start=2):  # row 1 is the header
+            yield number, row
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, e
+            continue
+        yield number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+
+def _clean(row):
+    # CSV has no nulls: treat blank cells as absent rather than as "".
+    return {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def _validate_chunk(rows, validator, reject):
+    valid = {}
+    for number, row in rows:
+        if isinstance(row, Exception):
+            reject(number, None, {'row': [str(row)]})
+            continue
+        try:
+            data = validator.run_validation(_clean(row))
+        except serializers.ValidationError as e:
+            reject(number, row.get('email'), e.detail)
+            continue
+        email = data['email']
+        if email in valid:
+            reject(number, email, {'email': ['Duplicate email earlier in this file.']})
+            continue
+        valid[email] = (number, data)
+    return valid
+
+
+@retry_on_lock
+def _write_chunk(valid, batch_size):
+    with transaction.atomic():
+        existing = set(Lead.objects.filter(email__in=list(valid)).values_list('email', flat=True))
+        new = [Lead(**data) for email, (_, data) in valid.items() if email not in existing]
+        Lead.objects.bulk_create(new, batch_size=batch_size)
+        index_objects(new)
+        delta = PipelineDelta()
+        for lead in new:
+            delta.add(pipeline_values(lead))
+        delta.apply()
+    return len(new), existing
+
+
+def import_leads(rows, chunk_size=None, batch_size=None, on_reject=None):
+    """
+    Import ``(row_number, dict)`` pairs. ``on_reject(row_number, email,
+    errors)`` is called for every row that is not imported. Returns
+    ``(created, rejected)`` counts.
+    """
+    chunk_size = chunk_size or settings.LEAD_IMPORT_CHUNK_SIZE
+    batch_size = batch_size or settings.LEAD_IMPORT_BATCH_SIZE
+    created = rejected = 0
+
+    def reject(number, email, errors):
+        nonlocal rejected
+        rejected += 1
+        if on_reject is not None:
+            on_reject(number, email, errors)
+
+    # One serializer instance for the whole file: building DRF fields is far
+    # more expensive than validating a row with them.
+    validator = LeadImportSerializer()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        valid = _validate_chunk(chunk, validator, reject)
+        if not valid:
+            continue
+        try:
+            count, existing = _write_chunk(valid, batch_size)
+        except IntegrityError:
+            # Another writer inserted one of these emails after our lookup;
+            # the chunk rolled back, so look the existing emails up again.
+            count, existing = _write_chunk(valid, batch_size)
+        created += count
+        for email in existing:
+            reject(valid[email][0], email, {'email': ['Lead with this email already exists.']})
+    return created, rejected
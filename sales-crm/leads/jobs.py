@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ScoringJob
+from .scoring import score_lead_now
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_scoring_job(lead, force=False):
+    """
+    Queue a scoring job for ``lead`` unless one is already open, in which
+    case that job is returned. Returns ``(job, created)``.
+    """
+    open_jobs = ScoringJob.objects.filter(lead=lead, status__in=ScoringJob.OPEN_STATUSES)
+    job = open_jobs.first()
+    if job is not None:
+        return job, False
+    try:
+        with transaction.atomic():
+            return ScoringJob.objects.create(lead=lead, force=force), True
+    except IntegrityError:
+        # A concurrent request queued the same lead first.
+        return open_jobs.get(), False
+
+
+def queue_position(job):
+    if job.status != "queued":
+        return None
+    return ScoringJob.objects.filter(status="queued", created_at__lt=job.created_at).count()
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically move the oldest queued job to ``running``. The conditional
+    UPDATE acts as a compare-and-swap, so concurrent workers never claim the
+    same job. Returns ``None`` when the queue is empty.
+    """
+    queued = ScoringJob.objects.filter(status="queued").order_by('created_at', 'pk')
+    while True:
+        job_id = queued.values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        claimed = ScoringJob.objects.filter(pk=job_id, status="queued").update(
+            status="running",
+            worker=worker_id,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ScoringJob.objects.select_related('lead').get(pk=job_id)
+
+
+def run_job(job):
+    try:
+        score, _ = score_lead_now(job.lead, force=job.force)
+    except Exception as e:
+        logger.exception("Scoring job %s failed", job.pk)
+        retry = job.attempts < settings.SCORING_JOB_MAX_ATTEMPTS
+        ScoringJob.objects.filter(pk=job.pk).update(
+            status="queued" if retry else "failed",
+            error=str(e),
+            finished_at=None if retry else timezone.now(),
+        )
+        return
+    ScoringJob.objects.filter(pk=job.pk).update(
+        status="done", score=score, error=None, finished_at=timezone.now()
+    )
+
+
+def requeue_stale_jobs():
+    """Return jobs whose worker died mid-call to the queue (or fail them)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.SCORING_JOB_TIMEOUT)
+    stale = ScoringJob.objects.filter(status="running", started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=settings.SCORING_JOB_MAX_ATTEMPTS).update(
+        status="failed", error="Worker timed out", finished_at=timezone.now()
+    )
+    requeued = stale.update(status="queued")
+    return requeued, failed
+
+
+def work(worker_id, stop_event, poll_interval=1.0, once=False):
+    """
+    Process jobs until ``stop_event`` is set (or the queue drains if
+    ``once``). Every ``SCORING_JOB_TIMEOUT`` the worker also requeues jobs
+    whose worker died, so they are not left ``running`` while the rest of
+    the pool carries on.
+    """
+    next_sweep = time.monotonic() + settings.SCORING_JOB_TIMEOUT
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            if time.monotonic() >= next_sweep:
+                requeued, failed = requeue_stale_jobs()
+                if requeued or failed:
+                    logger.warning("%s requeued %d stale scoring job(s), failed %d", worker_id, requeued, failed)
+                next_sweep = time.monotonic() + settings.SCORING_JOB_TIMEOUT
+            job = claim_next_job(worker_id)
+            if job is None:
+                if once:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            run_job(job)
+    finally:
+        connection.close()
+
+
+def run_worker_threads(worker_prefix, threads, poll_interval=1.0, once=False, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    pool = [
+        threading.Thread(
+            target=work,
+            args=(f"{worker_prefix}-{n}", stop_event, poll_interval, once),
+            name=f"{worker_prefix}-{n}",
+            daemon=True,
+        )
+        for n in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        for thread in pool:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in pool:
+            thread.join()
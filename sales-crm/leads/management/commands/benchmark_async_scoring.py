@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from employee.models import Employee
+from employee.tokens import issue_tokens
+from leads.models import Lead
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    OpenAI-compatible ``/chat/completions`` endpoint that sleeps for
+    ``latency`` seconds and answers with a fixed lead score. Records the
+    peak number of calls it had in flight.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        try:
+            time.sleep(server.latency)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        body = json.dumps({
+            'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': 'stub',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': '{"lead_score": 42.0}'}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def scratch_database():
+    """
+    Point the default connection at a freshly migrated database for the
+    duration, then drop it. The requests run on other threads and their own
+    connections, so a rolled-back transaction would not hide their writes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            # A file, not the shared in-memory database: many threads write to it.
+            connection.settings_dict['TEST'] = {**connection.settings_dict.get('TEST', {}),
+                                                'NAME': os.path.join(directory, 'benchmark.sqlite3')}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Score leads inline (POST /api/leads/<pk>/score/?wait=1) against a local stub LLM server, "
+        "once from a fixed pool of request threads as under WSGI and once as concurrent "
+        "coroutines through the ASGI handler, and compare throughput and LLM calls in flight. "
+        "Runs against a scratch database that is dropped afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help="Scoring requests per run.")
+        parser.add_argument('--threads', type=int, default=16,
+                            help="Request threads in the WSGI run (e.g. gunicorn workers x threads).")
+        parser.add_argument('--llm-latency', type=float, default=0.5, help="Seconds the stub LLM takes per call.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        requests, threads = options['requests'], options['threads']
+        user = Employee.objects.create_user(username="benchmark", password=None)
+        if settings.API_AUTH_MODE == 'token':
+            authorization = f"Token {Token.objects.create(user=user).key}"
+        else:
+            authorization = f"Bearer {issue_tokens(user)['access']}"
+        leads = Lead.objects.bulk_create([
+            Lead(company_name=f"Benchmark {n}", email=f"benchmark-{n}@example.com", industry='Software',
+                 country='Germany', employee_count=50, budget_estimate=10000)
+            for n in range(requests)
+        ])
+        stub = StubLLMServer(options['llm_latency'])
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        self.stdout.write(f"{requests} requests, stub LLM latency {options['llm_latency'] * 1000:.0f}ms")
+        self.stdout.write(f"{'server':<22} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak LLM calls':>15} {'errors':>7}")
+        try:
+            # The in-process clients always send Host: testserver.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                                   LEAD_SCORING_LLM_BASE_URL=stub.base_url, DATABASE_REPLICAS=[]):
+                paths = [f"/api/leads/{lead.pk}/score/?wait=1&force=1" for lead in leads]
+                for label, run in ((f"WSGI, {threads} threads", lambda: self.wsgi(paths, authorization, threads)),
+                                   ("ASGI, one event loop", lambda: asyncio.run(self.asgi(paths, authorization)))):
+                    stub.peak = 0
+                    started = time.perf_counter()
+                    latencies, errors = run()
+                    self.report(label, time.perf_counter() - started, latencies, errors, stub.peak)
+        finally:
+            stub.shutdown()
+            stub.server_close()
+
+    def wsgi(self, paths, authorization, threads):
+        local = threading.local()
+
+        def score(path):
+            if not hasattr(local, 'client'):
+                local.client = Client(headers={'Authorization': authorization})
+            started = time.perf_counter()
+            response = local.client.post(path)
+            return time.perf_counter() - started, response.status_code
+
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(score, paths))
+        return [latency for latency, _ in results], sum(1 for _, code in results if code != 200)
+
+    async def asgi(self, paths, authorization):
+        client = AsyncClient()
+
+        async def score(path):
+            started = time.perf_counter()
+            response = await client.post(path, headers={'Authorization': authorization})
+            return time.perf_counter() - started, response.status_code
+
+        results = await asyncio.gather(*(score(path) for path in paths))
+        return [latency for latency, _ in results], sum(1 for _, code in results if code != 200)
+
+    def report(self, label, elapsed, latencies, errors, peak):
+        self.stdout.write(f"{label:<22} {len(latencies) / elapsed:>8.1f} {statistics.median(latencies) * 1000:>8.0f} "
+                          f"{_percentile(latencies, 0.95) * 1000:>8.0f} {peak:>15} {errors:>7}")
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from crm_project.db import is_lock_error, retry_on_lock
+from invoices.models import InvoiceSequence
+from leads.models import Lead
+
+PROFILES = ('basic', 'production')
+
+
+def _database(profile, path):
+    config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    if profile == 'production':
+        config.update(settings.SQLITE_PRODUCTION)
+    return config
+
+
+def _writer(alias, profile, worker, transactions):
+    """Run ``transactions`` read-then-write transactions; returns ``(committed, failed)``."""
+    def write(n):
+        # Read a counter, insert a row, write the counter back: the shape of
+        # most of our write paths, and the one a deferred BEGIN cannot queue.
+        with transaction.atomic(using=alias):
+            counter = InvoiceSequence.objects.using(alias).get(name='benchmark')
+            Lead.objects.using(alias).bulk_create([Lead(email=f"writer-{worker}-{n}@example.com")])
+            InvoiceSequence.objects.using(alias).filter(pk=counter.pk).update(next_value=counter.next_value + 1)
+
+    if profile == 'production':
+        write = retry_on_lock(write, using=alias)
+    committed = failed = 0
+    for n in range(transactions):
+        try:
+            write(n)
+            committed += 1
+        except OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            failed += 1
+    connections[alias].close()
+    return committed, failed
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writer processes against a scratch SQLite file with the basic "
+        "and the production connection profile and compare throughput and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Concurrent writer processes.")
+        parser.add_argument('--transactions', type=int, default=200, help="Transactions per writer.")
+
+    def handle(self, *args, **options):
+        writers, transactions = options['writers'], options['transactions']
+        self.stdout.write(f"{writers} writers x {transactions} transactions")
+        self.stdout.write(f"{'profile':<12} {'committed':>10} {'failed':>7} {'lost':>5} {'tx/s':>8} {'seconds':>8}")
+        for profile in PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                alias = f"benchmark_{profile}"
+                connections.settings[alias] = connections.configure_settings({
+                    DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+                    alias: _database(profile, os.path.join(directory, 'benchmark.db')),
+                })[alias]
+                try:
+                    call_command('migrate', database=alias, verbosity=0)
+                    InvoiceSequence.objects.using(alias).create(name='benchmark', next_value=0)
+                    connections[alias].close()
+
+                    # Forked writers inherit the scratch alias.
+                    with multiprocessing.get_context('fork').Pool(writers) as pool:
+                        started = time.perf_counter()
+                        results = pool.starmap(_writer, [(alias, profile, n, transactions) for n in range(writers)])
+                        elapsed = time.perf_counter() - started
+
+                    committed = sum(result[0] for result in results)
+                    failed = sum(result[1] for result in results)
+                    # Increments that committed but were overwritten by a concurrent writer.
+                    lost = committed - InvoiceSequence.objects.using(alias).get(name='benchmark').next_value
+                    self.stdout.write(f"{profile:<12} {committed:>10} {failed:>7} {lost:>5} "
+                                      f"{committed / elapsed:>8.1f} {elapsed:>8.2f}")
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from leads import importer
+
+
+class Command(BaseCommand):
+    help = "Stream leads from a CSV or NDJSON file into the database, skipping existing emails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help="File format (guessed from the extension by default).")
+        parser.add_argument('--chunk-size', type=int, help="Rows validated and committed together.")
+        parser.add_argument('--batch-size', type=int, help="Rows per INSERT statement.")
+        parser.add_argument('--report', help="Write rejected rows to this file as NDJSON.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or importer.guess_format(options['path'])
+        report = open(options['report'], 'w', encoding='utf-8') if options['report'] else None
+
+        def on_reject(row, email, errors):
+            if report is not None:
+                report.write(json.dumps({'row': row, 'email': email, 'errors': errors}, default=str) + '\n')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                created, rejected = importer.import_leads(
+                    importer.iter_rows(stream, fmt),
+                    chunk_size=options['chunk_size'],
+                    batch_size=options['batch_size'],
+                    on_reject=on_reject,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        finally:
+            if report is not None:
+                report.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} lead(s), rejected {rejected}."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leads.pipeline import rebuild_pipeline_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute the PipelineSummary rollup from the lead table."
+
+    def handle(self, *args, **options):
+        buckets = rebuild_pipeline_summary()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} pipeline bucket(s)."))
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import socket
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from leads.jobs import requeue_stale_jobs, run_worker_threads
+
+
+def _process_main(worker_prefix, threads, poll_interval, once):
+    django.setup()  # no-op under fork, required under spawn
+    run_worker_threads(worker_prefix, threads, poll_interval=poll_interval, once=once)
+
+
+class Command(BaseCommand):
+    help = "Run lead scoring workers that process the ScoringJob queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Worker processes to start.")
+        parser.add_argument('--threads', type=int, default=4, help="Worker threads per process.")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait before polling an empty queue again.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        requeued, failed = requeue_stale_jobs()
+        if requeued or failed:
+            self.stdout.write(f"Requeued {requeued} stale job(s), failed {failed}.")
+
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        processes, threads = options['processes'], options['threads']
+        self.stdout.write(f"Starting {processes} process(es) x {threads} thread(s)")
+
+        if processes == 1:
+            run_worker_threads(prefix, threads, options['poll_interval'], options['once'])
+            return
+
+        # Children must open their own database connections.
+        connections.close_all()
+        pool = [
+            multiprocessing.Process(
+                target=_process_main,
+                args=(f"{prefix}-p{n}", threads, options['poll_interval'], options['once']),
+            )
+            for n in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        try:
+            for process in pool:
+                process.join()
+        except KeyboardInterrupt:
+            # Children receive the same SIGINT and finish their current job.
+            for process in pool:
+                process.join()
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0004_scoring_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceLead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company_name', models.CharField(max_length=255)),
+                ('industry', models.CharField(blank=True, default='', max_length=255)),
+                ('employee_count', models.IntegerField(blank=True, null=True)),
+                ('budget_estimate', models.FloatField(default=0.0)),
+                ('country', models.CharField(blank=True, default='', max_length=255)),
+                ('description', models.TextField(blank=True, default='')),
+                ('expected_score', models.FloatField()),
+                ('tier', models.CharField(choices=[('amazing', 'Amazing'), ('decent', 'Decent'), ('terrible', 'Terrible')], max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# The examples previously hard-coded in score_lead and leads/baml_src/Leads.baml.
+REFERENCE_LEADS = [
+    ("amazing", "Tech Innovators", "Technology", 500, 1000000.0, "USA",
+     "A leading tech company focusing on innovative solutions.", 95.0),
+    ("amazing", "Green Energy Co.", "Renewable Energy", 300, 500000.0, "Germany",
+     "A company dedicated to providing renewable energy solutions.", 90.0),
+    ("decent", "Local Grocers", "Retail", 50, 10000.0, "Canada",
+     "A chain of local grocery stores.", 70.0),
+    ("decent", "EduTech", "Education", 100, 20000.0, "UK",
+     "An educational technology company.", 75.0),
+    ("terrible", "Old School Industries", "Manufacturing", 20, 5000.0, "India",
+     "A small manufacturing company with outdated equipment.", 40.0),
+    ("terrible", "Struggling Startups", "Various", 5, 1000.0, "Brazil",
+     "A group of startups struggling to get off the ground.", 30.0),
+]
+
+
+def seed_reference_leads(apps, schema_editor):
+    ReferenceLead = apps.get_model('leads', 'ReferenceLead')
+    ReferenceLead.objects.bulk_create([
+        ReferenceLead(
+            tier=tier, company_name=company_name, industry=industry, employee_count=employee_count,
+            budget_estimate=budget_estimate, country=country, description=description,
+            expected_score=expected_score,
+        )
+        for tier, company_name, industry, employee_count, budget_estimate, country, description, expected_score
+        in REFERENCE_LEADS
+    ])
+
+
+def remove_reference_leads(apps, schema_editor):
+    ReferenceLead = apps.get_model('leads', 'ReferenceLead')
+    ReferenceLead.objects.filter(company_name__in=[row[1] for row in REFERENCE_LEADS]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0005_reference_lead'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_reference_leads, remove_reference_leads),
+    ]
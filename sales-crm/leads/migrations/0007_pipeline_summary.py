@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:52
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def summarise_existing_leads(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    PipelineSummary = apps.get_model('leads', 'PipelineSummary')
+    buckets = {}
+    for dimension in ('status', 'source', 'country'):
+        rows = Lead.objects.order_by().values(dimension).annotate(count=Count('pk'), total=Sum('score'))
+        for row in rows:
+            bucket = buckets.setdefault((dimension, row[dimension] or ''), [0, 0.0])
+            bucket[0] += row['count']
+            bucket[1] += row['total'] or 0.0
+    PipelineSummary.objects.bulk_create([
+        PipelineSummary(dimension=dimension, value=value, lead_count=count, score_total=total)
+        for (dimension, value), (count, total) in buckets.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0006_seed_reference_leads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('status', 'Status'), ('source', 'Source'), ('country', 'Country')], max_length=20)),
+                ('value', models.CharField(blank=True, default='', max_length=255)),
+                ('lead_count', models.IntegerField(default=0)),
+                ('score_total', models.FloatField(default=0.0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='pipelinesummary_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(summarise_existing_leads, migrations.RunPython.noop),
+    ]
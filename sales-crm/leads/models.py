@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 from employee.models import Employee
 
 class BaseContact(models.Model):
@@ -31,6 +32,31 @@ class Lead(BaseContact):
         related_name='assigned_leads'
     )
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order used by the lead list endpoints.
+            models.Index(fields=['-created_at', '-id'], name='lead_created_id_idx'),
+            # Status-filtered lists, newest first.
+            models.Index(fields=['status', '-created_at', '-id'], name='lead_status_created_idx'),
+            # Per-employee views ("my open leads").
+            models.Index(fields=['assigned_to', 'status'], name='lead_assignee_status_idx'),
+            # Ranking by score.
+            models.Index(fields=['-score'], name='lead_score_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # post_save updates PipelineSummary (leads/signals.py): commit both or neither.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        if fields is None:
+            # A full reload: the values leads/signals.py snapshotted may be stale.
+            # (Loading a deferred field also lands here, with ``fields`` set.)
+            self._pipeline_snapshot = None
+
     def __str__(self):
         return f"{self.name} ({self.status})"
 
@@ -48,5 +74,115 @@ class Customer(BaseContact):
         related_name='converted_customer'
     )
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order used by the customer list endpoint.
+            models.Index(fields=['-joined_at', '-id'], name='customer_joined_id_idx'),
+        ]
+
     def __str__(self):
         return self.company_name or ''
+
+
+class LeadScoreCache(models.Model):
+    """LLM score keyed by a hash of the exact prompt inputs (see leads/score_cache.py)."""
+    key = models.CharField(max_length=64, primary_key=True)
+    score = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.key[:12]}: {self.score}"
+
+
+class ScoringJob(models.Model):
+    """A queued LLM scoring request, picked up by ``manage.py run_scoring_worker``."""
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    OPEN_STATUSES = ("queued", "running")
+
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='scoring_jobs')
+    force = models.BooleanField(default=False)  # bypass the score cache
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True, null=True)
+    score = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='scoringjob_status_created_idx'),
+        ]
+        constraints = [
+            # At most one open job per lead, so retried requests reuse it.
+            models.UniqueConstraint(
+                fields=['lead'],
+                condition=models.Q(status__in=("queued", "running")),
+                name='scoringjob_one_open_per_lead',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Scoring job {self.pk} for lead {self.lead_id} ({self.status})"
+
+
+class ReferenceLead(models.Model):
+    """A scored example lead offered to the LLM as few-shot context (see leads/examples.py)."""
+    TIER_CHOICES = [
+        ("amazing", "Amazing"),
+        ("decent", "Decent"),
+        ("terrible", "Terrible"),
+    ]
+
+    company_name = models.CharField(max_length=255)
+    industry = models.CharField(max_length=255, blank=True, default="")
+    employee_count = models.IntegerField(null=True, blank=True)
+    budget_estimate = models.FloatField(default=0.0)
+    country = models.CharField(max_length=255, blank=True, default="")
+    description = models.TextField(blank=True, default="")
+    expected_score = models.FloatField()
+    tier = models.CharField(max_length=20, choices=TIER_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.company_name} ({self.tier})"
+
+
+class ReferenceLeadDeletion(models.Model):
+    """Tombstone for a deleted ReferenceLead, read by other processes' example indexes."""
+    reference_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Reference lead {self.reference_id} deleted at {self.deleted_at}"
+
+
+class PipelineSummary(models.Model):
+    """
+    Lead count and score total per status/source/country bucket, kept up to
+    date incrementally by leads/pipeline.py so the dashboard never scans leads.
+    """
+    DIMENSION_CHOICES = [
+        ("status", "Status"),
+        ("source", "Source"),
+        ("country", "Country"),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=255, blank=True, default="")  # "" for leads without a value
+    lead_count = models.IntegerField(default=0)
+    score_total = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='pipelinesummary_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.value or '-'}: {self.lead_count}"
@@ -0,0 +1,139 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count for a list endpoint.
+
+    Unfiltered querysets on PostgreSQL are estimated from planner statistics
+    so the cost does not grow with the table. Everything else is an exact
+    COUNT: other backends keep no usable estimate (the highest primary key
+    also counts every deleted row). Returns a ``(count, is_approximate)``
+    tuple.
+    """
+    connection = connections[queryset.db]
+    if not queryset.query.where and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0], True
+    return queryset.count(), False
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset (cursor) pagination over ``(timestamp, id)``.
+
+    Each page is fetched with ``WHERE (ts, id) < (cursor_ts, cursor_id)``
+    ordered newest first, so the cost of a page is independent of how deep
+    into the table the client is.
+    """
+    timestamp_field = 'created_at'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'include_count'
+
+    def __init__(self):
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true', 'True'):
+            self.count = estimate_count(queryset)
+
+        ts_field = self.timestamp_field
+        queryset = queryset.order_by(f'-{ts_field}', '-id')
+        if position is not None:
+            timestamp, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{ts_field}__lt': timestamp}) | Q(**{ts_field: timestamp, 'id__lt': pk})
+            )
+
+        # Fetch one extra row to find out whether there is a next page.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            timestamp, pk = json.loads(raw)
+            timestamp = parse_datetime(timestamp)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise NotFound('Invalid cursor')
+        if timestamp is None:
+            raise NotFound('Invalid cursor')
+        return timestamp, pk
+
+    def encode_cursor(self, obj):
+        timestamp = getattr(obj, self.timestamp_field)
+        raw = json.dumps([timestamp.isoformat(), obj.pk])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link()}
+        if self.count is not None:
+            body['count'], body['count_is_approximate'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_is_approximate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class LeadPagination(KeysetPagination):
+    timestamp_field = 'created_at'
+
+
+class CustomerPagination(KeysetPagination):
+    timestamp_field = 'joined_at'
@@ -0,0 +1,116 @@
+"""
+Incremental maintenance of the ``PipelineSummary`` rollup.
+
+Every write path that changes a lead's status, source, country or score
+records the old and new values in a ``PipelineDelta`` and applies the net
+change as one ``UPDATE ... SET lead_count = lead_count + n`` per touched
+bucket, in the same transaction as the lead write. Single saves and deletes
+go through the model signals in leads/signals.py (``Lead.save`` and
+``delete()`` run in a transaction of their own); bulk paths (import,
+conversion, batch scoring) build one delta for the whole batch inside the
+transaction that writes the leads.
+
+``bulk_create`` and ``QuerySet.update`` send no signals, while a queryset
+``delete()`` does: code that writes leads with them must apply a delta
+itself, or the rollup drifts until ``manage.py rebuild_pipeline_summary``.
+The signals diff against the values an instance was loaded with, so call
+``refresh_from_db()`` on an instance a bulk write changed before saving or
+deleting it.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Lead, PipelineSummary
+
+PIPELINE_DIMENSIONS = ('status', 'source', 'country')
+# Lead columns the rollup depends on; load these before a bulk write.
+PIPELINE_FIELDS = PIPELINE_DIMENSIONS + ('score',)
+
+
+def pipeline_values(lead):
+    return {field: getattr(lead, field) for field in PIPELINE_FIELDS}
+
+
+class PipelineDelta:
+    def __init__(self):
+        self.changes = defaultdict(lambda: [0, 0.0])
+
+    def add(self, values, sign=1):
+        score = values['score'] or 0.0
+        for dimension in PIPELINE_DIMENSIONS:
+            change = self.changes[(dimension, values[dimension] or "")]
+            change[0] += sign
+            change[1] += sign * score
+
+    def remove(self, values):
+        self.add(values, -1)
+
+    def move(self, old_values, new_values):
+        self.remove(old_values)
+        self.add(new_values)
+
+    def apply(self):
+        with transaction.atomic():
+            for (dimension, value), (count, score) in self.changes.items():
+                if count == 0 and score == 0:
+                    continue
+                _apply_bucket(dimension, value, count, score)
+        self.changes.clear()
+
+
+def _apply_bucket(dimension, value, count, score):
+    bucket = PipelineSummary.objects.filter(dimension=dimension, value=value)
+    if bucket.update(lead_count=F('lead_count') + count, score_total=F('score_total') + score):
+        return
+    try:
+        with transaction.atomic():
+            PipelineSummary.objects.create(dimension=dimension, value=value, lead_count=count, score_total=score)
+    except IntegrityError:
+        # Created concurrently between our UPDATE and INSERT.
+        bucket.update(lead_count=F('lead_count') + count, score_total=F('score_total') + score)
+
+
+def rebuild_pipeline_summary():
+    """Recompute every bucket from the lead table. Returns the bucket count."""
+    with transaction.atomic():
+        buckets = _summarise_leads()
+        PipelineSummary.objects.all().delete()
+        PipelineSummary.objects.bulk_create(buckets, batch_size=500)
+    return len(buckets)
+
+
+def _summarise_leads():
+    buckets = []
+    for dimension in PIPELINE_DIMENSIONS:
+        rows = Lead.objects.order_by().values(dimension).annotate(count=Count('pk'), total=Sum('score'))
+        merged = defaultdict(lambda: [0, 0.0])
+        for row in rows:
+            # NULL and "" both land in the "" bucket, as in PipelineDelta.
+            bucket = merged[row[dimension] or ""]
+            bucket[0] += row['count']
+            bucket[1] += row['total'] or 0.0
+        buckets += [
+            PipelineSummary(dimension=dimension, value=value, lead_count=count, score_total=total)
+            for value, (count, total) in merged.items()
+        ]
+    return buckets
+
+
+def pipeline_summary():
+    """The dashboard rollup, read from ``PipelineSummary`` only."""
+    summary = {f'by_{dimension}': [] for dimension in PIPELINE_DIMENSIONS}
+    total = score_total = 0
+    for bucket in PipelineSummary.objects.filter(lead_count__gt=0).order_by('dimension', '-lead_count', 'value'):
+        summary[f'by_{bucket.dimension}'].append({
+            'value': bucket.value or None,
+            'count': bucket.lead_count,
+            'average_score': bucket.score_total / bucket.lead_count,
+        })
+        if bucket.dimension == 'status':
+            total += bucket.lead_count
+            score_total += bucket.score_total
+    summary['total'] = total
+    summary['average_score'] = score_total / total if total else None
+    return summary
@@ -0,0 +1,86 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from crm_project.metrics import registry
+from .baml_client.inlinedbaml import get_baml_files
+from .models import LeadScoreCache
+
+# Per-process counts (see crm_project/metrics.py), so lookups write nothing
+# shared; /api/_metrics exports them per worker.
+HITS = registry.counter('lead_score_cache_hits', 'Score cache lookups that found an unexpired score.')
+MISSES = registry.counter('lead_score_cache_misses', 'Score cache lookups that found no score.')
+STORED = registry.counter('lead_score_cache_stored', 'Scores written to the score cache.')
+
+# Any edit to the prompt, the output schema or the client/model definition
+# in baml_src changes this digest and therefore invalidates every entry.
+PROMPT_VERSION = hashlib.sha256(
+    '\0'.join(sorted(get_baml_files().values())).encode('utf-8')
+).hexdigest()
+
+
+def cache_key(lead_info, lead_examples):
+    version = PROMPT_VERSION
+    if settings.LEAD_SCORING_LLM_BASE_URL:
+        # Scores from an overriding endpoint/model are not interchangeable.
+        version = [version, settings.LEAD_SCORING_LLM_BASE_URL, settings.LEAD_SCORING_LLM_MODEL]
+    payload = json.dumps(
+        [version, lead_info.model_dump(), lead_examples.model_dump()],
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def lookup(keys):
+    """Return ``{key: score}`` for the unexpired entries among ``keys``."""
+    cutoff = timezone.now() - timedelta(seconds=settings.LEAD_SCORE_CACHE_TTL)
+    found = dict(
+        LeadScoreCache.objects.filter(key__in=set(keys), created_at__gte=cutoff).values_list('key', 'score')
+    )
+    hits = sum(1 for key in keys if key in found)
+    HITS.add(hits)
+    MISSES.add(len(keys) - hits)
+    return found
+
+
+def store(scores):
+    """Persist ``{key: score}``, refreshing entries that already exist."""
+    if not scores:
+        return
+    now = timezone.now()
+    LeadScoreCache.objects.bulk_create(
+        [LeadScoreCache(key=key, score=score, created_at=now) for key, score in scores.items()],
+        update_conflicts=True,
+        unique_fields=['key'],
+        update_fields=['score', 'created_at'],
+        batch_size=500,
+    )
+    # Pruning counts the whole table, so each process runs it once per
+    # LEAD_SCORE_CACHE_PRUNE_EVERY entries it stores, not on every write.
+    if STORED.add(len(scores)) % settings.LEAD_SCORE_CACHE_PRUNE_EVERY < len(scores):
+        prune()
+
+
+def prune():
+    """Drop expired entries, then the oldest ones beyond the size bound."""
+    cutoff = timezone.now() - timedelta(seconds=settings.LEAD_SCORE_CACHE_TTL)
+    LeadScoreCache.objects.filter(created_at__lt=cutoff).delete()
+
+    overflow = LeadScoreCache.objects.count() - settings.LEAD_SCORE_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = LeadScoreCache.objects.order_by('created_at').values_list('key', flat=True)[:overflow]
+        LeadScoreCache.objects.filter(key__in=list(oldest)).delete()
+
+
+def stats():
+    """Entry count and prompt version, with this process's hit and miss counts."""
+    return {
+        'hits': HITS.value,
+        'misses': MISSES.value,
+        'entries': LeadScoreCache.objects.count(),
+        'prompt_version': PROMPT_VERSION,
+    }
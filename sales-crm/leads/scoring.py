@@ -0,0 +1,176 @@
+import asyncio
+import functools
+import os
+
+from asgiref.sync import async_to_sync, sync_to_async
+from baml_py import ClientRegistry
+from django.conf import settings
+from django.db import transaction
+
+from crm_project.metrics import timed
+
+from .baml_client.async_client import b as async_b
+from .baml_client.sync_client import b
+from .baml_client.types import LeadInfo
+from .examples import examples_for
+from . import score_cache
+from .models import Lead
+from .pipeline import PipelineDelta, pipeline_values
+
+# Lead columns the LLM prompt depends on.
+SCORING_FIELDS = ('company_name', 'industry', 'employee_count', 'budget_estimate', 'country', 'description')
+
+
+def lead_info_for(lead):
+    # Null model fields are sent as empty/zero values, the prompt expects them set.
+    return LeadInfo(
+        companyName=lead.company_name or "",
+        industry=lead.industry or "",
+        employeeCount=lead.employee_count or 0,
+        budgetEstimate=float(lead.budget_estimate or 0),
+        country=lead.country or "",
+        description=lead.description or ""
+    )
+
+
+def save_cached_score(lead):
+    """
+    The cached score for ``lead``'s current inputs, written to the lead as
+    ``score_lead_now`` would, or ``None`` on a cache miss.
+    """
+    _, key, score = _prompt(lead_info_for(lead), force=False)
+    if score is not None:
+        _save_score(lead, key, score, cached=True)
+    return score
+
+
+def baml_options():
+    """
+    Options for every ScoreTheLead call. With LEAD_SCORING_LLM_BASE_URL set
+    (e.g. a local stub server) calls go to that OpenAI-compatible endpoint
+    instead of the client defined in baml_src.
+    """
+    base_url = settings.LEAD_SCORING_LLM_BASE_URL
+    if not base_url:
+        return {}
+    return {'client_registry': _client_registry(base_url, settings.LEAD_SCORING_LLM_MODEL)}
+
+
+@functools.lru_cache(maxsize=4)
+def _client_registry(base_url, model):
+    registry = ClientRegistry()
+    registry.add_llm_client('ScoringOverride', 'openai-generic', {
+        'base_url': base_url,
+        'model': model,
+        'api_key': os.getenv('TOGETHER_API_KEY', ''),
+        'temperature': 0,
+    })
+    registry.set_primary('ScoringOverride')
+    return registry
+
+
+def _prompt(lead_info, force):
+    lead_examples = examples_for(lead_info)
+    key = score_cache.cache_key(lead_info, lead_examples)
+    score = None if force else score_cache.lookup([key]).get(key)
+    return lead_examples, key, score
+
+
+def _save_score(lead, key, score, cached):
+    if not cached:
+        score_cache.store({key: score})
+    if lead.score != score:
+        lead.score = score
+        lead.save(update_fields=['score'])
+
+
+def score_lead_now(lead, force=False):
+    """
+    Score a single lead with the blocking client and persist the score.
+    Unchanged inputs are answered from the score cache unless ``force``.
+    Returns ``(score, cached)``.
+    """
+    lead_info = lead_info_for(lead)
+    lead_examples, key, score = _prompt(lead_info, force)
+    cached = score is not None
+    if not cached:
+        with timed('llm'):
+            score = b.ScoreTheLead(lead_info, lead_examples, baml_options=baml_options()).lead_score
+    _save_score(lead, key, score, cached)
+    return score, cached
+
+
+async def ascore_lead_now(lead, force=False):
+    """
+    ``score_lead_now`` for async views: the LLM call is awaited on the async
+    client, so a waiting request holds no thread.
+    """
+    lead_info = lead_info_for(lead)
+    lead_examples, key, score = await sync_to_async(_prompt)(lead_info, force)
+    cached = score is not None
+    if not cached:
+        with timed('llm'):
+            score = (await async_b.ScoreTheLead(lead_info, lead_examples, baml_options=baml_options())).lead_score
+    await sync_to_async(_save_score)(lead, key, score, cached)
+    return score, cached
+
+
+async def _score_concurrently(prompts, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    options = baml_options()
+
+    async def score_one(lead_info, lead_examples):
+        async with semaphore:
+            result = await async_b.ScoreTheLead(lead_info, lead_examples, baml_options=options)
+            return result.lead_score
+
+    outcomes = await asyncio.gather(
+        *(score_one(*prompt) for prompt in prompts.values()), return_exceptions=True
+    )
+    return dict(zip(prompts, outcomes))
+
+
+def score_leads_in_bulk(leads, concurrency=None, force=False):
+    """
+    Score ``leads`` (loaded with at least ``SCORING_FIELDS`` and
+    ``PIPELINE_FIELDS``) through the async BAML client, at most ``concurrency``
+    LLM calls in flight, and write every changed score back with a single
+    ``bulk_update``. Leads whose prompt inputs are already in the score
+    cache (or repeat within the batch) cost no LLM call unless ``force``.
+    Returns ``(results, errors)`` lists of per-lead dicts.
+    """
+    concurrency = concurrency or settings.LEAD_SCORING_CONCURRENCY
+    prompts, lead_keys = {}, []
+    for lead in leads:
+        lead_info = lead_info_for(lead)
+        examples = examples_for(lead_info)
+        key = score_cache.cache_key(lead_info, examples)
+        prompts.setdefault(key, (lead_info, examples))
+        lead_keys.append((lead, key))
+
+    cached = {} if force else score_cache.lookup([key for _, key in lead_keys])
+    pending = {key: prompt for key, prompt in prompts.items() if key not in cached}
+    with timed('llm'):
+        outcomes = async_to_sync(_score_concurrently)(pending, concurrency) if pending else {}
+    score_cache.store({
+        key: outcome for key, outcome in outcomes.items() if not isinstance(outcome, Exception)
+    })
+
+    results, errors, changed = [], [], []
+    delta = PipelineDelta()
+    for lead, key in lead_keys:
+        outcome = cached[key] if key in cached else outcomes[key]
+        if isinstance(outcome, Exception):
+            errors.append({'id': lead.pk, 'error': str(outcome)})
+            continue
+        if lead.score != outcome:
+            before = pipeline_values(lead)
+            lead.score = outcome
+            delta.move(before, pipeline_values(lead))
+            changed.append(lead)
+        results.append({'id': lead.pk, 'score': outcome, 'cached': key in cached})
+
+    with transaction.atomic():
+        Lead.objects.bulk_update(changed, ['score'], batch_size=500)
+        delta.apply()
+    return results, errors
@@ -1,15 +1,31 @@
-﻿from rest_framework import serializers
-from .models import Lead, Customer
+﻿from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+from .models import Lead, Customer, ScoringJob
 from employee.serializers import EmployeeSerializer
+from crm_project.db import retry_on_lock
+from crm_project.metrics import TimedSerializerMixin
+from search.backends import index_objects
+from .filters import apply_lead_filters
+from .jobs import queue_position
+from .pipeline import PIPELINE_FIELDS, PipelineDelta, pipeline_values
 
-class LeadSerializer(serializers.ModelSerializer):
+class LeadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     assigned_to = EmployeeSerializer(read_only=True)
     
     class Meta:
         model = Lead
         fields = '__all__'
 
-class CustomerSerializer(serializers.ModelSerializer):
+class LeadImportSerializer(serializers.ModelSerializer):
+    """Row validation for bulk imports; email uniqueness is checked per chunk, not per row."""
+    class Meta:
+        model = Lead
+        fields = ['company_name', 'email', 'phone', 'source', 'status', 'industry',
+                  'employee_count', 'budget_estimate', 'country', 'description']
+        extra_kwargs = {'email': {'validators': []}}
+
+class CustomerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = '__all__'
@@ -37,3 +53,98 @@ class LeadToCustomerSerializer(serializers.Serializer):
         lead.save()
 
         return customer
+
+
+class ScoringJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    queue_position = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ScoringJob
+        fields = ['id', 'lead', 'status', 'score', 'error', 'attempts', 'queue_position',
+                  'created_at', 'started_at', 'finished_at']
+
+    def get_queue_position(self, job):
+        return queue_position(job)
+
+class LeadSelectionSerializer(serializers.Serializer):
+    """Selects the leads a bulk operation runs on, by id list or by filter."""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    filter = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Provide exactly one of 'ids' or 'filter'.")
+        return attrs
+
+    def select(self, queryset):
+        if 'ids' in self.validated_data:
+            return queryset.filter(pk__in=self.validated_data['ids'])
+        return apply_lead_filters(queryset, self.validated_data['filter'])
+
+    def missing_ids(self, found_ids):
+        requested = self.validated_data.get('ids', [])
+        found_ids = set(found_ids)
+        return [pk for pk in dict.fromkeys(requested) if pk not in found_ids]
+
+
+class BulkLeadToCustomerSerializer(LeadSelectionSerializer):
+    """
+    Converts every selected lead in one transaction with set-based writes.
+    ``save()`` returns ``{lead_id: outcome}`` where the outcome is one of
+    ``converted`` (with the new ``customer`` id), ``already_converted``,
+    ``email_conflict`` (a customer already uses the email) or ``not_found``.
+    """
+
+    @retry_on_lock
+    def create(self, validated_data):
+        limit = settings.LEAD_BATCH_MAX_SIZE
+        with transaction.atomic():
+            leads = list(
+                self.select(Lead.objects.select_for_update()).order_by('pk').only(
+                    'id', 'company_name', 'email', 'phone', 'industry', *PIPELINE_FIELDS
+                )[:limit + 1]
+            )
+            if len(leads) > limit:
+                raise serializers.ValidationError(f"Selection matches more than {limit} leads, narrow the filter.")
+
+            lead_ids = [lead.pk for lead in leads]
+            converted = set(
+                Customer.objects.filter(converted_from_lead__in=lead_ids).values_list('converted_from_lead_id', flat=True)
+            )
+            taken_emails = set(
+                Customer.objects.filter(email__in=[lead.email for lead in leads]).values_list('email', flat=True)
+            )
+
+            outcomes = {pk: {'status': 'not_found'} for pk in self.missing_ids(lead_ids)}
+            new_customers = []
+            for lead in leads:
+                if lead.pk in converted:
+                    outcomes[lead.pk] = {'status': 'already_converted'}
+                elif lead.email in taken_emails:
+                    outcomes[lead.pk] = {'status': 'email_conflict'}
+                else:
+                    new_customers.append(Customer(
+                        company_name=lead.company_name,
+                        email=lead.email,
+                        phone=lead.phone,
+                        industry=lead.industry,
+                        country=lead.country,
+                        converted_from_lead=lead,
+                        contact_person=""
+                    ))
+
+            Customer.objects.bulk_create(new_customers, batch_size=500)
+            index_objects(new_customers)
+            Lead.objects.filter(pk__in=[c.converted_from_lead_id for c in new_customers]).update(status="Qualified")
+
+            delta = PipelineDelta()
+            for customer in new_customers:
+                lead = customer.converted_from_lead
+                before = pipeline_values(lead)
+                lead.status = "Qualified"
+                delta.move(before, pipeline_values(lead))
+            delta.apply()
+
+        for customer in new_customers:
+            outcomes[customer.converted_from_lead_id] = {'status': 'converted', 'customer': customer.pk}
+        return outcomes
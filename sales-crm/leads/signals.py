@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .examples import example_index, record_deletion
+from .models import Lead, ReferenceLead
+from .pipeline import PIPELINE_FIELDS, PipelineDelta, pipeline_values
+
+
+@receiver(post_save, sender=ReferenceLead)
+def index_reference_lead(sender, instance, **kwargs):
+    transaction.on_commit(lambda: example_index.upsert(instance))
+
+
+@receiver(post_delete, sender=ReferenceLead)
+def unindex_reference_lead(sender, instance, **kwargs):
+    pk = instance.pk
+    # The tombstone is written with the delete; this process drops the row
+    # once the delete commits.
+    record_deletion(pk)
+    transaction.on_commit(lambda: example_index.remove(pk))
+
+
+@receiver(post_init, sender=Lead)
+def snapshot_pipeline_values(sender, instance, **kwargs):
+    # Read __dict__ directly: touching a deferred field here would cost a query.
+    loaded = instance.__dict__
+    if all(field in loaded for field in PIPELINE_FIELDS):
+        instance._pipeline_snapshot = {field: loaded[field] for field in PIPELINE_FIELDS}
+    else:
+        instance._pipeline_snapshot = None
+
+
+@receiver(pre_save, sender=Lead)
+def load_pipeline_snapshot(sender, instance, **kwargs):
+    if not instance._state.adding and instance._pipeline_snapshot is None:
+        instance._pipeline_snapshot = (
+            Lead.objects.filter(pk=instance.pk).values(*PIPELINE_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Lead)
+def update_pipeline_on_save(sender, instance, created, **kwargs):
+    current = pipeline_values(instance)
+    delta = PipelineDelta()
+    if created or instance._pipeline_snapshot is None:
+        delta.add(current)
+    else:
+        delta.move(instance._pipeline_snapshot, current)
+    delta.apply()
+    instance._pipeline_snapshot = current
+
+
+@receiver(post_delete, sender=Lead)
+def update_pipeline_on_delete(sender, instance, **kwargs):
+    delta = PipelineDelta()
+    delta.remove(instance._pipeline_snapshot or pipeline_values(instance))
+    delta.apply()
@@ -1,3 +1,530 @@
-from django.test import TestCase
+import asyncio
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from crm_project.metrics import registry
+from crm_project.testing import QueryBudgetTestCase, QueryPlanTestCase
+from employee.models import Employee
+from . import importer, score_cache
+from .baml_client.async_client import b as async_b
+from .baml_client.types import LeadInfo
+from .examples import TOMBSTONE_RETENTION, ExampleIndex, _TierIndex, examples_for, lead_info_features
+from .jobs import work
+from .models import Lead, Customer, LeadScoreCache, PipelineSummary, ReferenceLead, ReferenceLeadDeletion, ScoringJob
+from .pipeline import rebuild_pipeline_summary
+from .scoring import lead_info_for, score_leads_in_bulk
+from .serializers import BulkLeadToCustomerSerializer
+
+
+class LeadQueryPlanTests(QueryPlanTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = Employee.objects.create_user(username='planner', password='x')
+        cls.now = timezone.now()
+
+    def after_cursor(self, queryset):
+        return queryset.filter(Q(created_at__lt=self.now) | Q(created_at=self.now, id__lt=100))
+
+    def test_list_first_page(self):
+        self.assertIndexed(Lead.objects.order_by('-created_at', '-id')[:51])
+
+    def test_list_page_after_cursor(self):
+        self.assertIndexed(self.after_cursor(Lead.objects.order_by('-created_at', '-id'))[:51])
+
+    def test_status_filtered_list(self):
+        self.assertIndexed(Lead.objects.filter(status='New').order_by('-created_at', '-id')[:51])
+
+    def test_status_filtered_page_after_cursor(self):
+        queryset = self.after_cursor(Lead.objects.filter(status='New').order_by('-created_at', '-id'))
+        self.assertIndexed(queryset[:51])
+
+    def test_employee_leads_by_status(self):
+        self.assertIndexed(Lead.objects.filter(assigned_to=self.employee, status='Contacted'))
+
+    def test_top_scored_leads(self):
+        self.assertIndexed(Lead.objects.order_by('-score')[:20])
+
+    def test_existing_email_lookup(self):
+        self.assertIndexed(Lead.objects.filter(email__in=['a@example.com', 'b@example.com']).values_list('email'))
+
+
+class CustomerQueryPlanTests(QueryPlanTestCase):
+    def test_list_first_page(self):
+        self.assertIndexed(Customer.objects.order_by('-joined_at', '-id')[:51])
+
+    def test_converted_lead_lookup(self):
+        self.assertIndexed(Customer.objects.filter(converted_from_lead__in=[1, 2, 3]))
+
+    def test_existing_email_lookup(self):
+        self.assertIndexed(Customer.objects.filter(email__in=['a@example.com']).values_list('email'))
+
+
+class BookkeepingQueryPlanTests(QueryPlanTestCase):
+    def test_scoring_job_claim(self):
+        self.assertIndexed(ScoringJob.objects.filter(status='queued').order_by('created_at', 'pk')[:1])
+
+    def test_open_scoring_job_for_lead(self):
+        self.assertIndexed(ScoringJob.objects.filter(lead_id=1, status__in=ScoringJob.OPEN_STATUSES))
+
+    def test_pipeline_bucket_lookup(self):
+        self.assertIndexed(PipelineSummary.objects.filter(dimension='status', value='New'))
+
+
+class LeadQueryBudgetTests(QueryBudgetTestCase):
+    def seed(self, count):
+        start = self.seeded
+        employees = Employee.objects.bulk_create([
+            Employee(username=f'rep-{n}', email=f'rep-{n}@example.com') for n in range(start, start + count)
+        ])
+        leads = [
+            Lead.objects.create(company_name=f'Lead {n}', email=f'lead-{n}@example.com', status='New',
+                                industry='Software', country='Germany', assigned_to=employee)
+            for n, employee in enumerate(employees, start)
+        ]
+        Customer.objects.bulk_create([
+            Customer(company_name=f'Customer {n}', email=f'customer-{n}@example.com', contact_person='Jo')
+            for n in range(start, start + count)
+        ])
+        ScoringJob.objects.bulk_create([ScoringJob(lead=lead) for lead in leads])
+        # Scores are already cached, so no test calls the LLM.
+        score_cache.store({
+            score_cache.cache_key(info, examples_for(info)): 50.0 for info in map(lead_info_for, leads)
+        })
+
+    def latest(self, model):
+        return model.objects.order_by('-pk').first()
+
+    def test_lead_list(self):
+        self.assertQueryBudget(1, 'get', '/api/leads/')
+
+    def test_lead_list_with_count(self):
+        self.assertQueryBudget(2, 'get', '/api/leads/?include_count=1&status=New')
+
+    def test_lead_search(self):
+        self.assertQueryBudget(1, 'get', '/api/leads/?q=lead')
+
+    def test_lead_create(self):
+        self.assertQueryBudget(7, 'post', '/api/leads/', lambda: {'email': f'new-{self.seeded}@example.com'})
+
+    def test_lead_detail(self):
+        self.assertQueryBudget(1, 'get', lambda: f'/api/leads/{self.latest(Lead).pk}/')
+
+    def test_lead_update(self):
+        self.assertQueryBudget(5, 'put', lambda: f'/api/leads/{self.latest(Lead).pk}/',
+                               lambda: {'email': f'moved-{self.seeded}@example.com'})
+
+    def test_lead_partial_update(self):
+        self.assertQueryBudget(6, 'patch', lambda: f'/api/leads/{self.latest(Lead).pk}/', {'status': 'Contacted'})
+
+    def test_lead_delete(self):
+        self.assertQueryBudget(9, 'delete', lambda: f'/api/leads/{self.latest(Lead).pk}/')
+
+    def test_pipeline_summary(self):
+        self.assertQueryBudget(1, 'get', '/api/leads/summary/')
+
+    def test_lead_export(self):
+        self.assertQueryBudget(1, 'get', '/api/leads/export/')
+
+    def test_lead_import(self):
+        def upload():
+            rows = ''.join(f'imported-{self.seeded}-{n}@example.com,Import {n}\n' for n in range(3))
+            return {'file': SimpleUploadedFile('leads.csv', f'email,company_name\n{rows}'.encode())}
+        self.assertQueryBudget(7, 'post', '/api/leads/import/', upload, format='multipart')
+
+    def test_score_lead_cached(self):
+        # The cached score is written to the lead: its UPDATE, the pipeline
+        # summary and search index rows.
+        self.assertQueryBudget(8, 'post', lambda: f'/api/leads/{self.latest(Lead).pk}/score/')
+
+    def test_score_lead_queued(self):
+        self.assertQueryBudget(3, 'post', lambda: f'/api/leads/{self.latest(Lead).pk}/score/?force=1')
+
+    def test_score_leads_batch(self):
+        self.assertQueryBudget(6, 'post', '/api/leads/score/batch/', {'filter': {'status': 'New'}})
+
+    def test_score_cache_stats(self):
+        self.assertQueryBudget(1, 'get', '/api/leads/score/cache/')
+
+    def test_scoring_job_status(self):
+        self.assertQueryBudget(2, 'get', lambda: f'/api/leads/score/jobs/{self.latest(ScoringJob).pk}/')
+
+    def test_convert_lead(self):
+        self.assertQueryBudget(9, 'post', '/api/leads/convert/', lambda: {'lead_id': self.latest(Lead).pk})
+
+    def test_convert_leads_in_bulk(self):
+        self.assertQueryBudget(9, 'post', '/api/leads/convert/bulk/', {'filter': {'status': 'New'}})
+
+    def test_assign_lead(self):
+        self.assertQueryBudget(5, 'post', lambda: f'/api/leads/{self.latest(Lead).pk}/assign/',
+                               lambda: {'employee_id': self.user.pk})
+
+    def test_customer_list(self):
+        self.assertQueryBudget(1, 'get', '/api/customers/')
+
+    def test_customer_create(self):
+        self.assertQueryBudget(4, 'post', '/api/customers/', lambda: {
+            'company_name': 'New', 'email': f'new-{self.seeded}@example.com', 'contact_person': 'Jo'})
+
+    def test_customer_export(self):
+        self.assertQueryBudget(1, 'get', '/api/customers/export/')
+
+
+@override_settings(API_PAGE_SIZE=2, API_MAX_PAGE_SIZE=3)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Employee.objects.create_user(username='pager', password='x'))
+
+    def create(self, count):
+        return [Lead.objects.create(company_name=f'Paged {n}', email=f'paged{n}@example.com') for n in range(count)]
+
+    def walk(self, url):
+        pages, seen = 0, []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [lead['id'] for lead in response.json()['results']]
+            url = response.json()['next']
+            pages += 1
+        return pages, seen
+
+    def test_next_links_walk_newest_first(self):
+        leads = self.create(5)
+        pages, seen = self.walk('/api/leads/')
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [lead.pk for lead in reversed(leads)])
+
+    def test_tied_timestamps_are_ordered_by_id(self):
+        leads = self.create(5)
+        Lead.objects.update(created_at=timezone.now())
+        self.assertEqual(self.walk('/api/leads/')[1], sorted((lead.pk for lead in leads), reverse=True))
+
+    def test_page_size_is_capped(self):
+        self.create(5)
+        for page_size, expected in (('1', 1), ('3', 3), ('100', 3), ('0', 2), ('-1', 2), ('many', 2)):
+            with self.subTest(page_size=page_size):
+                response = self.client.get('/api/leads/', {'page_size': page_size})
+                self.assertEqual(len(response.json()['results']), expected)
+
+    def test_next_link_keeps_the_filters(self):
+        self.create(4)
+        Lead.objects.filter(email__in=['paged1@example.com', 'paged3@example.com']).update(status='Contacted')
+        response = self.client.get('/api/leads/', {'status': 'New', 'page_size': 1, 'include_count': 1})
+        self.assertEqual((response.json()['count'], response.json()['count_is_approximate']), (2, False))
+        self.assertIn('status=New', response.json()['next'])
+        self.assertNotIn('include_count', response.json()['next'])
+        self.assertEqual(self.walk(response.json()['next'])[1], [Lead.objects.get(email='paged0@example.com').pk])
+
+    def test_count_is_exact_after_deletes(self):
+        leads = self.create(5)
+        leads[-1].delete()
+        leads[0].delete()
+        response = self.client.get('/api/leads/', {'include_count': 1})
+        self.assertEqual((response.json()['count'], response.json()['count_is_approximate']), (3, False))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/leads/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class PipelineRollupTests(TestCase):
+    def rollup(self):
+        return {
+            (bucket.dimension, bucket.value): (bucket.lead_count, round(bucket.score_total, 6))
+            for bucket in PipelineSummary.objects.exclude(lead_count=0, score_total=0)
+        }
+
+    def assertRollupMatchesRebuild(self):
+        incremental = self.rollup()
+        rebuild_pipeline_summary()
+        self.assertEqual(incremental, self.rollup())
+
+    def test_write_paths_keep_the_rollup_exact(self):
+        first = Lead.objects.create(email='one@example.com', source='Web', country='DE', score=10)
+        second = Lead.objects.create(email='two@example.com', source='Referral', score=20)
+        Lead.objects.create(email='three@example.com', status='Contacted', country='FR', score=5)
+
+        first.status, first.score = 'Contacted', 40
+        first.save()
+        second.country = 'DE'
+        second.save(update_fields=['country'])
+        # Loaded with deferred pipeline fields: the signal reads the old values first.
+        deferred = Lead.objects.only('email').get(email='three@example.com')
+        deferred.source = 'Event'
+        deferred.save()
+
+        created, rejected = importer.import_leads([
+            (1, {'email': 'four@example.com', 'source': 'Web', 'country': 'DE'}),
+            (2, {'email': 'five@example.com', 'status': 'Qualified'}),
+            (3, {'email': 'one@example.com'}),
+        ])
+        self.assertEqual((created, rejected), (2, 1))
+
+        conversion = BulkLeadToCustomerSerializer(data={'ids': [first.pk, second.pk]})
+        conversion.is_valid(raise_exception=True)
+        conversion.save()
+
+        # The conversion wrote statuses with update(): reload before deleting.
+        second.refresh_from_db()
+        second.delete()
+        Lead.objects.filter(email__in=['four@example.com', 'five@example.com']).delete()
+        self.assertRollupMatchesRebuild()
+        self.assertEqual(PipelineSummary.objects.get(dimension='status', value='Qualified').lead_count, 1)
+
+    def test_failed_save_leaves_the_rollup_alone(self):
+        Lead.objects.create(email='taken@example.com', score=1)
+        with self.assertRaises(IntegrityError):
+            Lead.objects.create(email='taken@example.com', score=2)
+        self.assertRollupMatchesRebuild()
+
+
+class ScoreLeadsInBulkTests(TestCase):
+    def setUp(self):
+        self.in_flight = self.peak = 0
+        llm = mock.patch.object(async_b, 'ScoreTheLead', self.fake_llm)
+        llm.start()
+        self.addCleanup(llm.stop)
+
+    async def fake_llm(self, lead_info, lead_examples, baml_options=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if lead_info.companyName == 'Broken Co':
+                raise RuntimeError('provider down')
+            return SimpleNamespace(lead_score=float(len(lead_info.companyName)))
+        finally:
+            self.in_flight -= 1
+
+    def create(self, *names):
+        return [Lead.objects.create(company_name=name, email=f'{n}@bulk.example.com') for n, name in enumerate(names)]
+
+    @override_settings(LEAD_SCORING_CONCURRENCY=3)
+    def test_llm_calls_in_flight_stay_within_the_limit(self):
+        leads = self.create(*(f'Company {"x" * n}' for n in range(10)))
+        results, errors = score_leads_in_bulk(leads)
+        self.assertEqual((len(results), errors), (10, []))
+        self.assertEqual(self.peak, 3)
+
+    def test_a_failed_lead_does_not_abort_the_batch(self):
+        ok, broken = self.create('Fine Co', 'Broken Co')
+        results, errors = score_leads_in_bulk([ok, broken])
+        self.assertEqual(results, [{'id': ok.pk, 'score': 7.0, 'cached': False}])
+        self.assertEqual(errors, [{'id': broken.pk, 'error': 'provider down'}])
+        self.assertEqual(Lead.objects.get(pk=ok.pk).score, 7.0)
+        self.assertEqual(Lead.objects.get(pk=broken.pk).score, 0.0)
+
+    def test_scores_are_written_with_one_update(self):
+        leads = self.create('Alpha', 'Beta Co', 'Gamma Inc', 'Delta')
+        with CaptureQueriesContext(connection) as queries:
+            score_leads_in_bulk(leads)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "leads_lead"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(dict(Lead.objects.values_list('company_name', 'score')),
+                         {'Alpha': 5.0, 'Beta Co': 7.0, 'Gamma Inc': 9.0, 'Delta': 5.0})
+
+    def test_missing_ids_are_reported(self):
+        lead, = self.create('Found Co')
+        client = APIClient()
+        client.force_authenticate(Employee.objects.create_user(username='batcher', password='x'))
+        response = client.post('/api/leads/score/batch/', {'ids': [lead.pk, 987654]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'results': [{'id': lead.pk, 'score': 8.0, 'cached': False}], 'errors': [], 'missing': [987654],
+        })
+
+
+class ScoreLeadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Employee.objects.create_user(username='scorer', password='x'))
+        self.lead = Lead.objects.create(company_name='Cached Co', email='cached@example.com', industry='Software')
+        info = lead_info_for(self.lead)
+        self.key = score_cache.cache_key(info, examples_for(info))
+
+    def test_cached_score_is_saved(self):
+        score_cache.store({self.key: 64.0})
+        response = self.client.post(f'/api/leads/{self.lead.pk}/score/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'score': 64.0, 'cached': True})
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.score, 64.0)
+
+    def test_wait_scores_inline_and_caches(self):
+        llm = mock.AsyncMock(return_value=SimpleNamespace(lead_score=72.0))
+        with mock.patch.object(async_b, 'ScoreTheLead', llm):
+            response = self.client.post(f'/api/leads/{self.lead.pk}/score/?wait=1')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'score': 72.0, 'cached': False})
+            self.lead.refresh_from_db()
+            self.assertEqual(self.lead.score, 72.0)
+
+            response = self.client.post(f'/api/leads/{self.lead.pk}/score/?wait=1')
+            self.assertEqual(response.json(), {'score': 72.0, 'cached': True})
+        llm.assert_awaited_once()
+
+    def test_wait_hides_provider_errors(self):
+        llm = mock.AsyncMock(side_effect=RuntimeError('upstream said: key sk-secret is invalid'))
+        with mock.patch.object(async_b, 'ScoreTheLead', llm), self.assertLogs('leads.views', 'ERROR'):
+            response = self.client.post(f'/api/leads/{self.lead.pk}/score/?wait=1')
+        self.assertEqual(response.status_code, 502)
+        self.assertNotIn('sk-secret', response.content.decode())
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.score, 0.0)
+
+
+class ScoreLeadResponseTests(TestCase):
+    """?wait=1 runs on AsyncAPIView; its errors must look like every other DRF endpoint's."""
+
+    def setUp(self):
+        self.user = Employee.objects.create_user(username='shapes', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertSameError(self, first, second):
+        self.assertEqual((first.status_code, first.json()), (second.status_code, second.json()))
+
+    def test_unauthenticated(self):
+        anonymous = APIClient()
+        response = anonymous.post('/api/leads/1/score/?wait=1')
+        self.assertEqual(response.status_code, 401)
+        self.assertSameError(response, anonymous.post('/api/leads/'))
+        self.assertEqual(response['WWW-Authenticate'], anonymous.get('/api/leads/')['WWW-Authenticate'])
+
+    def test_missing_lead(self):
+        response = self.client.post('/api/leads/12345/score/?wait=1')
+        self.assertEqual(response.status_code, 404)
+        self.assertSameError(response, self.client.post('/api/leads/12345/score/'))
+
+    def test_malformed_body(self):
+        response = self.client.post('/api/leads/1/score/?wait=1', '{"force": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertSameError(response, self.client.post('/api/leads/', '{"force": ', content_type='application/json'))
+
+    def test_method_not_allowed(self):
+        response = self.client.get('/api/leads/1/score/?wait=1')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.json(), {'detail': 'Method "GET" not allowed.'})
+
+    def test_browsable_api(self):
+        lead = Lead.objects.create(company_name='Browsed Co', email='browsed@example.com')
+        llm = mock.AsyncMock(return_value=SimpleNamespace(lead_score=50.0))
+        with mock.patch.object(async_b, 'ScoreTheLead', llm):
+            response = self.client.post(f'/api/leads/{lead.pk}/score/?wait=1', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+
+@override_settings(LEAD_SCORE_CACHE_MAX_ENTRIES=1, LEAD_SCORE_CACHE_PRUNE_EVERY=3)
+class ScoreCachePruneTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_prunes_every_n_stored_entries(self):
+        with self.assertNumQueries(1):
+            score_cache.store({'a': 1.0})
+        score_cache.store({'b': 2.0})
+        self.assertEqual(LeadScoreCache.objects.count(), 2)
+        score_cache.store({'c': 3.0})
+        self.assertEqual(list(LeadScoreCache.objects.values_list('key', flat=True)), ['c'])
+        # A batch that crosses the next multiple prunes too.
+        score_cache.store({'d': 4.0, 'e': 5.0, 'f': 6.0, 'g': 7.0})
+        self.assertEqual(LeadScoreCache.objects.count(), 1)
+
+    def test_lookups_count_hits_and_misses_in_process(self):
+        score_cache.store({'a': 1.0})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(score_cache.lookup(['a', 'b', 'c']), {'a': 1.0})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual((score_cache.stats()['hits'], score_cache.stats()['misses']), (1, 2))
+        self.assertIn('crm_lead_score_cache_misses_total 2', registry.exposition())
+
+
+class ScoringWorkerTests(TransactionTestCase):
+    @override_settings(SCORING_JOB_TIMEOUT=0, SCORING_JOB_MAX_ATTEMPTS=1)
+    def test_worker_requeues_stale_jobs_while_running(self):
+        lead = Lead.objects.create(email='stale@example.com')
+        job = ScoringJob.objects.create(lead=lead, status='running', attempts=1, worker='dead-worker',
+                                        started_at=timezone.now() - timedelta(seconds=5))
+        work('live-worker', threading.Event(), once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'Worker timed out')
+
+
+class ExampleIndexSyncTests(TestCase):
+    def setUp(self):
+        self.kept, self.dropped = (
+            ReferenceLead.objects.create(company_name=name, expected_score=50, tier='decent') for name in 'AB'
+        )
+        # Another process, fully synced before the changes below.
+        self.other = ExampleIndex()
+        self.other.rebuild()
+
+    def live(self):
+        return set(ReferenceLead.objects.values_list('pk', flat=True))
+
+    def test_sync_reads_updates_and_tombstones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dropped.delete()
+            self.kept.tier = 'amazing'
+            self.kept.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.other.sync()
+        # Changed rows and tombstones since the last sync; live pks are not listed.
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(set(self.other._rows.tier_of), self.live())
+        self.assertEqual(self.other._rows.tier_of[self.kept.pk], 'amazing')
+
+    def test_sync_after_tombstone_retention_rebuilds(self):
+        self.dropped.delete()
+        ReferenceLeadDeletion.objects.all().delete()
+        self.other._synced_at -= TOMBSTONE_RETENTION
+        self.other.sync()
+        self.assertEqual(set(self.other._rows.tier_of), self.live())
+
+    def test_old_tombstones_are_pruned(self):
+        ReferenceLeadDeletion.objects.create(reference_id=10 ** 6, deleted_at=timezone.now() - 2 * TOMBSTONE_RETENTION)
+        pk = self.dropped.pk
+        self.dropped.delete()
+        self.assertEqual(list(ReferenceLeadDeletion.objects.values_list('reference_id', flat=True)), [pk])
+
+    def test_rebuild_swaps_in_a_complete_index(self):
+        before = dict(self.other._rows.tier_of)
+        seen = []
+        load = ReferenceLead.objects.iterator
+
+        def watched(*args, **kwargs):
+            for reference in load(*args, **kwargs):
+                # What a concurrent select() would read mid-load.
+                seen.append(dict(self.other._rows.tier_of))
+                yield reference
+
+        with mock.patch.object(ReferenceLead.objects, 'iterator', watched):
+            self.other.rebuild()
+        self.assertTrue(seen)
+        self.assertTrue(all(rows == before for rows in seen))
+
+    def test_same_industry_and_country_rank_first(self):
+        index = _TierIndex()
+        lead = LeadInfo(companyName='Query', industry='Software', employeeCount=800, budgetEstimate=250000.0,
+                        country='Germany', description='')
+        similar = LeadInfo(companyName='Similar', industry=' software', employeeCount=10, budgetEstimate=1000.0,
+                           country='GERMANY', description='')
+        # Same size and budget as the lead, nothing else in common.
+        sized = LeadInfo(companyName='Sized', industry='Retail', employeeCount=800, budgetEstimate=250000.0,
+                         country='Brazil', description='')
+        index.upsert(1, lead_info_features(sized))
+        index.upsert(2, lead_info_features(similar))
+        self.assertEqual(index.nearest(lead_info_features(lead), 2), [2, 1])
+        self.assertEqual(index.nearest(lead_info_features(lead), 1), [2])
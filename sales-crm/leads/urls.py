@@ -3,9 +3,18 @@ from . import views
 
 urlpatterns = [
     path('leads/', views.manage_leads, name='manage_leads'),
-    path('leads/<int:pk>/score/', views.score_lead, name='score-lead'),
+    path('leads/<int:pk>/', views.LeadDetailView.as_view(), name='lead-detail'),
+    path('leads/summary/', views.lead_pipeline_summary, name='lead-pipeline-summary'),
+    path('leads/export/', views.export_leads, name='export-leads'),
+    path('leads/import/', views.import_leads_file, name='import-leads'),
+    path('leads/<int:pk>/score/', views.ScoreLeadView.as_view(), name='score-lead'),
+    path('leads/score/batch/', views.score_leads_batch, name='score-leads-batch'),
+    path('leads/score/cache/', views.score_cache_stats, name='score-cache-stats'),
+    path('leads/score/jobs/<int:pk>/', views.scoring_job_status, name='scoring-job-status'),
     path('leads/convert/', views.convert_lead_to_customer, name='convert_lead_to_customer'),
+    path('leads/convert/bulk/', views.convert_leads_in_bulk, name='convert-leads-in-bulk'),
     path('customers/', views.manage_customers, name='manage_customers'),
+    path('customers/export/', views.export_customers, name='export-customers'),
     # Update this line to use the class-based view
     path('leads/<int:pk>/assign/', views.AssignLeadView.as_view(), name='assign-lead'),
 ]
@@ -1,12 +1,25 @@
+import logging
+
+from asgiref.sync import sync_to_async
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import Lead, Customer
-from .serializers import LeadSerializer, CustomerSerializer, LeadToCustomerSerializer
-from .baml_client.sync_client import b
-from .baml_client.types import LeadInfo, LeadExamples
+from .models import Lead, Customer, ScoringJob
+from .serializers import LeadSerializer, CustomerSerializer, LeadToCustomerSerializer, LeadSelectionSerializer, ScoringJobSerializer, BulkLeadToCustomerSerializer
+from .pagination import LeadPagination, CustomerPagination
+from .filters import LEAD_FILTER_FIELDS, CUSTOMER_FILTER_FIELDS, filter_by_query_params
+from .exports import chunked_values, export_rows
+from . import importer, score_cache
+from .scoring import SCORING_FIELDS, ascore_lead_now, save_cached_score, score_leads_in_bulk
+from .jobs import enqueue_scoring_job
+from .pipeline import PIPELINE_FIELDS, pipeline_summary
+from search.filters import search_by_query_params
+from crm_project.async_api import AsyncAPIView
 import os
+from django.conf import settings
+from django.urls import reverse
 from dotenv import load_dotenv
 from pathlib import Path
 from .baml_client import reset_baml_env_vars
@@ -15,6 +28,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from employee.models import Employee
 
+logger = logging.getLogger(__name__)
+
 # Compute project root and load .env from the root directory
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(dotenv_path=BASE_DIR / ".env")
@@ -32,9 +47,12 @@ def manage_customers(request):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    customers = Customer.objects.all()
+    paginator = CustomerPagination()
+    queryset = filter_by_query_params(Customer.objects.all(), request.query_params, CUSTOMER_FILTER_FIELDS)
+    queryset = search_by_query_params(queryset, request.query_params, 'customer')
+    customers = paginator.paginate_queryset(queryset, request)
     serializer = CustomerSerializer(customers, many=True)
-    return Response(serializer.data)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET', 'POST'])
 def manage_leads(request):
@@ -45,9 +63,27 @@ def manage_leads(request):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
-    leads = Lead.objects.all()
+    paginator = LeadPagination()
+    queryset = filter_by_query_params(Lead.objects.select_related('assigned_to'), request.query_params, LEAD_FILTER_FIELDS)
+    queryset = search_by_query_params(queryset, request.query_params, 'lead')
+    leads = paginator.paginate_queryset(queryset, request)
     serializer = LeadSerializer(leads, many=True)
-    return Response(serializer.data)
+    return paginator.get_paginated_response(serializer.data)
+
+LEAD_EXPORT_FIELDS = ('id', 'company_name', 'email', 'phone', 'source', 'status', 'created_at', 'score',
+                      'industry', 'employee_count', 'budget_estimate', 'country', 'description', 'assigned_to')
+CUSTOMER_EXPORT_FIELDS = ('id', 'company_name', 'email', 'phone', 'address', 'industry', 'country',
+                          'contact_person', 'joined_at', 'converted_from_lead')
+
+@api_view(['GET'])
+def export_leads(request):
+    queryset = filter_by_query_params(Lead.objects.order_by('pk'), request.query_params, LEAD_FILTER_FIELDS)
+    return export_rows(request, 'leads', LEAD_EXPORT_FIELDS, chunked_values(queryset, *LEAD_EXPORT_FIELDS))
+
+@api_view(['GET'])
+def export_customers(request):
+    queryset = filter_by_query_params(Customer.objects.order_by('pk'), request.query_params, CUSTOMER_FILTER_FIELDS)
+    return export_rows(request, 'customers', CUSTOMER_EXPORT_FIELDS, chunked_values(queryset, *CUSTOMER_EXPORT_FIELDS))
 
 @api_view(['POST'])
 def convert_lead_to_customer(request):
@@ -58,80 +94,136 @@ def convert_lead_to_customer(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _is_forced(request):
+    return _flag(request.query_params.get('force', request.data.get('force', False)))
+
+def _flag(value):
+    return value in (True, 'true', 'True', '1')
+
 @api_view(['POST'])
-def score_lead(request, pk):
-    try:
-        lead = Lead.objects.get(pk=pk)
-        
-        # Create LeadInfo object - remove companyNeeds which isn't in the model
-        lead_info = LeadInfo(
-            companyName=lead.company_name or "",  # Add default values for null fields
-            industry=lead.industry or "",
-            employeeCount=lead.employee_count or 0,
-            budgetEstimate=float(lead.budget_estimate or 0),  # Convert to float explicitly
-            country=lead.country or "",
-            description=lead.description or ""
+def convert_leads_in_bulk(request):
+    serializer = BulkLeadToCustomerSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    outcomes = serializer.save()
+    converted = sum(1 for outcome in outcomes.values() if outcome['status'] == 'converted')
+    return Response({'converted': converted, 'outcomes': outcomes}, status=status.HTTP_200_OK)
+
+# Async so that ?wait=1 awaits the LLM without holding a worker thread under
+# ASGI; queueing a job stays synchronous (see crm_project/async_api.py).
+class ScoreLeadView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request, pk):
+        if _flag(request.query_params.get('wait', request.data.get('wait', False))):
+            return await self.score_now(request, pk)
+        return await sync_to_async(self.enqueue)(request, pk)
+
+    async def score_now(self, request, pk):
+        lead = await Lead.objects.filter(pk=pk).afirst()
+        if lead is None:
+            return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            score, cached = await ascore_lead_now(lead, force=_is_forced(request))
+        except Exception:
+            logger.exception("Scoring lead %s failed", lead.pk)
+            return Response({'error': 'Lead scoring is unavailable, try again later'},
+                            status=status.HTTP_502_BAD_GATEWAY)
+        return Response({'score': score, 'cached': cached}, status=status.HTTP_200_OK)
+
+    def enqueue(self, request, pk):
+        try:
+            lead = Lead.objects.get(pk=pk)
+        except Lead.DoesNotExist:
+            return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        force = _is_forced(request)
+        if not force:
+            cached = save_cached_score(lead)
+            if cached is not None:
+                return Response({'score': cached, 'cached': True}, status=status.HTTP_200_OK)
+
+        # The LLM call runs in `manage.py run_scoring_worker`, not in this request.
+        job, _ = enqueue_scoring_job(lead, force=force)
+        return Response(
+            ScoringJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('scoring-job-status', args=[job.pk])}
         )
-        
-        # Create example leads (you might want to store these somewhere else)
-        lead_examples = LeadExamples(
-            amazingLeads=[
-                LeadInfo(
-                    companyName="Tech Innovators",
-                    industry="Technology",
-                    employeeCount=500,
-                    budgetEstimate=1000000.0,
-                    country="USA",
-                    description="A leading tech company focusing on innovative solutions.",
-                    expectedScore=95.0
-                )
-            ],
-            
-            decentLeads=[
-                LeadInfo(
-                    companyName="Local Grocers",
-                    industry="Retail",
-                    employeeCount=50,
-                    budgetEstimate=10000.0,
-                    country="Canada",
-                    description="A chain of local grocery stores.",
-                    expectedScore=70.0
-                )
-            ],
-            terribleLeads=[
-                LeadInfo(
-                    companyName="Struggling Startups",
-                    industry="Various",
-                    employeeCount=5,
-                    budgetEstimate=1000.0,
-                    country="Brazil",
-                    description="A group of startups struggling to get off the ground.",
-                    expectedScore=30.0
-                )
-            ]
+
+@api_view(['GET'])
+def scoring_job_status(request, pk):
+    try:
+        job = ScoringJob.objects.get(pk=pk)
+    except ScoringJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ScoringJobSerializer(job).data)
+
+@api_view(['POST'])
+def score_leads_batch(request):
+    selection = LeadSelectionSerializer(data=request.data)
+    selection.is_valid(raise_exception=True)
+
+    limit = settings.LEAD_BATCH_MAX_SIZE
+    queryset = selection.select(Lead.objects.only('id', *SCORING_FIELDS, *PIPELINE_FIELDS)).order_by('pk')
+    leads = list(queryset[:limit + 1])
+    if len(leads) > limit:
+        return Response(
+            {'error': f'Batch selects more than {limit} leads, narrow the filter'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        
-        # Score the lead using BAML client
-        result = b.ScoreTheLead(lead_info, lead_examples)
-        
-        # Update lead score
-        lead.score = result.lead_score
-        lead.save()
-        
-        return Response({'score': result.lead_score}, status=status.HTTP_200_OK)
-        
-    except Lead.DoesNotExist:
-        return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    results, errors = score_leads_in_bulk(leads, force=_is_forced(request))
+    return Response({
+        'results': results,
+        'errors': errors,
+        'missing': selection.missing_ids(lead.pk for lead in leads),
+    }, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+def import_leads_file(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the leads as a "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = request.data.get('format') or importer.guess_format(upload.name)
+    if fmt not in importer.FORMATS:
+        return Response({'error': f'Unsupported format "{fmt}"'}, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = settings.LEAD_IMPORT_MAX_REPORTED_ERRORS
+    rejected_rows = []
+
+    def on_reject(row, email, errors):
+        if len(rejected_rows) < limit:
+            rejected_rows.append({'row': row, 'email': email, 'errors': errors})
+
+    created, rejected = importer.import_leads(importer.iter_rows(upload, fmt), on_reject=on_reject)
+    return Response({
+        'created': created,
+        'rejected': rejected,
+        'rejected_rows': rejected_rows,
+        'rejected_rows_truncated': rejected > len(rejected_rows),
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def lead_pipeline_summary(request):
+    return Response(pipeline_summary())
+
+@api_view(['GET'])
+def score_cache_stats(request):
+    return Response(score_cache.stats())
 
 class LeadListCreateView(generics.ListCreateAPIView):
-    queryset = Lead.objects.all()
+    queryset = Lead.objects.select_related('assigned_to')
     serializer_class = LeadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LeadPagination
+
+    def get_queryset(self):
+        queryset = filter_by_query_params(super().get_queryset(), self.request.query_params, LEAD_FILTER_FIELDS)
+        return search_by_query_params(queryset, self.request.query_params, 'lead')
 
 class LeadDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Lead.objects.all()
+    queryset = Lead.objects.select_related('assigned_to')
     serializer_class = LeadSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -0,0 +1,276 @@
+"""
+Full-text search backends.
+
+``SQLiteFTSBackend`` keeps one FTS5 virtual table per ``SearchIndex`` whose
+rowid is the model's primary key, so a search is an index lookup that
+composes with the rest of the ORM query as ``pk IN (SELECT rowid ...)``.
+A ``CombinedIndex`` puts several models in one table so that ``search``
+can rank leads, customers and invoices against each other.
+``LikeBackend`` is the portable fallback: the same interface over
+``icontains`` filters, with no index to maintain. ``SEARCH_BACKEND`` picks
+one explicitly; by default SQLite gets FTS5 and other databases LIKE.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import and_, or_
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .indexes import indexes_for
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def search_terms(query):
+    return _TERM_RE.findall((query or '').lower())
+
+
+class BaseSearchBackend:
+    def __init__(self, using='default'):
+        self.using = using
+
+    def setup(self, index):
+        """Create whatever storage ``index`` needs."""
+
+    def drop(self, index):
+        pass
+
+    def index(self, index, objs):
+        """Add or replace the entries for ``objs``."""
+
+    def remove(self, index, rowids):
+        pass
+
+    def rebuild(self, index, get_model=apps.get_model):
+        """Replace the whole index; ``get_model`` lets migrations pass historical models."""
+
+    def search(self, index, query, offset, limit):
+        """
+        ``(rowid, score, *columns)`` rows for a page of matches of
+        ``query``, best first; ``score`` is None when the results are not
+        ranked.
+        """
+        raise NotImplementedError
+
+    def filter(self, queryset, index, query, ranked=False):
+        """Narrow ``queryset`` to rows matching every term of ``query`` (as a prefix)."""
+        raise NotImplementedError
+
+    def ranked_ids(self, index, query, limit):
+        """Primary keys of the best ``limit`` matches, best first."""
+        raise NotImplementedError
+
+
+class LikeBackend(BaseSearchBackend):
+    def filter(self, queryset, index, query, ranked=False):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        # Every term must appear in at least one field.
+        return queryset.filter(reduce(and_, (
+            reduce(or_, (Q(**{f"{field}__icontains": term}) for field in index.fields)) for term in terms
+        )))
+
+    def ranked_ids(self, index, query, limit):
+        return list(self.filter(index.model.objects.order_by('-pk'), index, query).values_list('pk', flat=True)[:limit])
+
+    def search(self, index, query, offset, limit):
+        # No relevance to rank by: newest first, per source, then merged.
+        terms = search_terms(query)
+        if not terms:
+            return []
+        rows = []
+        for source in index.sources:
+            fields = [field for field in (source.title, source.detail) if field]
+            queryset = apps.get_model(source.model_label)._default_manager.using(self.using).filter(reduce(and_, (
+                reduce(or_, (Q(**{f"{field}__icontains": term}) for field in fields)) for term in terms
+            )))
+            for pk, *values in queryset.order_by('-pk').values_list('pk', *fields)[:offset + limit]:
+                values = ['' if value is None else value for value in values]
+                rows.append((index.rowid(source.model_label, pk), None, *values, *[''] * (2 - len(values))))
+        rows.sort(key=lambda row: row[0], reverse=True)
+        return rows[offset:offset + limit]
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    BATCH_SIZE = 500
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def _table(self, index):
+        return self.connection.ops.quote_name(index.table)
+
+    def setup(self, index):
+        columns = ', '.join(index.fields)
+        table = self._table(index)
+        with self.connection.cursor() as cursor:
+            # prefix='2 3': extra prefix indexes make short "abc*" queries cheap.
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            if index.weights:
+                # Stored in the table, so "ORDER BY rank" uses these weights.
+                weights = ', '.join(str(float(weight)) for weight in index.weights)
+                cursor.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('rank', %s)", [f"bm25({weights})"])
+
+    def drop(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self._table(index)}")
+
+    def index(self, index, objs):
+        self._write(index, index.entries(objs))
+
+    def _write(self, index, rows):
+        if not rows:
+            return
+        placeholders = ', '.join(['%s'] * (len(index.fields) + 1))
+        sql = (f"INSERT OR REPLACE INTO {self._table(index)} (rowid, {', '.join(index.fields)}) "
+               f"VALUES ({placeholders})")
+        with self.connection.cursor() as cursor:
+            cursor.executemany(sql, [tuple('' if value is None else value for value in row) for row in rows])
+
+    def remove(self, index, rowids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self._table(index)} WHERE rowid = %s", [(rowid,) for rowid in rowids])
+
+    def rebuild(self, index, get_model=apps.get_model):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self._table(index)}")
+        batch = []
+        for row in index.rows(get_model, self.using):
+            batch.append(row)
+            if len(batch) >= 2000:
+                self._write(index, batch)
+                batch = []
+        self._write(index, batch)
+
+    def match_expression(self, query):
+        # Quote every term (so FTS5 operators in user input are literal)
+        # and match it as a prefix; terms are ANDed.
+        return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+    def filter(self, queryset, index, query, ranked=False):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        table = self._table(index)
+        queryset = queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [expression]))
+        if ranked:
+            # bm25 rank of this row; lower is better.
+            model_table = self.connection.ops.quote_name(queryset.model._meta.db_table)
+            pk_column = self.connection.ops.quote_name(queryset.model._meta.pk.column)
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"SELECT rank FROM {table} WHERE {table} MATCH %s AND rowid = {model_table}.{pk_column}",
+                [expression],
+            )).order_by('search_rank', '-pk')
+        return queryset
+
+    def ranked_ids(self, index, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        table = self._table(index)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY rank LIMIT %s",
+                           [expression, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, index, query, offset, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        table = self._table(index)
+        columns = ', '.join(index.fields)
+        candidates = settings.SEARCH_RANK_CANDIDATES
+        # Type-ahead: earlier terms are whole words, the last may be half typed.
+        phrases = [f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*']
+
+        # bm25 reads the whole posting list of every term to weigh it, so a
+        # term found in most rows ("inv" in every invoice number) costs tens
+        # of milliseconds however few rows match overall. Such terms carry
+        # almost no weight anyway: rank by the selective terms and check the
+        # common ones against the (at most SEARCH_RANK_CANDIDATES) results.
+        with self.connection.cursor() as cursor:
+            common = set()
+            for phrase in phrases:
+                cursor.execute(f"SELECT count(*) FROM (SELECT 1 FROM {table} WHERE {table} MATCH %s LIMIT %s)",
+                               [phrase, candidates + 1])
+                if cursor.fetchone()[0] > candidates:
+                    common.add(phrase)
+            selective = ' '.join(phrase for phrase in phrases if phrase not in common)
+
+            if not selective:
+                # Nothing to rank by: newest first, which an FTS scan in
+                # rowid order returns without reading past the page.
+                cursor.execute(f"SELECT rowid, NULL, {columns} FROM {table} WHERE {table} MATCH %s "
+                               f"ORDER BY rowid DESC LIMIT %s OFFSET %s", [' '.join(phrases), limit, offset])
+                return cursor.fetchall()
+            if not common:
+                cursor.execute(f"SELECT rowid, -rank, {columns} FROM {table} WHERE {table} MATCH %s "
+                               f"ORDER BY rank LIMIT %s OFFSET %s", [selective, limit, offset])
+                return cursor.fetchall()
+            cursor.execute(f"SELECT rowid, -rank, {columns} FROM {table} WHERE {table} MATCH %s ORDER BY rank",
+                           [selective])
+            rows = cursor.fetchall()
+
+        required = [
+            (token, n == len(terms) - 1)
+            for n, term in enumerate(terms) if phrases[n] in common for token in _tokens(term)
+        ]
+        return [row for row in rows if _has_tokens(row[2:], required)][offset:offset + limit]
+
+
+def _tokens(text):
+    # Near enough to what FTS5's unicode61 tokenizer with remove_diacritics makes of ``text``.
+    text = unicodedata.normalize('NFKD', text or '')
+    return _TOKEN_RE.findall(''.join(char for char in text if not unicodedata.combining(char)).lower())
+
+
+def _has_tokens(values, required):
+    tokens = {token for value in values for token in _tokens(value)}
+    return all(
+        any(token.startswith(term) for token in tokens) if prefix else term in tokens
+        for term, prefix in required
+    )
+
+
+_backends = {}
+
+
+def get_backend(using='default'):
+    backend = _backends.get(using)
+    if backend is None:
+        path = settings.SEARCH_BACKEND
+        if not path:
+            vendor = connections[using].vendor
+            path = 'search.backends.SQLiteFTSBackend' if vendor == 'sqlite' else 'search.backends.LikeBackend'
+        backend = _backends[using] = import_string(path)(using)
+    return backend
+
+
+def index_objects(objs, using='default'):
+    """
+    Add or replace ``objs`` (all of one model) in every index that covers
+    them. For bulk writers: ``bulk_create`` sends no signals.
+    """
+    if not objs:
+        return
+    backend = get_backend(using)
+    for index in indexes_for(objs[0]._meta.label):
+        backend.index(index, objs)
+
+
+def remove_objects(model_label, pks, using='default'):
+    backend = get_backend(using)
+    for index in indexes_for(model_label):
+        backend.remove(index, index.rowids(model_label, pks))
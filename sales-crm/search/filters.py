@@ -0,0 +1,25 @@
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .backends import get_backend
+from .indexes import INDEXES
+
+SEARCH_PARAM = 'q'
+
+
+def search_by_query_params(queryset, query_params, index_name, ranked=False):
+    """Apply the full-text ``?q=`` filter when present."""
+    query = query_params.get(SEARCH_PARAM, '').strip()
+    if not query:
+        return queryset
+    return get_backend(queryset.db).filter(queryset, INDEXES[index_name], query, ranked=ranked)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    ``?q=`` full-text filter for generic views that set ``search_index``.
+    Results come best match first unless ``?ordering=`` is given.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ranked = OrderingFilter.ordering_param not in request.query_params
+        return search_by_query_params(queryset, request.query_params, view.search_index, ranked=ranked)
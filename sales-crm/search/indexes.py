@@ -0,0 +1,120 @@
+from django.apps import apps
+
+
+class SearchIndex:
+    """The text columns of one model that full-text search covers."""
+    weights = None  # per-column bm25 weights; None weighs columns equally
+
+    def __init__(self, name, model_label, fields):
+        self.name = name
+        self.model_label = model_label
+        self.fields = fields
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def table(self):
+        return f"search_{self.name}"
+
+    @property
+    def model_labels(self):
+        return (self.model_label,)
+
+    def document(self, obj):
+        return tuple(getattr(obj, field) or '' for field in self.fields)
+
+    def entries(self, objs):
+        """``(rowid, *columns)`` rows for ``objs``; the rowid is the primary key."""
+        return [(obj.pk, *self.document(obj)) for obj in objs]
+
+    def rowids(self, model_label, pks):
+        return list(pks)
+
+    def rows(self, get_model=apps.get_model, using='default'):
+        """Every entry of the index, for a full rebuild."""
+        manager = get_model(self.model_label)._default_manager.using(using)
+        return manager.order_by().values_list('pk', *self.fields).iterator(chunk_size=2000)
+
+
+class SearchSource:
+    """One model's share of a ``CombinedIndex``: which field is the title, which the detail line."""
+
+    def __init__(self, kind, model_label, title, detail=None):
+        self.kind = kind
+        self.model_label = model_label
+        self.title = title
+        self.detail = detail
+
+    def document(self, obj):
+        return (getattr(obj, self.title) or '', getattr(obj, self.detail) or '' if self.detail else '')
+
+
+class CombinedIndex(SearchIndex):
+    """
+    Several models in one FTS table, so one query ranks them against each
+    other. Rowids interleave the sources: ``pk * SLOTS + position``.
+    """
+    SLOTS = 4  # room for another source without renumbering
+    weights = (4.0, 1.0)  # a title match outranks a detail match
+
+    def __init__(self, name, sources):
+        assert len(sources) <= self.SLOTS
+        super().__init__(name, None, ('title', 'detail'))
+        self.sources = sources
+        self._positions = {source.model_label: position for position, source in enumerate(sources)}
+
+    @property
+    def model(self):
+        raise AttributeError("A combined index has no single model")
+
+    @property
+    def model_labels(self):
+        return tuple(self._positions)
+
+    def entries(self, objs):
+        return [
+            (self.rowid(obj._meta.label, obj.pk), *self.sources[self._positions[obj._meta.label]].document(obj))
+            for obj in objs
+        ]
+
+    def rowid(self, model_label, pk):
+        return pk * self.SLOTS + self._positions[model_label]
+
+    def rowids(self, model_label, pks):
+        return [self.rowid(model_label, pk) for pk in pks]
+
+    def locate(self, rowid):
+        """``(source, pk)`` for a rowid of this index."""
+        pk, position = divmod(rowid, self.SLOTS)
+        return self.sources[position], pk
+
+    def rows(self, get_model=apps.get_model, using='default'):
+        for position, source in enumerate(self.sources):
+            fields = ('pk', source.title, source.detail) if source.detail else ('pk', source.title)
+            manager = get_model(source.model_label)._default_manager.using(using)
+            for pk, *values in manager.order_by().values_list(*fields).iterator(chunk_size=2000):
+                yield (pk * self.SLOTS + position, *values, *[''] * (2 - len(values)))
+
+
+INDEXES = {
+    index.name: index
+    for index in (
+        SearchIndex('employee', 'employee.Employee', ('username', 'first_name', 'last_name', 'email')),
+        SearchIndex('lead', 'leads.Lead', ('company_name', 'email', 'phone', 'industry', 'country', 'source',
+                                           'description')),
+        SearchIndex('customer', 'leads.Customer', ('company_name', 'contact_person', 'email', 'phone',
+                                                   'industry', 'country')),
+        # Backs the cross-entity /api/search/ endpoint.
+        CombinedIndex('all', (
+            SearchSource('lead', 'leads.Lead', 'company_name', 'email'),
+            SearchSource('customer', 'leads.Customer', 'company_name', 'contact_person'),
+            SearchSource('invoice', 'invoices.Invoice', 'invoice_number'),
+        )),
+    )
+}
+
+
+def indexes_for(model_label):
+    return [index for index in INDEXES.values() if model_label in index.model_labels]
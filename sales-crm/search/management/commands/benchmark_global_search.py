@@ -0,0 +1,100 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from employee.models import Employee
+from invoices.models import Invoice
+from leads.models import Customer, Lead
+from search.backends import get_backend, index_objects
+from search.views import search_all
+
+from .benchmark_search import COUNTRIES, WORDS
+
+FIRST_NAMES = ("Ana", "Bram", "Chen", "Dara", "Emeka", "Farah", "Goran", "Hana", "Ines", "Jonas", "Kaito", "Lena")
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed leads, customers and invoices in a transaction that is rolled back afterwards "
+        "and report /api/search/ latency percentiles over a mix of queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help="Indexed rows in total, split 40/30/30.")
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        rng = random.Random(7)
+        self.stdout.write(f"backend: {type(get_backend()).__name__}, {rows} indexed rows")
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.seed(rng, rows * 4 // 10, rows * 3 // 10, rows - rows * 7 // 10)
+            self.stdout.write(f"seeded in {time.perf_counter() - started:.0f}s")
+            user = Employee.objects.create_user(username='search-benchmark', password=None)
+            timings = {}
+            for kind, query in self.queries(rng, rows, options['requests']):
+                request = APIRequestFactory().get('/api/search/', {'q': query, 'page_size': options['page_size']},
+                                                  HTTP_HOST='localhost')
+                force_authenticate(request, user)
+                started = time.perf_counter()
+                response = search_all(request)
+                timings.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.data
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'queries':<18} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        everything = [value for values in timings.values() for value in values]
+        for kind, values in [*timings.items(), ('all', everything)]:
+            self.stdout.write(f"{kind:<18} {len(values):>5} {statistics.median(values):>8.2f} "
+                              f"{_percentile(values, 0.95):>8.2f} {max(values):>8.2f}")
+
+    def seed(self, rng, leads, customers, invoices):
+        for start in range(0, leads, 10000):
+            index_objects(Lead.objects.bulk_create([
+                Lead(company_name=f"{rng.choice(WORDS).title()} {rng.choice(COUNTRIES)} {n}",
+                     email=f"lead-{n}@{rng.choice(WORDS)}.example.com")
+                for n in range(start, min(start + 10000, leads))
+            ]))
+        customer = None
+        for start in range(0, customers, 10000):
+            batch = Customer.objects.bulk_create([
+                Customer(company_name=f"{rng.choice(WORDS).title()} Holdings {n}", email=f"customer-{n}@example.com",
+                         contact_person=f"{rng.choice(FIRST_NAMES)} {rng.choice(WORDS).title()}son")
+                for n in range(start, min(start + 10000, customers))
+            ])
+            index_objects(batch)
+            customer = customer or batch[0]
+        today = date.today()
+        for start in range(0, invoices, 10000):
+            index_objects(Invoice.objects.bulk_create([
+                Invoice(customer=customer, invoice_number=f"BENCH-{n:07d}", due_date=today, total_amount=0)
+                for n in range(start, min(start + 10000, invoices))
+            ]))
+
+    def queries(self, rng, rows, count):
+        kinds = {
+            'word': lambda: rng.choice(WORDS),
+            'short prefix': lambda: rng.choice(WORDS)[:2],
+            'prefix': lambda: rng.choice(WORDS)[:4],
+            'two words': lambda: f"{rng.choice(WORDS)} {rng.choice(COUNTRIES)}",
+            'name': lambda: f"{rng.choice(FIRST_NAMES)} {rng.choice(WORDS)[:3]}",
+            'email': lambda: f"lead-{rng.randrange(rows * 4 // 10)}",
+            'invoice number': lambda: f"BENCH-{rng.randrange(rows * 3 // 10):07d}",
+            'no match': lambda: f"zz{rng.randrange(10 ** 6)}",
+        }
+        names = list(kinds)
+        for n in range(count):
+            kind = names[n % len(names)]
+            yield kind, kinds[kind]()
@@ -0,0 +1,68 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from leads.models import Lead
+from search.backends import LikeBackend, get_backend
+from search.indexes import INDEXES
+
+WORDS = ("cloud", "logistics", "fintech", "retail", "health", "solar", "robotics", "analytics", "marine",
+         "textile", "payments", "security", "education", "farming", "gaming", "media", "biotech", "travel")
+COUNTRIES = ("Germany", "France", "Brazil", "Japan", "Kenya", "Canada", "India", "Spain")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed leads in a transaction that is rolled back afterwards and compare ?q= "
+        "full-text search with the icontains path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leads', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per query.")
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        index = INDEXES['lead']
+        backend, fallback = get_backend(), LikeBackend()
+        queries = ("cloud", "robo", "kenya fintech", "acme-1234", "zzznotfound")
+        self.stdout.write(f"backend: {type(backend).__name__}, {options['leads']} leads")
+        self.stdout.write(f"{'query':<16} {'matches':>8} {'index ms':>9} {'icontains ms':>13}")
+        with transaction.atomic():
+            self.seed(options['leads'])
+            for query in queries:
+                indexed = self.time(backend, index, query, options)
+                scanned = self.time(fallback, index, query, options)
+                matches = backend.filter(Lead.objects.all(), index, query).count()
+                self.stdout.write(f"{query:<16} {matches:>8} {indexed:>9.2f} {scanned:>13.2f}")
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        rng = random.Random(42)
+        batch = []
+        for n in range(count):
+            batch.append(Lead(
+                company_name=f"Acme-{n} {rng.choice(WORDS).title()}",
+                email=f"search-bench-{n}@example.com",
+                industry=rng.choice(WORDS),
+                country=rng.choice(COUNTRIES),
+                description=" ".join(rng.choices(WORDS, k=12)),
+            ))
+            if len(batch) == 5000:
+                get_backend().index(INDEXES['lead'], Lead.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            get_backend().index(INDEXES['lead'], Lead.objects.bulk_create(batch))
+
+    def time(self, backend, index, query, options):
+        # The first page of the lead list: newest first.
+        queryset = Lead.objects.order_by('-created_at', '-id')
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            list(backend.filter(queryset, index, query)[:options['page_size']])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
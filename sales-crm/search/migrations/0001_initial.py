@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations
+
+# The FTS5 tables of search/backends.py as this migration first created them.
+# Frozen here, with the SQL to fill them, so the migration does not change
+# when the search code does.
+TABLES = (
+    ('search_employee', 'employee', 'Employee', ('username', 'first_name', 'last_name', 'email')),
+    ('search_lead', 'leads', 'Lead', ('company_name', 'email', 'phone', 'industry', 'country', 'source',
+                                      'description')),
+    ('search_customer', 'leads', 'Customer', ('company_name', 'contact_person', 'email', 'phone', 'industry',
+                                              'country')),
+)
+
+
+def uses_fts(connection):
+    # What search.backends.get_backend picks: FTS5 on SQLite unless SEARCH_BACKEND says otherwise.
+    if settings.SEARCH_BACKEND:
+        return settings.SEARCH_BACKEND.endswith('.SQLiteFTSBackend')
+    return connection.vendor == 'sqlite'
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if not uses_fts(connection):
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table, app_label, model_name, fields in TABLES:
+            opts = apps.get_model(app_label, model_name)._meta
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {quote(table)} USING fts5("
+                f"{', '.join(fields)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            columns = ', '.join(f"coalesce({quote(opts.get_field(field).column)}, '')" for field in fields)
+            cursor.execute(
+                f"INSERT INTO {quote(table)} (rowid, {', '.join(fields)}) "
+                f"SELECT {quote(opts.pk.column)}, {columns} FROM {quote(opts.db_table)}"
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for table, *_ in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(table)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0002_revokedtoken'),
+        ('leads', '0008_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
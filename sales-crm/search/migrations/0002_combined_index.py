@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import migrations
+
+# The combined index behind /api/search/ (search.indexes.CombinedIndex):
+# rowid = pk * 4 + the source's position, title and detail columns, and a
+# title match weighted four times a detail match. Frozen here, with the SQL
+# to fill it, so the migration does not change when the search code does.
+TABLE = 'search_all'
+SLOTS = 4
+SOURCES = (
+    ('leads', 'Lead', 'company_name', 'email'),
+    ('leads', 'Customer', 'company_name', 'contact_person'),
+    ('invoices', 'Invoice', 'invoice_number', None),
+)
+
+
+def uses_fts(connection):
+    # What search.backends.get_backend picks: FTS5 on SQLite unless SEARCH_BACKEND says otherwise.
+    if settings.SEARCH_BACKEND:
+        return settings.SEARCH_BACKEND.endswith('.SQLiteFTSBackend')
+    return connection.vendor == 'sqlite'
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if not uses_fts(connection):
+        return
+    quote = connection.ops.quote_name
+    table = quote(TABLE)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            f"title, detail, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('rank', 'bm25(4.0, 1.0)')")
+        for position, (app_label, model_name, title, detail) in enumerate(SOURCES):
+            opts = apps.get_model(app_label, model_name)._meta
+            detail = f"coalesce({quote(opts.get_field(detail).column)}, '')" if detail else "''"
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, title, detail) "
+                f"SELECT {quote(opts.pk.column)} * {SLOTS} + {position}, "
+                f"coalesce({quote(opts.get_field(title).column)}, ''), {detail} FROM {quote(opts.db_table)}"
+            )
+
+
+def drop_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {schema_editor.connection.ops.quote_name(TABLE)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('invoices', '0004_invoicesequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,23 @@
+"""
+Keep the search indexes in step with single-object writes. The index is
+written in the same transaction as the row, so a rollback undoes both.
+Bulk writers (lead import, bulk conversion, bulk invoices) call
+``index_objects`` themselves since ``bulk_create`` sends no signals.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .backends import index_objects, remove_objects
+from .indexes import INDEXES
+
+
+def update_entries(sender, instance, using, **kwargs):
+    index_objects([instance], using)
+
+
+def remove_entries(sender, instance, using, **kwargs):
+    remove_objects(sender._meta.label, [instance.pk], using)
+
+
+for _label in {label for index in INDEXES.values() for label in index.model_labels}:
+    post_save.connect(update_entries, sender=_label, weak=False, dispatch_uid=f"search-{_label}-save")
+    post_delete.connect(remove_entries, sender=_label, weak=False, dispatch_uid=f"search-{_label}-delete")
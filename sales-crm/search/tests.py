@@ -0,0 +1,164 @@
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from employee.models import Employee
+from invoices.models import Invoice
+from leads.models import Customer, Lead
+from . import backends
+from .indexes import INDEXES
+
+
+class CombinedIndexTests(SimpleTestCase):
+    def test_rowids_round_trip(self):
+        index = INDEXES['all']
+        for source in index.sources:
+            for pk in (1, 2, 7, 10 ** 9):
+                with self.subTest(source=source.kind, pk=pk):
+                    rowid = index.rowid(source.model_label, pk)
+                    self.assertEqual(rowid, pk * index.SLOTS + index.sources.index(source))
+                    self.assertEqual(index.locate(rowid), (source, pk))
+        # The same pk in different sources never shares a rowid.
+        self.assertEqual(len({index.rowid(source.model_label, 5) for source in index.sources}), len(index.sources))
+        self.assertEqual(index.rowids('invoices.Invoice', [1, 2]), [6, 10])
+
+
+class SearchAPITestCase(TestCase):
+    def setUp(self):
+        self.user = Employee.objects.create_user(username='searcher', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q, **params):
+        response = self.client.get('/api/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def hits(self, q, **params):
+        return [(hit['type'], hit['id']) for hit in self.search(q, **params)['results']]
+
+    def invoice(self, number, customer=None):
+        customer = customer or Customer.objects.create(company_name='Billing Target', email=f'{number}@example.com')
+        return Invoice.objects.create(customer=customer, invoice_number=number, due_date=date(2026, 1, 31),
+                                      total_amount=100, created_by=self.user)
+
+
+@skipUnless(connection.vendor == 'sqlite', "The combined index is an FTS5 table")
+class SQLiteSearchTests(SearchAPITestCase):
+    def test_typed_hits_per_source(self):
+        lead = Lead.objects.create(company_name='Quokka Labs', email='hello@quokka.io')
+        customer = Customer.objects.create(company_name='Quokka Retail', contact_person='Ann Lee', email='c@x.com')
+        invoice = self.invoice('QUOKKA-0001', customer)
+
+        data = self.search('quokka')
+        self.assertTrue(data['ranked'])
+        self.assertCountEqual(
+            [(hit['type'], hit['id'], hit['title'], hit['detail']) for hit in data['results']],
+            [('lead', lead.pk, 'Quokka Labs', 'hello@quokka.io'),
+             ('customer', customer.pk, 'Quokka Retail', 'Ann Lee'),
+             ('invoice', invoice.pk, 'QUOKKA-0001', '')],
+        )
+        self.assertTrue(all(isinstance(hit['score'], float) for hit in data['results']))
+
+    def test_title_match_outranks_detail_match(self):
+        lead = Lead.objects.create(company_name='Unrelated', email='sales@wombat.com')
+        customer = Customer.objects.create(company_name='Wombat Trading', email='w@x.com')
+        self.assertEqual(self.hits('wombat'), [('customer', customer.pk), ('lead', lead.pk)])
+
+    def test_prefix_matching(self):
+        lead = Lead.objects.create(company_name='Narwhal Consulting', email='n@x.com')
+        self.assertEqual(self.hits('narw'), [('lead', lead.pk)])
+        # Only the last term is a prefix; earlier terms are whole words.
+        self.assertEqual(self.hits('narwhal cons'), [('lead', lead.pk)])
+        self.assertEqual(self.hits('narw consulting'), [])
+        self.assertEqual(self.hits(''), [])
+
+    @override_settings(SEARCH_RANK_CANDIDATES=2)
+    def test_common_terms_fall_back_to_newest_first(self):
+        leads = [Lead.objects.create(company_name=f'Common Co {n}', email=f'{n}@x.com') for n in range(4)]
+        data = self.search('common')
+        self.assertFalse(data['ranked'])
+        self.assertEqual([hit['score'] for hit in data['results']], [None] * 4)
+        self.assertEqual([hit['id'] for hit in data['results']], [lead.pk for lead in reversed(leads)])
+
+        # A selective term ranks; the common one is checked against its matches.
+        unique = Lead.objects.create(company_name='Common Platypus', email='p@x.com')
+        Lead.objects.create(company_name='Platypus Only', email='q@x.com')
+        data = self.search('common platyp')
+        self.assertTrue(data['ranked'])
+        self.assertEqual([hit['id'] for hit in data['results']], [unique.pk])
+
+    def test_offset_paging(self):
+        leads = [Lead.objects.create(company_name=f'Pangolin {n}', email=f'{n}@x.com') for n in range(5)]
+        seen, url = [], '/api/search/?q=pangolin&page_size=2'
+        while url:
+            data = self.client.get(url).json()
+            seen += [hit['id'] for hit in data['results']]
+            url = data['next']
+        self.assertCountEqual(seen, [lead.pk for lead in leads])
+        self.assertEqual(len(seen), len(set(seen)))
+
+    @override_settings(SEARCH_MAX_OFFSET=2)
+    def test_max_offset(self):
+        for n in range(6):
+            Lead.objects.create(company_name=f'Axolotl {n}', email=f'{n}@x.com')
+        self.assertIn('offset=2', self.search('axolotl', page_size=2)['next'])
+        last = self.search('axolotl', page_size=2, offset=2)
+        self.assertEqual(len(last['results']), 2)
+        self.assertIsNone(last['next'])
+        # Deeper offsets are clamped, not served.
+        self.assertEqual(self.search('axolotl', page_size=2, offset=100)['results'], last['results'])
+
+    def test_invoice_save_and_delete_reindex(self):
+        invoice = self.invoice('KIWI-0001')
+        self.assertEqual(self.hits('kiwi'), [('invoice', invoice.pk)])
+
+        invoice.invoice_number = 'MANGO-0001'
+        invoice.save()
+        self.assertEqual(self.hits('kiwi'), [])
+        self.assertEqual(self.hits('mango'), [('invoice', invoice.pk)])
+
+        invoice.delete()
+        self.assertEqual(self.hits('mango'), [])
+
+
+@override_settings(SEARCH_BACKEND='search.backends.LikeBackend')
+class LikeSearchTests(SearchAPITestCase):
+    def setUp(self):
+        # Backends are cached per alias; drop the cached one for the tests' duration.
+        patcher = mock.patch.dict(backends._backends, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_newest_first_across_sources(self):
+        lead = Lead.objects.create(company_name='Tapir Tools', email='t@x.com')
+        customer = Customer.objects.create(company_name='Old Co', contact_person='Tapir Jones', email='o@x.com')
+        invoice = self.invoice('TAPIR-7')
+        Lead.objects.create(company_name='Elsewhere', email='e@x.com')
+
+        data = self.search('tap')
+        self.assertFalse(data['ranked'])
+        # Merged by rowid, the order pk * SLOTS + position gives.
+        labels = {source.kind: source.model_label for source in INDEXES['all'].sources}
+        expected = sorted([('lead', lead.pk), ('customer', customer.pk), ('invoice', invoice.pk)],
+                          key=lambda hit: INDEXES['all'].rowid(labels[hit[0]], hit[1]), reverse=True)
+        self.assertEqual([(hit['type'], hit['id']) for hit in data['results']], expected)
+        self.assertEqual([hit['score'] for hit in data['results']], [None] * 3)
+
+    def test_every_term_must_match(self):
+        lead = Lead.objects.create(company_name='Tapir Tools', email='sales@tapir.com')
+        Lead.objects.create(company_name='Tapir Farms', email='f@x.com')
+        self.assertEqual(self.hits('tapir sales'), [('lead', lead.pk)])
+
+    def test_offset_paging(self):
+        for n in range(3):
+            Lead.objects.create(company_name=f'Okapi {n}', email=f'{n}@x.com')
+        first = self.search('okapi', page_size=2)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(first['results']), 2)
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import search_all
+
+urlpatterns = [
+    path('', search_all, name='search'),
+]
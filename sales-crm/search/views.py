@@ -0,0 +1,52 @@
+from django.conf import settings
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from crm_project.replicas import read_alias
+
+from .backends import get_backend
+from .filters import SEARCH_PARAM
+from .indexes import INDEXES
+
+
+def _int_param(request, name, default, maximum):
+    try:
+        value = int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+    return min(value, maximum) if value >= 0 else default
+
+
+@api_view(['GET'])
+def search_all(request):
+    """
+    Leads, customers and invoices matching ``?q=``, best match first, from
+    the combined index alone (no per-model queries). Pages with
+    ``?page_size=`` and ``?offset=``.
+    """
+    query = request.query_params.get(SEARCH_PARAM, '').strip()
+    page_size = _int_param(request, 'page_size', settings.API_PAGE_SIZE, settings.API_MAX_PAGE_SIZE) or 1
+    offset = _int_param(request, 'offset', 0, settings.SEARCH_MAX_OFFSET)
+    index = INDEXES['all']
+
+    # One extra row tells whether there is a next page.
+    rows = get_backend(read_alias()).search(index, query, offset, page_size + 1) if query else []
+    results = []
+    for rowid, score, title, detail in rows[:page_size]:
+        source, pk = index.locate(rowid)
+        results.append({
+            'type': source.kind,
+            'id': pk,
+            'title': title,
+            'detail': detail,
+            'score': None if score is None else round(score, 4),
+        })
+
+    next_offset = offset + page_size
+    has_next = len(rows) > page_size and next_offset <= settings.SEARCH_MAX_OFFSET
+    return Response({
+        'next': replace_query_param(request.build_absolute_uri(), 'offset', next_offset) if has_next else None,
+        'ranked': bool(results) and results[0]['score'] is not None,
+        'results': results,
+    })
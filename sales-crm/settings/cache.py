@@ -0,0 +1,82 @@
+"""
+Per-process cache of the site settings.
+
+Each worker keeps the serialised settings and their ETag in memory. The
+ETag of the current settings is also stored in the shared Django cache as
+a version stamp; a worker compares it at most once per
+``SITE_SETTINGS_CHECK_INTERVAL`` and reloads from the database only when
+another worker has saved new settings (published from the model signals
+in settings/signals.py). Reads never write to the database.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+
+from .models import Settings
+
+VERSION_KEY = 'settings:site:version'
+DEFAULT_COLORS = {
+    "primary": "#4f46e5",
+    "secondary": "#f59e0b",
+    "accent": "#10b981",
+    "background": "#ffffff",
+    "text": "#111827"
+}
+
+
+def settings_payload(settings_obj):
+    return {"logo": settings_obj.logo, "colors": settings_obj.colors}
+
+
+def payload_etag(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+class SiteSettingsCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payload = None
+        self._etag = None
+        self._checked_at = 0.0
+
+    def get(self):
+        """Return ``(payload, etag)`` for the current site settings."""
+        with self._lock:
+            now = time.monotonic()
+            if self._payload is not None and now - self._checked_at < django_settings.SITE_SETTINGS_CHECK_INTERVAL:
+                return self._payload, self._etag
+            self._checked_at = now
+            version = cache.get(VERSION_KEY)
+            if self._payload is None or version != self._etag:
+                self._load()
+                if version is None:
+                    cache.add(VERSION_KEY, self._etag, timeout=None)
+            return self._payload, self._etag
+
+    def _load(self):
+        settings_obj = Settings.objects.filter(pk=1).first()
+        if settings_obj is None:
+            # Not saved yet: serve the defaults without creating the row.
+            settings_obj = Settings(pk=1, colors=DEFAULT_COLORS)
+        self._payload = settings_payload(settings_obj)
+        self._etag = payload_etag(self._payload)
+
+    def saved(self, settings_obj):
+        """Adopt freshly saved settings here and tell the other workers."""
+        payload = settings_payload(settings_obj)
+        etag = payload_etag(payload)
+        with self._lock:
+            self._payload, self._etag, self._checked_at = payload, etag, time.monotonic()
+        cache.set(VERSION_KEY, etag, timeout=None)
+
+    def deleted(self):
+        with self._lock:
+            self._payload = self._etag = None
+        cache.delete(VERSION_KEY)
+
+
+site_settings = SiteSettingsCache()
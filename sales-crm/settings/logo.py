@@ -0,0 +1,118 @@
+"""
+Checks for the site logo URL, which the server fetches itself when it
+renders invoice PDFs (invoices/pdf_layout.py).
+
+Only http(s) URLs are accepted, optionally restricted to an allow-list of
+hosts, and the fetch refuses to connect to loopback, private, link-local or
+otherwise non-public addresses. The address check runs on the socket that
+was actually opened, so it also covers redirects and DNS answers that change
+between validation and fetch.
+
+Plain Python on purpose: the PDF worker processes import it without Django.
+"""
+import http.client
+import ipaddress
+import socket
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+SCHEMES = ('http', 'https')
+
+
+class UnsafeLogoURL(ValueError):
+    pass
+
+
+def host_allowed(host, allowed_hosts):
+    """``allowed_hosts`` entries match exactly; ``.example.com`` also matches subdomains."""
+    if not allowed_hosts:
+        return True
+    for pattern in allowed_hosts:
+        pattern = pattern.lower()
+        if host == pattern or (pattern.startswith('.') and (host.endswith(pattern) or host == pattern[1:])):
+            return True
+    return False
+
+
+def _public(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if getattr(ip, 'ipv4_mapped', None):
+        ip = ip.ipv4_mapped
+    return ip.is_global
+
+
+def check_url(url, allowed_hosts=()):
+    """Raise ``UnsafeLogoURL`` unless ``url`` is one the server may fetch."""
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in SCHEMES:
+        raise UnsafeLogoURL("Logo URL must use http or https.")
+    host = (parts.hostname or '').lower()
+    if not host:
+        raise UnsafeLogoURL("Logo URL has no host.")
+    if not host_allowed(host, allowed_hosts):
+        raise UnsafeLogoURL("Logo host is not allowed.")
+    try:
+        private = not _public(host)
+    except ValueError:  # a name, not an address: checked when connecting
+        private = host == 'localhost' or host.endswith('.localhost')
+    if private:
+        raise UnsafeLogoURL("Logo URL points to a private address.")
+
+
+def _public_connection(address, *args, **kwargs):
+    sock = socket.create_connection(address, *args, **kwargs)
+    if not _public(sock.getpeername()[0]):
+        sock.close()
+        raise UnsafeLogoURL("Logo host resolves to a private address.")
+    return sock
+
+
+class _HTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _HTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_HTTPConnection, req)
+
+
+class _HTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_HTTPSConnection, req, context=self._context)
+
+
+class _RedirectHandler(urllib.request.HTTPRedirectHandler):
+    def __init__(self, allowed_hosts):
+        self.allowed_hosts = allowed_hosts
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_url(newurl, self.allowed_hosts)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def fetch(url, timeout, max_bytes, allowed_hosts=()):
+    """The logo's bytes; raises ``UnsafeLogoURL`` or a network error."""
+    check_url(url, allowed_hosts)
+    # No ProxyHandler (the address check must see the real peer) and no
+    # file/ftp/data handlers.
+    opener = urllib.request.OpenerDirector()
+    for handler in (_HTTPHandler(), _HTTPSHandler(), _RedirectHandler(allowed_hosts),
+                    urllib.request.HTTPErrorProcessor(), urllib.request.HTTPDefaultErrorHandler()):
+        opener.add_handler(handler)
+    with opener.open(url, timeout=timeout) as response:
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise UnsafeLogoURL("Logo is too large.")
+        data = response.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise UnsafeLogoURL("Logo is too large.")
+    return data
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import site_settings
+from .models import Settings
+
+
+@receiver(post_save, sender=Settings)
+def publish_site_settings(sender, instance, **kwargs):
+    if instance.pk == 1:
+        transaction.on_commit(lambda: site_settings.saved(instance))
+
+
+@receiver(post_delete, sender=Settings)
+def forget_site_settings(sender, instance, **kwargs):
+    if instance.pk == 1:
+        transaction.on_commit(site_settings.deleted)
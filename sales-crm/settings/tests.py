@@ -1,3 +1,159 @@
-from django.test import TestCase
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from crm_project.testing import QueryBudgetTestCase
+from . import logo
+from .cache import DEFAULT_COLORS, SiteSettingsCache, payload_etag, site_settings
+from .models import Settings
+
+
+class SettingsQueryBudgetTests(QueryBudgetTestCase):
+    def seed(self, count):
+        # Site settings are a single row; only its presence can change what the views do.
+        Settings.objects.get_or_create(pk=1, defaults={'colors': DEFAULT_COLORS})
+
+    def test_get_settings(self):
+        # The first request loads the row; the counted second one is served from memory.
+        self.assertQueryBudget(0, 'get', '/api/settings/')
+
+    def test_update_settings(self):
+        self.assertQueryBudget(2, 'put', '/api/settings/', {'logo': 'https://example.com/logo.png',
+                                                           'colors': {'primary': '#000000'}})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   SITE_SETTINGS_CHECK_INTERVAL=60)
+class SiteSettingsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        site_settings.deleted()
+        self.client = APIClient()
+
+    def put(self, data):
+        # Other workers learn about the save from the on_commit publish in settings/signals.py.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/api/settings/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_defaults_without_a_row(self):
+        response = self.client.get('/api/settings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'logo': None, 'colors': DEFAULT_COLORS})
+        self.assertFalse(Settings.objects.exists())
+
+    def test_etag_and_cache_control(self):
+        response = self.client.get('/api/settings/')
+        self.assertEqual(response['ETag'], f'"{payload_etag(response.json())}"')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+    def test_if_none_match(self):
+        etag = self.client.get('/api/settings/')['ETag']
+        response = self.client.get('/api/settings/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual((response['ETag'], response['Cache-Control']), (etag, 'public, no-cache'))
+        self.assertEqual(self.client.get('/api/settings/', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_warm_reads_run_no_queries(self):
+        self.client.get('/api/settings/')
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.client.get('/api/settings/')
+
+    def test_put_changes_the_etag(self):
+        before = self.client.get('/api/settings/')['ETag']
+        after = self.put({'colors': {'primary': '#000000'}})['ETag']
+        self.assertNotEqual(after, before)
+        response = self.client.get('/api/settings/', HTTP_IF_NONE_MATCH=before)
+        self.assertEqual((response.status_code, response['ETag']), (200, after))
+
+    def test_other_workers_reload_after_a_put(self):
+        worker = SiteSettingsCache()
+        self.assertEqual(worker.get()[0]['colors'], DEFAULT_COLORS)
+        etag = self.put({'colors': {'primary': '#000000'}})['ETag']
+        # Within the check interval the worker keeps its copy without asking.
+        with self.assertNumQueries(0):
+            self.assertEqual(worker.get()[0]['colors'], DEFAULT_COLORS)
+        with override_settings(SITE_SETTINGS_CHECK_INTERVAL=0), self.assertNumQueries(1):
+            payload, worker_etag = worker.get()
+        self.assertEqual(payload['colors'], {'primary': '#000000'})
+        self.assertEqual(f'"{worker_etag}"', etag)
+
+
+class _LogoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', 'http://elsewhere.example/logo.png')
+            self.end_headers()
+            return
+        body = b'x' * int(self.path.strip('/') or 0)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LogoURLTests(TestCase):
+    def put(self, url):
+        return APIClient().put('/api/settings/', {'logo': url}, format='json')
+
+    def test_rejects_unsafe_urls(self):
+        for url in ('file:///etc/passwd', 'ftp://example.com/logo.png', 'gopher://example.com/',
+                    'http://127.0.0.1/logo.png', 'http://localhost:8000/logo.png', 'http://10.0.0.5/logo.png',
+                    'http://169.254.169.254/latest/meta-data/', 'http://[::1]/logo.png',
+                    'http://[::ffff:127.0.0.1]/logo.png', 'not a url'):
+            with self.subTest(url=url):
+                response = self.put(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('logo', response.json())
+        self.assertFalse(Settings.objects.exclude(logo=None).exists())
+
+    def test_accepts_public_url(self):
+        response = self.put('https://cdn.example.com/logo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Settings.objects.get(pk=1).logo, 'https://cdn.example.com/logo.png')
+
+    @override_settings(SITE_LOGO_ALLOWED_HOSTS=['.example.com'])
+    def test_allowed_hosts(self):
+        self.assertEqual(self.put('https://example.com/logo.png').status_code, 200)
+        self.assertEqual(self.put('https://cdn.example.com/logo.png').status_code, 200)
+        self.assertEqual(self.put('https://example.org/logo.png').status_code, 400)
+        self.assertEqual(self.put('https://badexample.com/logo.png').status_code, 400)
+
+
+class LogoFetchTests(TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), _LogoHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        # A name, so the literal-address check in check_url does not stop it before connecting.
+        self.base = f'http://logo.localtest:{self.server.server_address[1]}'
+        getaddrinfo = socket.getaddrinfo
+        resolve = mock.patch('socket.getaddrinfo', lambda host, *args, **kwargs: getaddrinfo(
+            '127.0.0.1' if host == 'logo.localtest' else host, *args, **kwargs))
+        resolve.start()
+        self.addCleanup(resolve.stop)
+
+    def test_refuses_private_peer(self):
+        with self.assertRaises(logo.UnsafeLogoURL):
+            logo.fetch(f'{self.base}/10', timeout=5, max_bytes=100)
+
+    def test_size_cap_and_redirects(self):
+        with mock.patch.object(logo, '_public', return_value=True):
+            self.assertEqual(logo.fetch(f'{self.base}/10', timeout=5, max_bytes=100), b'x' * 10)
+            with self.assertRaises(logo.UnsafeLogoURL):
+                logo.fetch(f'{self.base}/101', timeout=5, max_bytes=100)
+            with self.assertRaises(logo.UnsafeLogoURL):
+                logo.fetch(f'{self.base}/redirect', timeout=5, max_bytes=100, allowed_hosts=['logo.localtest'])
@@ -1,39 +1,57 @@
-from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny  # added import
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from .cache import DEFAULT_COLORS, payload_etag, settings_payload, site_settings
+from .logo import SCHEMES, UnsafeLogoURL, check_url
 from .models import Settings
 
+# Clients may reuse their copy but must revalidate it (cheap 304) every time.
+CACHE_CONTROL = 'public, no-cache'
+
+
+def _headers(etag):
+    return {'ETag': f'"{etag}"', 'Cache-Control': CACHE_CONTROL}
+
+
+def _logo_error(url):
+    """Why ``url`` cannot be the logo, or None. The PDF renderer fetches it server-side."""
+    try:
+        URLValidator(schemes=SCHEMES)(url)
+        check_url(url, settings.SITE_LOGO_ALLOWED_HOSTS)
+    except ValidationError:
+        return "Enter a valid http or https URL."
+    except UnsafeLogoURL as e:
+        return str(e)
+    return None
+
+
 class SettingsAPIView(APIView):
     permission_classes = [AllowAny]  # allow public access to settings
     
     def get(self, request):
-        settings_obj, _ = Settings.objects.get_or_create(pk=1, defaults={
-            'colors': {
-                "primary": "#4f46e5",
-                "secondary": "#f59e0b",
-                "accent": "#10b981",
-                "background": "#ffffff",
-                "text": "#111827"
-            }
-        })
-        data = {
-            "logo": settings_obj.logo,
-            "colors": settings_obj.colors
-        }
-        return Response(data, status=status.HTTP_200_OK)
+        # Served from the per-process cache; see settings/cache.py.
+        data, etag = site_settings.get()
+        if f'"{etag}"' in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=_headers(etag))
+        return Response(data, status=status.HTTP_200_OK, headers=_headers(etag))
     
     def put(self, request):
-        settings_obj, _ = Settings.objects.get_or_create(pk=1)
         # Only update logo if a non-empty value is provided, otherwise preserve existing logo
-        if "logo" in request.data and request.data["logo"]:
-            settings_obj.logo = request.data["logo"]
+        logo = request.data.get("logo")
+        error = logo and _logo_error(logo)
+        if error:
+            return Response({"logo": [error]}, status=status.HTTP_400_BAD_REQUEST)
+        settings_obj, _ = Settings.objects.get_or_create(pk=1, defaults={'colors': DEFAULT_COLORS})
+        if logo:
+            settings_obj.logo = logo
         # Always update colors
         settings_obj.colors = request.data.get("colors", settings_obj.colors)
         settings_obj.save()
-        data = {
-            "logo": settings_obj.logo,
-            "colors": settings_obj.colors
-        }
-        return Response(data, status=status.HTTP_200_OK)
+        # The post_save signal publishes the new version to every worker.
+        data = settings_payload(settings_obj)
+        etag = payload_etag(data)
+        return Response(data, status=status.HTTP_200_OK, headers=_headers(etag))